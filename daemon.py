@@ -0,0 +1,328 @@
+"""
+Headless routing daemon: routes audio from a saved profile without the Qt app.
+
+It never imports PySide6. It loads a profile from json/profiles.json, starts
+routing right away and serves the control API (see scripts.logic.control) on
+a local socket. Profiles are saved from a running route, by this daemon or by
+the GUI running as a thin client (main.py --daemon).
+
+Usage:
+    python daemon.py                          # the default profile
+    python daemon.py --profile streaming --metrics health.jsonl
+    python daemon.py --send status            # talk to a running daemon
+    python daemon.py --send start speaker='["ALSA", "pulse"]' mic_input='["ALSA", "pulse"]' mic_output='["ALSA", "pulse"]'
+    python daemon.py --send set volume=150 noise_threshold=0.0002
+    python daemon.py --send save_profile name=streaming default=true
+    python daemon.py --send replay path=replay.wav seconds=10  # written to recordings/replay.wav
+"""
+# Timed From Here, so the Startup Report Includes the Imports
+import time
+started = time.perf_counter()
+
+import argparse
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+
+from scripts.logic.audio import AudioDevices, AudioRouting, AudioValues
+from scripts.logic.clip_cache import ClipCache
+from scripts.logic.control import (ControlClient, ControlError, ControlServer, default_address, default_token_path,
+                                   parse_address)
+from scripts.logic.devices import DeviceWatcher
+from scripts.logic.latency import LATENCY_MODES
+from scripts.logic.profiles import DEVICE_FIELDS, ProfileStore, apply_profile, capture_profile
+
+def confine_path(path, directory):
+    """
+    Resolves path (relative paths from directory), refusing anything outside
+    directory, so control clients cannot have the daemon read or write elsewhere.
+
+    Returns:
+        str: The resolved absolute path.
+
+    Raises:
+        PermissionError: If the path leads outside directory (symlinks included).
+    """
+    root = os.path.realpath(directory)
+    resolved = os.path.realpath(os.path.join(root, path))
+    try:
+        inside = os.path.commonpath([root, resolved]) == root
+    except ValueError:
+        # Another Drive on Windows
+        inside = False
+    if not inside:
+        raise PermissionError(f"{path} is outside {directory}.")
+    return resolved
+
+class RoutingDaemon:
+    """
+    Owns the audio devices and routing, and answers control commands.
+
+    Args:
+        working_dir (str): Repository directory (json/, sounds/ and recordings/ live under it, as for Loader).
+            Clips are only added from sounds/, and replays and metrics only written to recordings/.
+        address (str or tuple): Control socket; default_address(json_dir) if None.
+    """
+    def __init__(self, working_dir, address=None):
+        # Directories, Laid Out as in Loader
+        self.json_dir = os.path.join(working_dir, 'json')
+        self.sounds_dir = os.path.join(working_dir, 'sounds')
+        self.recordings_dir = os.path.join(working_dir, 'recordings')
+        self.clip_cache_dir = os.path.join(self.json_dir, 'clip_cache')
+        os.makedirs(self.json_dir, exist_ok=True)
+        os.makedirs(self.recordings_dir, exist_ok=True)
+
+        # Audio, and Soundboard Clips (Decoded in the Background Once the Stream's Format Is Known)
+        self.audio_values = AudioValues()
+        self.audio_devices = AudioDevices()
+        self.audio_routing = AudioRouting(self.audio_devices, self.audio_values)
+        self.audio_routing.clip_engine.cache = ClipCache(self.clip_cache_dir)
+        self.audio_routing.clip_engine.add_directory(self.sounds_dir)
+
+        # Instant Replay, Saved by the 'replay' Command (e.g. a GUI Client's Voice Command)
+        self.audio_routing.enable_replay(30.0)
+
+        # Hot-Plug Watcher: Its Reports Are Queued to the Main Thread, Which Rebinds the Route
+        # Only if One of Its Devices Disappears
+        self.device_watcher = DeviceWatcher(self.audio_devices.registry)
+        self.device_changes = queue.Queue()
+        self.device_watcher.add_listener(lambda *change: self.device_changes.put(change))
+
+        # Profiles, and the One Last Started
+        self.profiles = ProfileStore(self.json_dir)
+        self.profile = None
+
+        # Control API
+        self.address = address or default_address(self.json_dir)
+        self.server = ControlServer(self.address, {
+            'status': self.status,
+            'start': self.start,
+            'stop': self.stop,
+            'set': self.set,
+            'set_sink_gain': self.set_sink_gain,
+            'devices': self.devices,
+            'profiles': self.list_profiles,
+            'save_profile': self.save_profile,
+            'delete_profile': self.delete_profile,
+            'health': self.audio_routing.health_snapshot,
+            'clips': self.clips,
+            'add_clip': self.add_clip,
+            'play': self.play,
+            'stop_clips': self.stop_clips,
+            'replay': self.replay,
+            'metrics': self.metrics,
+            'shutdown': self.shutdown,
+        }, default_token_path(self.json_dir))
+        self.stopped = threading.Event()
+
+    def run(self, profile=None, start=True, metrics_path=None):
+        """Starts routing (if a profile is found), serves commands until shutdown, then stops routing."""
+        if start:
+            try:
+                self.start(profile)
+                print(f"\033[92mAudio started in {(time.perf_counter() - started) * 1000:.0f} ms "
+                      f"(profile '{self.profile}')\033[0m")
+            except LookupError as e:
+                print(f"\033[93m{e} Waiting for a start command.\033[0m")
+        if metrics_path:
+            self.audio_routing.start_metrics_log(metrics_path)
+        self.server.start()
+        self.device_watcher.start()
+        try:
+            while not self.stopped.is_set():
+                try:
+                    change = self.device_changes.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                # Between Commands, Like Any Other Change to the Route
+                with self.server.lock:
+                    self.audio_routing.handle_device_changes(*change)
+        finally:
+            self.device_watcher.stop()
+            self.server.stop()
+            self.audio_routing.stop_metrics_log()
+            if self.audio_routing.running:
+                self.audio_routing.stop_route()
+
+    def status(self):
+        routing = self.audio_routing
+        values = self.audio_values
+        devices = {}
+        for field, _ in DEVICE_FIELDS:
+            info = getattr(self.audio_devices, field)
+            devices[field] = list(self.audio_devices.registry.key(info)) if info is not None else None
+        return {
+            'running': routing.running,
+            'profile': self.profile,
+            'devices': devices,
+            'frames': routing.buffer_size if routing.running else None,
+            'sample_rate': routing.sample_rate,
+            'volume': values.get_volume(),
+            'noise_threshold': values.get_noise_threshold(),
+            'spectrum': values.get_spectrum(),
+            'monitor': routing.sink_gains['speaker'],
+            'latency_mode': routing.latency_mode,
+            'adaptive_latency': routing.adaptive_latency,
+        }
+
+    def start(self, profile=None, speaker=None, mic_input=None, mic_output=None, frames=None):
+        """
+        Starts routing with a saved profile (the default one if none is named),
+        or between the given devices (indices, names or [host API, name] keys).
+        Restarts if already running.
+        """
+        routing = self.audio_routing
+        if routing.running:
+            routing.stop_route()
+        if speaker is not None or mic_input is not None or mic_output is not None:
+            routing.start_route(speaker, mic_input, mic_output, frames)
+            self.profile = None
+        else:
+            settings = self.profiles.get(profile)
+            if settings is None:
+                raise LookupError(f"No profile named '{profile}'." if profile else "No default profile saved.")
+            if frames:
+                settings['frames'] = frames
+            apply_profile(routing, settings)
+            self.profile = profile or self.profiles.default
+        if not routing.running:
+            raise RuntimeError("Routing did not start; see the daemon's output.")
+        return self.status()
+
+    def stop(self):
+        if self.audio_routing.running:
+            self.audio_routing.stop_route()
+        return self.status()
+
+    def set(self, volume=None, noise_threshold=None, spectrum=None, monitor=None, latency_mode=None,
+            adaptive_latency=None, frames=None):
+        """Changes any of the processing settings, or the buffer size of the running stream."""
+        routing = self.audio_routing
+        values = self.audio_values
+        if latency_mode is not None and latency_mode not in LATENCY_MODES:
+            raise ValueError(f"Unknown latency mode '{latency_mode}'. Must be one of: {', '.join(LATENCY_MODES)}.")
+        if volume is not None:
+            values.set_volume(float(volume))
+        if noise_threshold is not None:
+            values.set_noise_threshold(float(noise_threshold))
+        if spectrum is not None:
+            values.set_spectrum(bool(spectrum))
+        if monitor is not None:
+            routing.set_sink_gain('speaker', float(monitor))
+        if latency_mode is not None:
+            routing.set_latency_mode(latency_mode)
+        if adaptive_latency is not None:
+            routing.set_adaptive_latency(bool(adaptive_latency))
+        if frames and routing.running and not routing.reopen_stream(int(frames)):
+            raise RuntimeError(f"The stream did not accept {frames} frames.")
+        return self.status()
+
+    def set_sink_gain(self, name, gain):
+        self.audio_routing.set_sink_gain(name, float(gain))
+        return self.status()
+
+    def devices(self):
+        """Stable [host API, name] keys of every device, per direction, as of the watcher's last scan."""
+        registry = self.device_watcher.registry
+        return {direction: [list(key) for key in devices] for direction, devices in registry.by_direction.items()}
+
+    def list_profiles(self):
+        return {'default': self.profiles.default, 'names': self.profiles.names()}
+
+    def save_profile(self, name, default=False):
+        """Saves the running route (devices, buffer size and settings) under name."""
+        if not self.audio_routing.running:
+            raise RuntimeError("Start routing before saving it as a profile.")
+        self.profiles.put(name, capture_profile(self.audio_routing), default)
+        self.profile = name
+        return self.list_profiles()
+
+    def delete_profile(self, name):
+        self.profiles.remove(name)
+        return self.list_profiles()
+
+    def clips(self):
+        return sorted(self.audio_routing.clip_engine.names())
+
+    def add_clip(self, name, path, gain=1.0):
+        """Adds a clip from the sounds directory."""
+        self.audio_routing.clip_engine.add(name, confine_path(path, self.sounds_dir), gain)
+        return self.clips()
+
+    def play(self, name, gain=None):
+        return self.audio_routing.clip_engine.trigger(name, gain)
+
+    def stop_clips(self, name=None):
+        self.audio_routing.clip_engine.stop(name)
+
+    def replay(self, path, seconds=None):
+        """
+        Writes the last seconds of audio (all held by default) to a WAV file at
+        path in the recordings directory; returns the seconds written.
+        """
+        path = confine_path(path, self.recordings_dir)
+        return self.audio_routing.save_replay(path, float(seconds) if seconds else None).result(timeout=30.0)
+
+    def metrics(self, path=None, interval=5.0):
+        """Starts appending health metrics to path in the recordings directory, or stops if path is None."""
+        if path:
+            self.audio_routing.start_metrics_log(confine_path(path, self.recordings_dir), interval)
+        else:
+            self.audio_routing.stop_metrics_log()
+
+    def shutdown(self):
+        self.stopped.set()
+
+def parse_value(text):
+    """Command-line argument values are JSON where they parse as JSON, strings otherwise."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+def send(address, command, pairs, token_path=None):
+    """Sends one command to a running daemon and prints the reply; returns the exit code."""
+    args = {}
+    for pair in pairs:
+        key, _, value = pair.partition('=')
+        args[key] = parse_value(value)
+    client = ControlClient(address, token_path=token_path)
+    try:
+        print(json.dumps(client.request(command, **args), indent=2))
+    except (ControlError, OSError) as e:
+        print(f"\033[91m{command} failed: {e}\033[0m")
+        return 1
+    finally:
+        client.close()
+    return 0
+
+def main(argv=None):
+    working_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Route audio without the GUI, controlled over a local socket.")
+    parser.add_argument('--profile', help="Profile to start with (the default profile if omitted).")
+    parser.add_argument('--no-start', action='store_true', help="Wait for a start command instead of starting.")
+    parser.add_argument('--socket', help="Unix socket path, or host:port for TCP (default: json/daemon.sock).")
+    parser.add_argument('--metrics', help="Append audio health metrics to this file every few seconds.")
+    parser.add_argument('--send', nargs='+', metavar=('COMMAND', 'KEY=VALUE'),
+                        help="Send a command to a running daemon instead of starting one.")
+    args = parser.parse_args(argv)
+    json_dir = os.path.join(working_dir, 'json')
+    address = parse_address(args.socket) if args.socket else default_address(json_dir)
+
+    if args.send:
+        return send(address, args.send[0], args.send[1:], default_token_path(json_dir))
+
+    daemon = RoutingDaemon(working_dir, address)
+
+    # Ctrl+C and SIGTERM Stop Routing Cleanly
+    signal.signal(signal.SIGINT, lambda signum, frame: daemon.shutdown())
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, lambda signum, frame: daemon.shutdown())
+    daemon.run(args.profile, not args.no_start, args.metrics)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,10 +18,13 @@ import os
 from scripts.logic.loader import Loader
 from scripts.logic.audio import AudioValues
 from scripts.qt.audio_module import AudioSelectionWidget, AudioManipulation
+from scripts.qt.spectrum_widget import SpectrumWidget
+from scripts.qt.health_status import HealthStatusBar
+from scripts.qt.soundboard_widget import SoundboardWidget
 # from scripts.qt.menu_bar import MenuBar
 
 class MainApp(QMainWindow):
-    def __init__(self):
+    def __init__(self, metrics_path=None, daemon=None):
         # Clear Console.
         if sys.platform == 'win32': os.system('cls')
         else: os.system('clear')
@@ -34,8 +37,8 @@ class MainApp(QMainWindow):
         # Create Audio Volumes Instance
         self.audio_values = AudioValues()
         
-        # Load the Scripts for the Loader
-        self.loader = Loader(self.working_dir, self.audio_values)
+        # Load the Scripts for the Loader, Optionally Driving a Running Daemon Instead of Routing Audio Here
+        self.loader = Loader(self.working_dir, self.audio_values, daemon)
         
         super().__init__()
         self.setWindowTitle("Custom Soundboard Application")
@@ -58,11 +61,42 @@ class MainApp(QMainWindow):
         self.audio_manipulation = AudioManipulation(self.loader)
         audio_layout.addWidget(self.audio_manipulation, alignment=Qt.AlignTop)
         
+        # Create a spectrum widget
+        self.spectrum_widget = SpectrumWidget(self.loader)
+        audio_layout.addWidget(self.spectrum_widget)
+        
         # Add the audio layout to the main layout
         layout.addLayout(audio_layout)
+        
+        # Create a soundboard widget
+        self.soundboard_widget = SoundboardWidget(self.loader)
+        layout.addWidget(self.soundboard_widget, alignment=Qt.AlignTop)
+        
+        # Status Bar With Xruns and Callback Timing
+        self.setStatusBar(HealthStatusBar(self.loader.audio_routing))
+        
+        # Optionally Append the Same Metrics to a File
+        if metrics_path:
+            self.loader.audio_routing.start_metrics_log(metrics_path)
+    
+    def closeEvent(self, event):
+        # Flush the Last Metrics Line Before Exiting
+        self.loader.audio_routing.stop_metrics_log()
+        super().closeEvent(event)
 
 if __name__ == "__main__":
+    # --metrics FILE Appends Audio Health Metrics to FILE Every Few Seconds
+    metrics_path = None
+    if '--metrics' in sys.argv[:-1]:
+        metrics_path = sys.argv[sys.argv.index('--metrics') + 1]
+    
+    # --daemon [SOCKET] Runs as a Thin Client of daemon.py (json/daemon.sock by Default)
+    daemon = None
+    if '--daemon' in sys.argv:
+        following = sys.argv[sys.argv.index('--daemon') + 1:]
+        daemon = following[0] if following and not following[0].startswith('--') else ''
+    
     app = QApplication(sys.argv)
-    gui = MainApp()
+    gui = MainApp(metrics_path, daemon)
     gui.show()
     sys.exit(app.exec())
\ No newline at end of file
@@ -0,0 +1,6 @@
+import sys
+
+from scripts.logic.offline import main
+
+if __name__ == "__main__":
+    sys.exit(main())
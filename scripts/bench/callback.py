@@ -0,0 +1,192 @@
+"""
+Per-callback latency benchmark for AudioRouting.process_audio.
+
+Drives AudioRouting.process_audio with synthetic signals over a grid of
+buffer sizes, channel counts, sample rates and feature toggles, timing every
+callback. Times are reported as a fraction of the buffer's real-time budget
+(frames / sample rate): p50/p99/max of 1.0 means the callback used the whole
+budget. Results can be saved as JSON and compared between commits.
+
+Usage:
+    python -m scripts.bench.callback --save before.json
+    python -m scripts.bench.callback --save after.json --compare before.json
+    python -m scripts.bench.callback --full        # every combination
+    python -m scripts.bench.callback --frames 256 512 --channels 2 --rates 48000
+"""
+import argparse
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from scripts.logic.audio import AudioRouting, AudioValues
+
+SIGNALS = ('sine', 'noise', 'speech')
+FRAMES = (64, 128, 256, 512, 1024, 2048, 4096)
+CHANNELS = (1, 2, 4, 8)
+RATES = (16000, 44100, 48000, 96000)
+THRESHOLDS = (0.0, 0.0005, 0.005)
+
+def synthesize(signal, sample_rate, channels, seconds, seed=0):
+    """
+    Generates a (frames, channels) float32 test signal.
+
+    'sine' is a 440 Hz tone, 'noise' is white noise, and 'speech' is a
+    harmonic voice-like tone with a wandering pitch, gated into syllable
+    bursts separated by pauses with a low noise floor.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    if signal == 'sine':
+        mono = 0.5 * np.sin(2 * np.pi * 440 * t)
+    elif signal == 'noise':
+        mono = 0.2 * rng.standard_normal(len(t))
+    elif signal == 'speech':
+        # Harmonics of a Wandering 120-200 Hz Pitch, Rolling Off With Frequency
+        f0 = 160 + 40 * np.sin(2 * np.pi * 0.7 * t)
+        phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+        voice = sum(np.sin(k * phase) / k for k in range(1, 16))
+
+        # ~4 Syllables per Second, With Roughly a Third of the Time Silent
+        envelope = np.clip(np.sin(2 * np.pi * 4 * t) * 1.5 - 0.3, 0, 1)
+        pauses = np.repeat(rng.random(int(seconds * 2) + 1) > 0.3, int(sample_rate / 2) + 1)[:len(t)]
+        mono = 0.3 * voice * envelope * pauses + 0.001 * rng.standard_normal(len(t))
+    else:
+        raise ValueError(f"Unknown signal '{signal}'. Must be one of: {', '.join(SIGNALS)}.")
+
+    # Slightly Different Channels, so Per-Channel Processing Sees Real Data
+    gains = np.linspace(1.0, 0.7, channels)
+    return (mono[:, np.newaxis] * gains).astype(np.float32)
+
+def run_config(signal, frames, channels, sample_rate, spectrum, threshold, seconds, min_callbacks):
+    """
+    Times every callback for one configuration.
+
+    Returns:
+        dict: The configuration plus p50/p99/max/mean as fractions of the budget.
+    """
+    audio_values = AudioValues()
+    audio_values.set_spectrum(spectrum)
+    audio_values.set_noise_threshold(threshold)
+    routing = AudioRouting(None, audio_values)
+    routing.configure_stream(sample_rate, channels, frames)
+
+    # Pre-Split the Signal Into PortAudio-Style Byte Blocks
+    audio = synthesize(signal, sample_rate, channels, seconds)
+    blocks = [audio[i:i + frames].tobytes() for i in range(0, len(audio) - frames + 1, frames)]
+    callbacks = max(min_callbacks, len(blocks))
+
+    # Warm Up, Then Time Each Callback (Including the Byte View pyaudio_callback Takes)
+    process_audio = routing.process_audio
+    outdata = routing.buffers.output
+    for block in blocks[:10]:
+        process_audio(np.frombuffer(block, dtype=np.float32).reshape(frames, channels), outdata, frames, None, 0)
+    times = np.empty(callbacks, dtype=np.float64)
+    for i in range(callbacks):
+        block = blocks[i % len(blocks)]
+        start = time.perf_counter_ns()
+        process_audio(np.frombuffer(block, dtype=np.float32).reshape(frames, channels), outdata, frames, None, 0)
+        times[i] = time.perf_counter_ns() - start
+
+    budget_ns = frames / sample_rate * 1e9
+    fractions = times / budget_ns
+    return {
+        'signal': signal,
+        'frames': frames,
+        'channels': channels,
+        'sample_rate': sample_rate,
+        'spectrum': spectrum,
+        'threshold': threshold,
+        'callbacks': callbacks,
+        'budget_ms': budget_ns / 1e6,
+        'p50': float(np.percentile(fractions, 50)),
+        'p99': float(np.percentile(fractions, 99)),
+        'max': float(fractions.max()),
+        'mean': float(fractions.mean()),
+        'over_budget': int((fractions > 1.0).sum()),
+    }
+
+def config_key(result):
+    return (result['signal'], result['frames'], result['channels'], result['sample_rate'],
+            result['spectrum'], result['threshold'])
+
+def environment():
+    """Describes where the results came from, so saved runs can be told apart."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark per-callback latency of process_audio.")
+    parser.add_argument('--full', action='store_true', help="Run every combination of the grid below.")
+    parser.add_argument('--signals', nargs='+', default=None, choices=SIGNALS)
+    parser.add_argument('--frames', nargs='+', type=int, default=None)
+    parser.add_argument('--channels', nargs='+', type=int, default=None)
+    parser.add_argument('--rates', nargs='+', type=int, default=None)
+    parser.add_argument('--thresholds', nargs='+', type=float, default=None,
+                        help="Noise thresholds to run with the gate on; the gate-off run is always included.")
+    parser.add_argument('--seconds', type=float, default=2.0, help="Length of the generated signal.")
+    parser.add_argument('--min-callbacks', type=int, default=200)
+    parser.add_argument('--save', help="Write results to this JSON file.")
+    parser.add_argument('--compare', help="Compare p99 against results saved earlier.")
+    args = parser.parse_args(argv)
+
+    # By Default, Sweep Each Axis Around a Typical 1024-Frame Stereo 48 kHz Stream
+    if args.full:
+        grid = itertools.product(args.signals or SIGNALS, args.frames or FRAMES, args.channels or CHANNELS,
+                                 args.rates or RATES)
+        configs = list(grid)
+    elif any((args.signals, args.frames, args.channels, args.rates)):
+        configs = list(itertools.product(args.signals or ('speech',), args.frames or (1024,),
+                                         args.channels or (2,), args.rates or (48000,)))
+    else:
+        configs = [(signal, 1024, 2, 48000) for signal in SIGNALS]
+        configs += [('speech', frames, 2, 48000) for frames in FRAMES if frames != 1024]
+        configs += [('speech', 1024, channels, 48000) for channels in CHANNELS if channels != 2]
+        configs += [('speech', 1024, 2, rate) for rate in RATES if rate != 48000]
+    toggles = [(False, 0.0)] + [(True, threshold) for threshold in (args.thresholds or THRESHOLDS)]
+
+    results = []
+    print(f"{'signal':>7} {'frames':>6} {'ch':>3} {'rate':>6} {'gate':>4} {'thresh':>7} "
+          f"{'budget':>8} {'p50':>7} {'p99':>7} {'max':>7} {'over':>5}")
+    for (signal, frames, channels, sample_rate), (spectrum, threshold) in itertools.product(configs, toggles):
+        result = run_config(signal, frames, channels, sample_rate, spectrum, threshold, args.seconds, args.min_callbacks)
+        results.append(result)
+        print(f"{signal:>7} {frames:>6} {channels:>3} {sample_rate:>6} {'on' if spectrum else 'off':>4} {threshold:>7.4f} "
+              f"{result['budget_ms']:>6.2f}ms {result['p50']:>6.1%} {result['p99']:>6.1%} {result['max']:>6.1%} "
+              f"{result['over_budget']:>5}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = {config_key(result): result for result in json.load(f)['results']}
+        print(f"\n\033[94m-- p99 Against {args.compare} --\033[0m")
+        for result in results:
+            before = previous.get(config_key(result))
+            if before is None:
+                continue
+            change = result['p99'] / before['p99'] - 1 if before['p99'] else float('inf')
+            color = '\033[91m' if change > 0.1 else '\033[92m' if change < -0.1 else ''
+            print(f"{color}{' '.join(str(part) for part in config_key(result))}: "
+                  f"{before['p99']:.2%} -> {result['p99']:.2%} ({change:+.0%})\033[0m")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
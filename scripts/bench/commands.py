@@ -0,0 +1,241 @@
+"""
+Matching speed of the command registry, and the README commands run against
+local stand-in services.
+
+Part one indexes the README commands plus several hundred synthetic ones and
+times CommandRegistry.match on exact and misheard transcripts. Part two
+starts a local HTTP server (weather and webhook endpoints), a bare git
+repository and a backup source in a temporary directory. It then dispatches
+spoken commands through CommandDispatcher and checks their results, including
+timeouts, cancellation, the concurrency limit and rejection when too many are
+pending.
+
+Usage:
+    python -m scripts.bench.commands --commands 500
+"""
+import argparse
+import asyncio
+import http.server
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from scripts.logic.commands import CommandDispatcher, CommandRegistry
+from scripts.logic.command_handlers import DefaultCommands, Services, load_settings
+
+WORDS = ('open close start stop play pause volume mute lights kitchen office timer alarm note read mail '
+         'calendar music next previous record clip screen window focus rename share upload download sync '
+         'print scan lock unlock status battery network printer camera photo video stream chat call').split()
+
+# Transcript, Expected Command, Expected Slots
+EXPECTED = [
+    ("search for noise cancelling headphones", 'search', {'query': 'noise cancelling headphones'}),
+    ("hey agent search perplexity for rust async runtimes", 'search', {'engine': 'perplexity', 'query': 'rust async runtimes'}),
+    ("what's the weather in nine oh two one oh", 'weather', {'zip': '90210'}),
+    ("whats the whether in 10001", 'weather', {'zip': '10001'}),
+    ("back up documents", 'backup', {'target': 'documents'}),
+    ("push the agent repository", 'push', {'repo': 'agent'}),
+    ("send a message to team saying running late", 'message', {'channel': 'team', 'text': 'running late'}),
+    ("mesage team saying build is green", 'message', {'channel': 'team', 'text': 'build is green'}),
+]
+
+def synthetic(registry, count, rng):
+    """Registers count commands of two to four words, a third of them ending in a slot."""
+    phrases = set()
+    while len(phrases) < count:
+        words = ' '.join(rng.choice(WORDS, rng.integers(2, 5)))
+        phrases.add(words + (' {value}' if rng.random() < 0.33 else ''))
+    for i, phrase in enumerate(sorted(phrases)):
+        registry.add(f"synthetic_{i}", [phrase], lambda **slots: slots)
+    return sorted(phrases)
+
+def time_matches(registry, texts, repeats):
+    timings = []
+    for _ in range(repeats):
+        for text in texts:
+            start = time.perf_counter_ns()
+            registry.match(text)
+            timings.append(time.perf_counter_ns() - start)
+    return np.percentile(timings, 50) / 1000, np.percentile(timings, 99) / 1000
+
+class StandInServer(http.server.BaseHTTPRequestHandler):
+    """GET /weather/<zip> answers with a fixed forecast; POST /hook/<name> records the JSON body."""
+    posts = []
+
+    def do_GET(self):
+        body = f"{self.path.rsplit('/', 1)[-1]}: Sunny +21C".encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        StandInServer.posts.append((self.path, payload))
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+class StandInServices(Services):
+    """Real HTTP, subprocess and copying (all local), but the browser only records what it would open."""
+    def __init__(self):
+        super().__init__(http_timeout=2.0)
+        self.opened = []
+
+    def open_url(self, url):
+        self.opened.append(url)
+        return True
+
+def git(*args, cwd=None):
+    subprocess.run(['git', *args], cwd=cwd, check=True, capture_output=True)
+
+def stand_in_settings(directory, port):
+    """Backup source, a clone of a local bare repository with one unpushed commit, and webhook URLs."""
+    source = os.path.join(directory, 'documents')
+    os.makedirs(source)
+    for i in range(3):
+        with open(os.path.join(source, f"note_{i}.txt"), 'w') as f:
+            f.write("note " * 1000)
+
+    settings = load_settings('')
+    settings['weather_url'] = f"http://127.0.0.1:{port}/weather/{{zip}}"
+    settings['backups'] = {'documents': {'source': source, 'destination': os.path.join(directory, 'backups')}}
+    settings['webhooks'] = {'team': {'url': f"http://127.0.0.1:{port}/hook/team", 'kind': 'discord'},
+                            'ops': {'url': f"http://127.0.0.1:{port}/hook/ops", 'kind': 'slack'}}
+    if shutil.which('git'):
+        remote, clone = os.path.join(directory, 'remote.git'), os.path.join(directory, 'agent')
+        git('init', '--bare', '-q', remote)
+        git('clone', '-q', remote, clone)
+        git('-c', 'user.name=bench', '-c', 'user.email=bench@localhost', 'commit', '-q', '--allow-empty', '-m', 'bench', cwd=clone)
+        git('push', '-q', '-u', 'origin', 'HEAD', cwd=clone)
+        git('-c', 'user.name=bench', '-c', 'user.email=bench@localhost', 'commit', '-q', '--allow-empty', '-m', 'unpushed', cwd=clone)
+        settings['repositories'] = {'agent': clone}
+    return settings
+
+def check(label, ok, detail=''):
+    print(f"  {'ok  ' if ok else 'FAIL'} {label}{': ' + detail if detail else ''}")
+    return ok
+
+def run_handlers(directory):
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StandInServer)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    services = StandInServices()
+    settings = stand_in_settings(directory, server.server_address[1])
+    registry = DefaultCommands(settings, services).register(CommandRegistry())
+
+    # Commands With Known Timing, for Timeouts, Cancellation and the Concurrency Limit
+    active = []
+    peak = [0]
+
+    async def work(ms):
+        active.append(1)
+        peak[0] = max(peak[0], len(active))
+        try:
+            await asyncio.sleep(float(ms) / 1000)
+        finally:
+            active.pop()
+        return ms
+
+    def blocking(ms):
+        time.sleep(float(ms) / 1000)
+        return ms
+
+    registry.add('work', ["work for {ms:number} milliseconds"], work, timeout=2.0)
+    registry.add('slow', ["slow job {ms:number}"], lambda ms: work(ms), timeout=0.2)
+    registry.add('blocking', ["blocking job {ms:number}"], blocking, timeout=2.0)
+
+    dispatcher = CommandDispatcher(registry, max_concurrency=2, max_pending=8)
+    passed = True
+    try:
+        print("README commands against stand-in services:")
+        for text, name, _ in EXPECTED:
+            if name == 'push' and not settings['repositories']:
+                print("  skip push (git not found)")
+                continue
+            start = time.perf_counter()
+            future = dispatcher.dispatch(text)
+            dispatch_us = (time.perf_counter() - start) * 1e6
+            result = future.result(timeout=10) if future is not None else None
+            ok = result is not None and result.status == 'ok' and result.name == name
+            detail = f"{result.status} {result.value!r} in {result.elapsed * 1000:.0f} ms, dispatch {dispatch_us:.0f} us" if result else 'no match'
+            passed &= check(text, ok, detail)
+        passed &= check("browser opened", len(services.opened) == 2, ', '.join(services.opened))
+        passed &= check("webhooks posted", [path for path, _ in StandInServer.posts] == ['/hook/team', '/hook/team'],
+                        json.dumps(StandInServer.posts))
+        if settings['repositories']:
+            log = subprocess.run(['git', 'log', '--format=%s', '-1'], cwd=os.path.join(directory, 'remote.git'),
+                                 capture_output=True, text=True).stdout.strip()
+            passed &= check("remote received the push", log == 'unpushed', log)
+
+        print("Dispatcher behaviour:")
+        result = dispatcher.dispatch("slow job 5000").result(timeout=5)
+        passed &= check("timeout", result.status == 'timeout', f"{result.elapsed * 1000:.0f} ms")
+        result = dispatcher.dispatch("back up photos").result(timeout=5)
+        passed &= check("unknown backup target is an error", result.status == 'error', str(result.error))
+        result = dispatcher.dispatch("blocking job 50").result(timeout=5)
+        passed &= check("plain handler in the thread pool", result.status == 'ok', f"{result.elapsed * 1000:.0f} ms")
+
+        future = dispatcher.dispatch("work for 5000 milliseconds")
+        time.sleep(0.05)
+        cancelled = dispatcher.cancel_all('work')
+        result = future.result(timeout=5)
+        passed &= check("cancel", result.status == 'cancelled', f"after {result.elapsed * 1000:.0f} ms")
+
+        peak[0] = 0
+        futures = [dispatcher.dispatch("work for 100 milliseconds") for _ in range(12)]
+        results = [future.result(timeout=10) for future in futures]
+        statuses = [result.status for result in results]
+        passed &= check("concurrency limit", peak[0] <= 2, f"peak {peak[0]} running at once (limit 2)")
+        passed &= check("rejected beyond max_pending", statuses.count('ok') == 8 and statuses.count('rejected') == 4,
+                        f"{statuses.count('ok')} ok, {statuses.count('rejected')} rejected")
+        passed &= check("nothing left running", not dispatcher.running())
+        passed &= check("no match below min_score", dispatcher.dispatch("make me a sandwich") is None)
+    finally:
+        dispatcher.stop()
+        server.shutdown()
+    return passed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time command matching and run the commands against local stand-ins.")
+    parser.add_argument('--commands', type=int, default=500, help="Synthetic commands indexed next to the README ones.")
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    registry = DefaultCommands().register(CommandRegistry())
+    phrases = synthetic(registry, args.commands, rng)
+
+    print(f"Matching against {len(registry.commands)} commands:")
+    passed = True
+    for text, name, slots in EXPECTED:
+        match = registry.match(text)
+        ok = match is not None and match.command.name == name and match.slots == slots
+        passed &= check(text, ok, repr(match))
+
+    exact = [text for text, _, _ in EXPECTED if 'whether' not in text and 'mesage' not in text]
+    exact += [phrase.replace('{value}', 'the thing') for phrase in phrases[:50]]
+    misheard = ["whats the whether in 10001", "mesage team saying build is green", "serch for cheap flights",
+                "push the agent repozitory"]
+    p50, p99 = time_matches(registry, exact, args.repeats)
+    print(f"  exact matches:    p50 {p50:.1f} us, p99 {p99:.1f} us")
+    fuzzy50, fuzzy99 = time_matches(registry, misheard, args.repeats)
+    print(f"  misheard words:   p50 {fuzzy50:.1f} us, p99 {fuzzy99:.1f} us")
+    passed &= p50 < 100
+
+    with tempfile.TemporaryDirectory() as directory:
+        passed &= run_handlers(directory)
+    print("passed" if passed else "FAILED")
+    return 0 if passed else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+DSP worker check: the worker's output is the in-process output delayed by
+exactly latency_blocks blocks, chain edits reach the worker, a block too large
+for the worker restarts it without blocking the callback, and callback timing
+holds up while a "UI" thread keeps the GIL busy.
+
+The jitter runs pace process_audio at the block rate, as PortAudio would.
+Meanwhile a thread runs pure-Python work in short bursts, the way Qt signal
+handlers and repaints do. Each run reports the callback's mean, p99 and worst
+time and how many blocks overran their budget, in process and with the
+worker. The worker passes only with fewer blocks over budget, a lower p99 and
+no late blocks. On a single core it fails this (see scripts.logic.dsp_worker).
+
+Usage:
+    python -m scripts.bench.dsp_worker --seconds 10 --frames 256
+"""
+import argparse
+import sys
+import threading
+import time
+
+import numpy as np
+
+from scripts.logic.audio import AudioRouting, AudioValues
+
+def make_routing(rate, channels, frames):
+    routing = AudioRouting(None, AudioValues())
+    routing.audio_values.set_noise_threshold(0.3)
+    routing.audio_values.set_volume(80)
+    routing.effects.set_bypass('compressor', False)
+    routing.configure_stream(rate, channels, frames)
+    return routing
+
+def signal(rate, channels, frames, count, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(count * frames) / rate
+    tone = 0.3 * np.sin(2 * np.pi * 440 * t)[:, np.newaxis]
+    noise = 0.05 * rng.standard_normal((count * frames, channels))
+    return (tone + noise).astype(np.float32)
+
+def run_blocks(routing, audio, frames, pace=None):
+    """
+    Feeds audio through process_audio block by block (optionally paced at pace seconds per block).
+
+    Returns:
+        tuple: (output, per-block callback times in seconds)
+    """
+    count = len(audio) // frames
+    output = np.zeros_like(audio)
+    times = np.zeros(count)
+    outdata = np.zeros((frames, audio.shape[1]), dtype=np.float32)
+    start = time.perf_counter()
+    for i in range(count):
+        if pace:
+            time.sleep(max(0.0, start + i * pace - time.perf_counter()))
+        begin = time.perf_counter()
+        routing.process_audio(audio[i * frames:(i + 1) * frames], outdata, frames, None, 0)
+        times[i] = time.perf_counter() - begin
+        output[i * frames:(i + 1) * frames] = outdata
+    return output, times
+
+def busy_ui(stop, burst):
+    """Pure-Python work holding the GIL for about burst seconds at a time, with short gaps."""
+    while not stop.is_set():
+        end = time.perf_counter() + burst
+        total = 0
+        while time.perf_counter() < end:
+            total += sum(range(200))
+        time.sleep(0.001)
+
+def check(label, ok, detail):
+    print(f"  {'ok  ' if ok else 'FAIL'} {label}: {detail}")
+    return ok
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the DSP worker process's output and callback timing.")
+    parser.add_argument('--seconds', type=float, default=10.0, help="Audio per jitter run.")
+    parser.add_argument('--frames', type=int, default=256)
+    parser.add_argument('--channels', type=int, default=2)
+    parser.add_argument('--rate', type=int, default=48000)
+    parser.add_argument('--latency-blocks', type=int, default=2)
+    parser.add_argument('--burst', type=float, default=0.02, help="Seconds the UI thread holds the GIL per burst.")
+    args = parser.parse_args(argv)
+    rate, channels, frames, latency_blocks = args.rate, args.channels, args.frames, args.latency_blocks
+    budget = frames / rate
+
+    passed = True
+    audio = signal(rate, channels, frames, 400)
+
+    # Same Output as In Process, latency_blocks Later
+    reference, _ = run_blocks(make_routing(rate, channels, frames), audio, frames)
+    routing = make_routing(rate, channels, frames)
+    start = time.perf_counter()
+    worker = routing.enable_dsp_worker(latency_blocks)
+    print(f"worker started in {time.perf_counter() - start:.2f} s, latency {worker.latency * 1000:.2f} ms "
+          f"({latency_blocks} blocks)")
+    output, _ = run_blocks(routing, audio, frames, pace=budget)
+    stats = worker.stats()
+    shift = latency_blocks * frames
+    error = np.abs(output[shift:] - reference[:-shift]).max()
+    passed &= check("output is the in-process output, delayed", error < 1e-6 and stats['late'] == 0,
+                    f"max error {error:.2e} at a {shift}-frame shift, {stats['late']} late, {stats['stale']} stale")
+    passed &= check("first blocks are silence", not np.any(output[:shift]), f"{latency_blocks} blocks")
+
+    # Chain Edits Reach the Worker
+    reference_routing = make_routing(rate, channels, frames)
+    for chain in (routing.effects, reference_routing.effects):
+        chain.set_param('compressor', 'threshold_db', -30.0)
+        chain.set_bypass('limiter', False)
+        chain.move('volume', 0)
+    time.sleep(5 * worker.sync_interval)
+    tone = signal(rate, channels, frames, 200, seed=1)
+    reference, _ = run_blocks(reference_routing, tone, frames)
+    output, _ = run_blocks(routing, tone, frames, pace=budget)
+    # The Gate Keeps History, so Compare Once Both Have Settled
+    settled = 100 * frames
+    error = np.abs(output[settled + shift:] - reference[settled:-shift]).max()
+    passed &= check("edits mirrored", error < 1e-3, f"max error {error:.2e} after set_param, set_bypass and move")
+
+    # A Block Larger Than the Rings (PortAudio Growing the Buffer Mid-Stream) Reconfigures From the
+    # Callback, Which Must Fall Back to In-Process Processing Rather Than Wait for a New Process
+    grown = worker.max_frames * 2
+    start = time.perf_counter()
+    routing.configure_stream(rate, channels, grown)
+    blocked = time.perf_counter() - start
+    fallback = routing.dsp_worker is None
+    deadline = time.perf_counter() + 30.0
+    while routing.dsp_worker is None and time.perf_counter() < deadline:
+        time.sleep(0.05)
+    restarted = time.perf_counter() - start
+    passed &= check("outgrown worker restarts off the callback",
+                    fallback and blocked < 0.05 and routing.dsp_worker is not None
+                    and routing.dsp_worker.fits(rate, channels, grown),
+                    f"configure_stream returned in {blocked * 1000:.1f} ms, new worker ready after {restarted:.2f} s")
+    worker = routing.dsp_worker
+    routing.disable_dsp_worker()
+    passed &= check("worker stopped", routing.dsp_worker is None and worker.process is None, "process joined")
+
+    # Callback Timing With a Busy UI Thread
+    count = int(args.seconds * rate / frames)
+    jitter_audio = signal(rate, channels, frames, count, seed=2)
+    results = {}
+    late = 0
+    for label in ('in process', 'worker'):
+        routing = make_routing(rate, channels, frames)
+        if label == 'worker':
+            routing.enable_dsp_worker(latency_blocks)
+        stop = threading.Event()
+        thread = threading.Thread(target=busy_ui, args=(stop, args.burst), daemon=True)
+        thread.start()
+        _, times = run_blocks(routing, jitter_audio, frames, pace=budget)
+        stop.set()
+        thread.join()
+        if routing.dsp_worker is not None:
+            late = routing.dsp_worker.stats()['late']
+        routing.disable_dsp_worker()
+        results[label] = times
+        print(f"{label}: callback mean {times.mean() * 1e6:.0f} us, p99 {np.percentile(times, 99) * 1e6:.0f} us, "
+              f"worst {times.max() * 1e6:.0f} us, {int(np.sum(times > budget))} over the {budget * 1e6:.0f} us budget"
+              f"{f', {late} late' if label == 'worker' else ''}")
+    over = {label: int(np.sum(times > budget)) for label, times in results.items()}
+    p99 = {label: np.percentile(times, 99) for label, times in results.items()}
+    passed &= check("worker shortens the tail",
+                    over['worker'] < over['in process'] and p99['worker'] < p99['in process'] and late == 0,
+                    f"{over['worker']} vs {over['in process']} blocks over budget, p99 {p99['worker'] * 1e6:.0f} us "
+                    f"vs {p99['in process'] * 1e6:.0f} us, {late} late")
+
+    print("passed" if passed else "FAILED")
+    return 0 if passed else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
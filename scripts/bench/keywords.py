@@ -0,0 +1,200 @@
+"""
+False accepts, misses, latency and CPU cost of the keyword spotter.
+
+Synthesizes "words" as sequences of formant-shaped voiced syllables (plus a
+hissing fricative). The keyword is enrolled from a few WAV renditions. Then a
+long stream is fed to KeywordSpotter.process in 50 ms chunks, the way the VAD
+monitor feeds it. The stream mixes renditions of the keyword at other tempos,
+pitches and levels with distractor words, hard negatives (half the keyword,
+the keyword reversed, the keyword with one syllable swapped) and background
+noise. Each threshold is scored separately, always including the spotter's
+default, whose detection rate and false accepts per hour are summed up last
+and must meet --min-detected, --max-fa-other and --max-fa-hard. False accepts
+per hour are counted per hour of other words; 10 minutes hold under two
+minutes of them, so one false accept there already reads as about 34 per hour
+and a finer rate needs a long run (--minutes 300).
+
+Usage:
+    python -m scripts.bench.keywords --minutes 10 --thresholds 0.22 0.24 0.26 0.28 0.3
+"""
+import argparse
+import os
+import sys
+import tempfile
+import wave
+
+import numpy as np
+
+from scripts.logic.keywords import KeywordSpotter
+
+RATE = 16000
+
+# Formants (Hz) of the Synthetic Vowels; 's' Is a Fricative (High-Passed Noise)
+VOWELS = {
+    'a': (800, 1200, 2500),
+    'e': (500, 1900, 2500),
+    'i': (300, 2300, 3000),
+    'o': (500, 900, 2400),
+    'u': (320, 800, 2300),
+    'ae': (650, 1700, 2400),
+}
+SYLLABLES = tuple(VOWELS) + ('s',)
+KEYWORD = ('o', 'ae', 's', 'i')
+
+def say(word, rng, tempo=1.0, pitch=1.0, level=0.1):
+    """Renders a word (a sequence of syllables) as mono float32 audio at RATE."""
+    parts = []
+    f0 = 130 * pitch
+    for syllable in word:
+        length = int(RATE * rng.uniform(0.15, 0.2) / tempo)
+        t = np.arange(length) / RATE
+        if syllable == 's':
+            noise = rng.standard_normal(length)
+            spectrum = np.fft.rfft(noise)
+            spectrum[np.fft.rfftfreq(length, 1 / RATE) < 3500] = 0
+            sound = np.fft.irfft(spectrum, length) * 0.6
+        else:
+            # Harmonics Weighted by Their Distance From Each Formant, on a Falling Pitch
+            contour = f0 * (1.05 - 0.1 * t / t[-1])
+            phase = 2 * np.pi * np.cumsum(contour) / RATE
+            sound = np.zeros(length)
+            for k in range(1, int(4000 / f0)):
+                weight = sum(np.exp(-((k * f0 - formant) / 120.0) ** 2) for formant in VOWELS[syllable])
+                sound += (weight + 0.02) * np.sin(k * phase)
+            f0 *= 0.97
+        envelope = np.minimum(1.0, np.minimum(t, t[-1] - t) / 0.02)
+        parts.append(sound * envelope)
+    audio = np.concatenate(parts)
+    return (level * audio / (np.sqrt(np.mean(audio ** 2)) + 1e-12)).astype(np.float32)
+
+def write_wav(path, audio):
+    with wave.open(path, 'wb') as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(RATE)
+        writer.writeframes((np.clip(audio, -1, 1) * 32767).astype(np.int16).tobytes())
+
+def hard_negatives(rng):
+    swapped = list(KEYWORD)
+    swapped[rng.integers(len(swapped))] = rng.choice([s for s in SYLLABLES if s not in KEYWORD])
+    return [KEYWORD[:2], KEYWORD[::-1], tuple(swapped)]
+
+def build_stream(seconds, rng, noise_db):
+    """
+    Returns (audio, keyword (start, end) times, other words as (start, end, 'hard' or 'other')).
+    """
+    total = int(seconds * RATE)
+    audio = np.zeros(total, dtype=np.float32)
+    keywords = []
+    others = []
+    position = 1.0
+    while True:
+        roll = rng.random()
+        if roll < 0.25:
+            word, kind = KEYWORD, 'keyword'
+        elif roll < 0.45:
+            word, kind = hard_negatives(rng)[rng.integers(3)], 'hard'
+        else:
+            word, kind = tuple(rng.choice(SYLLABLES, rng.integers(2, 6))), 'other'
+            if word == KEYWORD:
+                continue
+        rendition = say(word, rng, rng.uniform(0.8, 1.25), rng.uniform(0.85, 1.2), 10 ** (rng.uniform(-30, -14) / 20))
+        start = int(position * RATE)
+        if start + len(rendition) >= total:
+            break
+        audio[start:start + len(rendition)] += rendition
+        end = position + len(rendition) / RATE
+        if kind == 'keyword':
+            keywords.append((position, end))
+        else:
+            others.append((position, end, kind))
+        position = end + rng.uniform(0.5, 2.0)
+    audio += (10 ** (noise_db / 20) * rng.standard_normal(total)).astype(np.float32)
+    return audio, keywords, others
+
+def run(spotter, audio, keywords, others, chunk):
+    """
+    Feeds the stream and matches events to keyword occurrences.
+
+    Returns:
+        tuple: Indexes of the keywords found, false accepts by the kind of word they fired on, and latencies.
+    """
+    spotter.reset()
+    events = []
+    for i in range(0, len(audio), chunk):
+        events += spotter.process(audio[i:i + chunk])
+
+    latencies = []
+    found = set()
+    false = {'hard': 0, 'other': 0, 'noise': 0}
+    for event in events:
+        match = [k for k, (start, end) in enumerate(keywords) if start - 0.1 <= event.time <= end + 0.5]
+        if match:
+            if match[0] not in found:
+                found.add(match[0])
+                latencies.append(event.time - keywords[match[0]][1])
+            continue
+        kinds = [kind for start, end, kind in others if start - 0.1 <= event.time <= end + 0.5]
+        false[kinds[0] if kinds else 'noise'] += 1
+    return found, false, latencies
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check keyword spotting false accepts, misses, latency and CPU cost.")
+    parser.add_argument('--minutes', type=float, default=10.0)
+    parser.add_argument('--enroll', type=int, default=3, help="WAV renditions the keyword is enrolled from.")
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[0.22, 0.24, 0.26, 0.28, 0.3, 0.32])
+    parser.add_argument('--noise-db', type=float, default=-50.0, help="Background noise level in dBFS.")
+    parser.add_argument('--chunk-ms', type=float, default=50.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--min-detected', type=float, default=0.85, help="Share of keywords the default threshold must find.")
+    parser.add_argument('--max-fa-other', type=float, default=10.0,
+                        help="False accepts per hour of other words allowed at the default threshold.")
+    parser.add_argument('--max-fa-hard', type=float, default=150.0,
+                        help="False accepts per hour of hard negatives allowed at the default threshold.")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for i in range(args.enroll):
+            paths.append(os.path.join(directory, f"keyword_{i}.wav"))
+            write_wav(paths[-1], say(KEYWORD, rng, rng.uniform(0.9, 1.1), rng.uniform(0.9, 1.1)))
+        audio, keywords, others = build_stream(args.minutes * 60, rng, args.noise_db)
+        spotter = KeywordSpotter(RATE)
+        spotter.enroll('keyword', paths)
+
+    chunk = int(RATE * args.chunk_ms / 1000)
+    hours = {kind: sum(end - start for start, end, other in others if other == kind) / 3600 for kind in ('hard', 'other')}
+    print(f"{len(keywords)} keywords, {hours['hard'] * 3600:.0f} s of hard negatives and {hours['other'] * 3600:.0f} s "
+          f"of other words in {args.minutes:.1f} min (noise {args.noise_db:.0f} dBFS), enrolled from {args.enroll} WAVs")
+    print(f"{'threshold':>9} {'detected':>9} {'FA hard':>8} {'FA other':>9} {'FA noise':>9} {'FA/h other':>11} "
+          f"{'latency p50':>12} {'p95':>6} {'cpu':>7}")
+    passed = True
+    default = spotter.threshold
+    results = {}
+    for threshold in sorted(set(args.thresholds) | {default}):
+        spotter.end_thresholds[:] = threshold
+        spotter.busy_seconds = spotter.audio_seconds = 0.0
+        found, false, latencies = run(spotter, audio, keywords, others, chunk)
+        load = spotter.busy_seconds / spotter.audio_seconds
+        p50 = np.percentile(latencies, 50) * 1000 if latencies else float('nan')
+        p95 = np.percentile(latencies, 95) * 1000 if latencies else float('nan')
+        results[threshold] = (len(found) / len(keywords), false['other'] / hours['other'], false['hard'] / hours['hard'])
+        print(f"{threshold:>9.2f} {results[threshold][0]:>9.1%} {false['hard']:>8} {false['other']:>9} "
+              f"{false['noise']:>9} {results[threshold][1]:>11.1f} {p50:>10.0f}ms {p95:>4.0f}ms {load:>7.3%}"
+              f"{'  (default)' if threshold == default else ''}")
+        passed = passed and load < 0.01
+    detected, other_rate, hard_rate = results[default]
+    print(f"Default threshold {default:.2f}: {detected:.1%} of keywords detected at {other_rate:.1f} false accepts "
+          f"per hour of other words ({hard_rate:.1f} per hour of hard negatives)")
+    if detected < args.min_detected or other_rate > args.max_fa_other or hard_rate > args.max_fa_hard:
+        print(f"\033[91mDefault threshold misses its targets: at least {args.min_detected:.0%} detected, at most "
+              f"{args.max_fa_other:.1f} and {args.max_fa_hard:.1f} false accepts per hour of other words and hard "
+              f"negatives\033[0m")
+        passed = False
+    print("Hard negatives: the keyword's first half, reversed, or with one syllable swapped. "
+          "Latency is from the end of the keyword (negative: fired before its trailing decay ended).")
+    return 0 if passed else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
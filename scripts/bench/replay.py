@@ -0,0 +1,145 @@
+"""
+Instant-replay buffer check: per-block write cost and allocations, exact
+snapshots (views and copies), copies that are never torn while the callback
+keeps writing, and saving through the voice command.
+
+Frames carry their own index as the sample value (exact in float32 up to
+2**24), so any snapshot can be checked for being one unbroken, newest run.
+
+Usage:
+    python -m scripts.bench.replay --seconds 30 --rate 48000 --channels 2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import wave
+
+import numpy as np
+
+from scripts.logic.audio import AudioRouting, AudioValues
+from scripts.logic.buffers import ReplayBuffer
+from scripts.logic.commands import CommandDispatcher, CommandRegistry
+from scripts.logic.command_handlers import RoutingCommands
+
+def indexed_block(start, frames, channels):
+    values = np.arange(start, start + frames, dtype=np.float64) % (1 << 24)
+    return np.repeat(values[:, np.newaxis], channels, axis=1).astype(np.float32)
+
+def unbroken(audio):
+    """True if the frames are consecutive indexes (modulo 2**24) and every channel agrees."""
+    if len(audio) < 2:
+        return True
+    steps = np.diff(audio[:, 0].astype(np.int64)) % (1 << 24)
+    return bool(np.all(steps == 1) and np.all(audio == audio[:, :1]))
+
+def check(label, ok, detail):
+    print(f"  {'ok  ' if ok else 'FAIL'} {label}: {detail}")
+    return ok
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the instant-replay buffer.")
+    parser.add_argument('--seconds', type=float, default=30.0)
+    parser.add_argument('--rate', type=int, default=48000)
+    parser.add_argument('--channels', type=int, default=2)
+    parser.add_argument('--frames', type=int, default=480, help="Block size the callback writes.")
+    args = parser.parse_args(argv)
+    rate, channels, frames = args.rate, args.channels, args.frames
+
+    passed = True
+    replay = ReplayBuffer(args.seconds, rate, channels)
+    expected = replay.capacity * channels * 4
+    print(f"ReplayBuffer: {args.seconds:g} s held + {(replay.capacity - replay.length) / rate:g} s headroom, "
+          f"{replay.nbytes / 2 ** 20:.1f} MiB")
+    passed &= check("memory known up front", replay.nbytes == expected, f"{replay.nbytes} B")
+
+    # Write Cost and Allocations per Block
+    blocks = [indexed_block(i * frames, frames, channels) for i in range(64)]
+    for block in blocks[:8]:
+        replay.write(block)
+    count = int(3 * args.seconds * rate / frames)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    for i in range(count):
+        replay.write(blocks[i % len(blocks)])
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    passed &= check("write cost", elapsed / count < frames / rate * 0.01,
+                    f"{elapsed / count * 1e6:.2f} us per {frames}-frame block, {peak} B traced over {count} blocks")
+
+    # Exact Snapshots After Wrapping Several Times
+    replay.reset()
+    position = 0
+    while position < 2.5 * replay.capacity + 123:
+        replay.write(indexed_block(position, frames, channels))
+        position += frames
+    copy = replay.snapshot()
+    views = replay.snapshot(copy=False)
+    newest = indexed_block(position - replay.length, replay.length, channels)
+    passed &= check("copy is the newest audio", np.array_equal(copy, newest), f"{len(copy)} frames")
+    passed &= check("views match the copy", np.array_equal(np.concatenate(views), copy),
+                    f"{len(views)} view(s), zero-copy: {all(view.base is replay.data for view in views)}")
+    five = replay.snapshot(5.0)
+    passed &= check("partial snapshot", np.array_equal(five, newest[-5 * rate:]), f"{len(five) / rate:g} s")
+
+    # Copies Taken While a Writer Thread Runs Flat Out Are Never Torn
+    stop = threading.Event()
+
+    def writer():
+        index = position
+        while not stop.is_set():
+            replay.write(indexed_block(index, frames, channels))
+            index += frames
+
+    thread = threading.Thread(target=writer, daemon=True)
+    thread.start()
+    torn = 0
+    lengths = []
+    for _ in range(50):
+        snapshot = replay.snapshot()
+        lengths.append(len(snapshot))
+        torn += not unbroken(snapshot)
+    stop.set()
+    thread.join()
+    passed &= check("concurrent copies never torn", torn == 0,
+                    f"{torn} torn of 50, {min(lengths) / rate:.2f}-{max(lengths) / rate:.2f} s each")
+
+    # Saving Through AudioRouting and the Voice Command
+    with tempfile.TemporaryDirectory() as directory:
+        routing = AudioRouting(None, AudioValues())
+        routing.audio_values.set_spectrum(False)
+        routing.configure_stream(rate, channels, frames)
+        routing.enable_replay(args.seconds)
+        outdata = np.zeros((frames, channels), dtype=np.float32)
+        rng = np.random.default_rng(0)
+        block = (0.1 * rng.standard_normal((frames, channels))).astype(np.float32)
+        for _ in range(int(40 * rate / frames)):
+            routing.process_audio(block, outdata, frames, None, 0)
+
+        registry = RoutingCommands(routing, directory).register(CommandRegistry())
+        dispatcher = CommandDispatcher(registry)
+        future = dispatcher.dispatch("save the last thirty seconds")
+        result = future.result(timeout=30) if future is not None else None
+        dispatcher.stop()
+        ok = result is not None and result.status == 'ok' and os.path.exists(result.value)
+        detail = 'no match'
+        if ok:
+            with wave.open(result.value, 'rb') as reader:
+                saved = reader.getnframes() / reader.getframerate()
+            ok = abs(saved - 30.0) < frames / rate
+            detail = f"{os.path.basename(result.value)}, {saved:.2f} s in {result.elapsed * 1000:.0f} ms"
+        elif result is not None:
+            detail = f"{result.status} {result.error}"
+        passed &= check("voice command saves 30 s", ok, detail)
+
+    print("passed" if passed else "FAILED")
+    return 0 if passed else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+CPU cost of the STFT spectral gate against the previous block-wise gate.
+
+The legacy path is the original process_audio noise gate: an unwindowed
+complex FFT over the first channel only, bins below the threshold zeroed, a
+complex inverse FFT, and the result stacked across every channel. The STFT
+path is SpectralGate as used by AudioRouting, gating each channel.
+
+Usage:
+    python -m scripts.bench.spectral_gate --callbacks 2000 --rate 44100 --channels 2
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+from scipy.fftpack import fft, ifft
+
+from scripts.logic.stft import SpectralGate
+
+def legacy_gate(block, noise_threshold):
+    """The original block-wise gate from process_audio, kept as the baseline."""
+    n = len(block)
+    complete_fft_result = fft(block[:, 0])
+    mask = np.abs(complete_fft_result) / n < noise_threshold
+    filtered_fft = complete_fft_result.copy()
+    filtered_fft[mask] = 0
+    filtered_fft[0] = complete_fft_result[0]
+    if n % 2 == 0:
+        filtered_fft[n // 2] = complete_fft_result[n // 2]
+    reconstructed_audio = ifft(filtered_fft).real
+    return np.column_stack([reconstructed_audio] * block.shape[1])
+
+def time_callbacks(run, blocks, callbacks):
+    """Returns the mean seconds per call of run(block)."""
+    start = time.perf_counter()
+    for i in range(callbacks):
+        run(blocks[i % len(blocks)])
+    return (time.perf_counter() - start) / callbacks
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare per-callback CPU of the legacy and STFT noise gates.")
+    parser.add_argument('--callbacks', type=int, default=2000)
+    parser.add_argument('--rate', type=int, default=44100)
+    parser.add_argument('--window-size', type=int, default=1024)
+    parser.add_argument('--hop', type=int, default=512)
+    parser.add_argument('--window', default='hann')
+    parser.add_argument('--threshold', type=float, default=0.0005)
+    parser.add_argument('--channels', type=int, default=2)
+    args = parser.parse_args(argv)
+
+    print(f"STFT window={args.window} size={args.window_size} hop={args.hop} "
+          f"latency={args.window_size / args.rate * 1000:.1f} ms")
+    print(f"{'frames':>6} {'ch':>3} {'legacy us':>10} {'stft us':>10} {'legacy %':>9} {'stft %':>7} {'ratio':>6}")
+
+    # Block Sizes at the Requested Channel Count, Then Channel Scaling at 1024 Frames
+    configs = [(frames, args.channels) for frames in (256, 512, 1024, 2048, 4096)]
+    configs += [(1024, channels) for channels in (1, 2, 4, 8) if channels != args.channels]
+
+    rng = np.random.default_rng(0)
+    for frames, channels in configs:
+        blocks = [(0.1 * rng.standard_normal((frames, channels))).astype(np.float32) for _ in range(16)]
+        out = np.zeros((frames, channels), dtype=np.float32)
+        gate = SpectralGate(args.rate, args.window_size, args.hop, args.window, channels)
+
+        legacy = time_callbacks(lambda block: legacy_gate(block, args.threshold), blocks, args.callbacks)
+        stft = time_callbacks(lambda block: gate.process(block, out, args.threshold), blocks, args.callbacks)
+
+        # Share of the Real-Time Budget (frames / rate) Each Callback Uses
+        budget = frames / args.rate
+        print(f"{frames:>6} {channels:>3} {legacy * 1e6:>10.1f} {stft * 1e6:>10.1f} "
+              f"{legacy / budget * 100:>8.2f}% {stft / budget * 100:>6.2f}% {stft / legacy:>6.2f}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
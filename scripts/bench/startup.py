@@ -0,0 +1,195 @@
+"""
+Startup benchmark: import time per module and time to the first audio callback.
+
+Every measurement runs in a fresh interpreter, so module caches from one
+measurement never hide the cost of another. The run fails if a module on the
+audio path imports a heavy optional dependency at load time, if the headless
+daemon pulls in Qt, or, when a baseline is given, if any timing regresses
+beyond the tolerance.
+
+Usage:
+    python -m scripts.bench.startup --save startup.json
+    python -m scripts.bench.startup --baseline startup.json --tolerance 1.5
+    python -m scripts.bench.startup --device   # also open the default devices
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Modules Timed Individually, Roughly in Dependency Order
+MODULES = [
+    'numpy',
+    'scripts.logic.buffers',
+    'scripts.logic.stft',
+    'scripts.logic.spectrum',
+    'scripts.logic.audio',
+    'scripts.logic.loader',
+    'daemon',
+    'PySide6.QtWidgets',
+    'main',
+]
+
+# Dependencies That Must Not Load Until Their Feature Is Used
+HEAVY_MODULES = ['scipy', 'librosa', 'matplotlib', 'pydub', 'transformers', 'torch', 'PySide6']
+
+# Imports the Audio Path, Then Reports Which Heavy Modules Came Along
+HEAVY_CHECK = """
+import json, sys
+import scripts.logic.audio
+print(json.dumps(sorted(name for name in {heavy!r} if name in sys.modules)))
+"""
+
+# The Headless Daemon Must Start Without Qt
+DAEMON_CHECK = """
+import json, sys
+import daemon
+print(json.dumps('PySide6' in sys.modules))
+"""
+
+# Time From Interpreter Start of This Script to the First Processed Block, Without Devices
+SIMULATED_FIRST_CALLBACK = """
+import time
+start = time.perf_counter()
+import json
+import numpy as np
+from scripts.logic.audio import AudioRouting, AudioValues
+imported = time.perf_counter()
+routing = AudioRouting(None, AudioValues())
+routing.configure_stream(44100, 2, 1024)
+configured = time.perf_counter()
+routing.pyaudio_callback(np.zeros((1024, 2), dtype=np.float32).tobytes(), 1024, {}, 0)
+done = time.perf_counter()
+print(json.dumps({'import_ms': (imported - start) * 1000, 'configure_ms': (configured - imported) * 1000,
+                  'first_callback_ms': (done - start) * 1000}))
+"""
+
+# Same, but Through PyAudio With the Default Input and Output Devices
+DEVICE_FIRST_CALLBACK = """
+import time
+start = time.perf_counter()
+import contextlib, json, sys, threading
+from scripts.logic.audio import AudioDevices, AudioRouting, AudioValues
+imported = time.perf_counter()
+with contextlib.redirect_stdout(sys.stderr):
+    devices = AudioDevices()
+initialized = time.perf_counter()
+routing = AudioRouting(devices, AudioValues())
+first = threading.Event()
+process_audio = routing.process_audio
+def probe(*args):
+    first.set()
+    return process_audio(*args)
+routing.process_audio = probe
+output_index = devices.p.get_default_output_device_info()['index']
+input_index = devices.p.get_default_input_device_info()['index']
+with contextlib.redirect_stdout(sys.stderr):
+    routing.start_route(output_index, input_index, output_index)
+ok = first.wait(5)
+done = time.perf_counter()
+with contextlib.redirect_stdout(sys.stderr):
+    routing.stop_route()
+print(json.dumps({'import_ms': (imported - start) * 1000, 'pyaudio_init_ms': (initialized - imported) * 1000,
+                  'first_callback_ms': (done - start) * 1000 if ok else None}))
+"""
+
+def run_python(args):
+    """Runs a fresh interpreter from the repository root and returns (stdout, stderr)."""
+    result = subprocess.run([sys.executable] + args, cwd=REPO_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed")
+    return result.stdout, result.stderr
+
+def import_time_ms(module):
+    """Cumulative import time of a module in a fresh interpreter, from -X importtime."""
+    _, stderr = run_python(['-X', 'importtime', '-c', f'import {module}'])
+    for line in stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1000
+    return None
+
+def measure(repeat, device):
+    """
+    Runs every measurement `repeat` times and keeps the fastest.
+
+    Returns:
+        dict: Flat metric name -> milliseconds (None if unavailable), plus the heavy module list.
+    """
+    results = {}
+    for module in MODULES:
+        try:
+            times = [import_time_ms(module) for _ in range(repeat)]
+            results[f'import.{module}'] = min(t for t in times if t is not None)
+        except (RuntimeError, ValueError) as e:
+            print(f"Skipping import of {module}: {e}", file=sys.stderr)
+            results[f'import.{module}'] = None
+
+    stdout, _ = run_python(['-c', HEAVY_CHECK.format(heavy=HEAVY_MODULES)])
+    results['heavy_modules'] = json.loads(stdout)
+    stdout, _ = run_python(['-c', DAEMON_CHECK])
+    results['daemon_imports_qt'] = json.loads(stdout)
+
+    scripts = [('simulated', SIMULATED_FIRST_CALLBACK)]
+    if device:
+        scripts.append(('device', DEVICE_FIRST_CALLBACK))
+    for name, script in scripts:
+        runs = [json.loads(run_python(['-c', script])[0]) for _ in range(repeat)]
+        for key in runs[0]:
+            values = [run[key] for run in runs if run[key] is not None]
+            results[f'{name}.{key}'] = min(values) if values else None
+    return results
+
+def compare(results, baseline, tolerance, min_delta):
+    """Returns the metrics that regressed beyond the tolerance and by at least min_delta ms."""
+    regressions = []
+    for key, value in results.items():
+        reference = baseline.get(key)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not isinstance(reference, (int, float)):
+            continue
+        if value > reference * tolerance and value - reference >= min_delta:
+            regressions.append((key, reference, value))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure import and first-callback startup times.")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--device', action='store_true', help="Also open the default audio devices.")
+    parser.add_argument('--save', help="Write the results to this JSON file.")
+    parser.add_argument('--baseline', help="Compare against results saved earlier.")
+    parser.add_argument('--tolerance', type=float, default=1.5, help="Allowed slowdown factor against the baseline.")
+    parser.add_argument('--min-delta', type=float, default=20.0, help="Ignore slowdowns smaller than this many ms.")
+    args = parser.parse_args(argv)
+
+    results = measure(args.repeat, args.device)
+    for key, value in results.items():
+        if key in ('heavy_modules', 'daemon_imports_qt'):
+            continue
+        print(f"{key:<40} {'n/a' if value is None else f'{value:8.1f} ms'}")
+
+    failed = False
+    if results['heavy_modules']:
+        print(f"\033[91mscripts.logic.audio imports heavy modules at load: {', '.join(results['heavy_modules'])}\033[0m")
+        failed = True
+    if results['daemon_imports_qt']:
+        print(f"\033[91mdaemon.py imports PySide6\033[0m")
+        failed = True
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_delta)
+        for key, reference, value in regressions:
+            print(f"\033[91mRegression: {key} {reference:.1f} ms -> {value:.1f} ms\033[0m")
+        failed |= bool(regressions)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
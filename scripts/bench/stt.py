@@ -0,0 +1,127 @@
+"""
+Throughput, latency and load shedding of the speech-to-text worker pool.
+
+Runs SpeechToText offline with a locally constructed model, so nothing is
+downloaded. Synthetic speech segments arrive at a chosen rate and the script
+reports how many were batched, transcribed or shed, and their queue and total
+latency.
+
+Models:
+    toy           NumPy stand-in whose cost is a fixed part per batch plus a part per second of audio
+                  (batching pays off exactly as it does for a real model). Needs nothing extra.
+    tiny-whisper  A randomly initialized two-layer Whisper built from a config (needs transformers and torch);
+                  it exercises the real feature extraction and generation path, its "text" is token ids.
+
+Usage:
+    python -m scripts.bench.stt --segments 60 --arrival 8 --workers 2
+    python -m scripts.bench.stt --model tiny-whisper --segments 20
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from scripts.logic.stt import SpeechToText
+
+class ToyModel:
+    """
+    Stand-in model: "transcribes" each segment as its duration and level after
+    burning batch_cost + audio_cost * (seconds of audio) of CPU.
+    """
+    def __init__(self, batch_cost=0.08, audio_cost=0.02):
+        self.batch_cost = batch_cost
+        self.audio_cost = audio_cost
+
+    def __call__(self, audio, lengths, sample_rate):
+        deadline = time.perf_counter() + self.batch_cost + self.audio_cost * lengths.sum() / sample_rate
+        while time.perf_counter() < deadline:
+            pass
+        return [f"{length / sample_rate:.2f}s rms={np.sqrt(np.mean(row[:length] ** 2)):.3f}"
+                for row, length in zip(audio, lengths)]
+
+class TinyWhisper:
+    """A randomly initialized, tiny Whisper built locally from a config."""
+    def __init__(self):
+        import torch
+        from transformers import WhisperConfig, WhisperFeatureExtractor, WhisperForConditionalGeneration
+        torch.manual_seed(0)
+        config = WhisperConfig(vocab_size=256, d_model=64, encoder_layers=2, decoder_layers=2,
+                               encoder_attention_heads=2, decoder_attention_heads=2, encoder_ffn_dim=128,
+                               decoder_ffn_dim=128, max_source_positions=1500, max_target_positions=64,
+                               decoder_start_token_id=1, pad_token_id=0, eos_token_id=2, bos_token_id=1)
+        self.model = WhisperForConditionalGeneration(config).eval()
+        self.features = WhisperFeatureExtractor(feature_size=config.num_mel_bins)
+        self.torch = torch
+
+    def __call__(self, audio, lengths, sample_rate):
+        inputs = self.features([row[:length] for row, length in zip(audio, lengths)],
+                               sampling_rate=sample_rate, return_tensors='pt')
+        with self.torch.inference_mode():
+            ids = self.model.generate(inputs.input_features, max_new_tokens=8)
+        return [' '.join(str(int(token)) for token in row) for row in ids]
+
+MODELS = {
+    'toy': ToyModel,
+    'tiny-whisper': TinyWhisper,
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check speech-to-text batching, latency and load shedding.")
+    parser.add_argument('--model', choices=list(MODELS), default='toy')
+    parser.add_argument('--segments', type=int, default=60)
+    parser.add_argument('--arrival', type=float, default=8.0, help="Segments submitted per second.")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--max-queue', type=int, default=8)
+    parser.add_argument('--max-batch', type=int, default=4)
+    parser.add_argument('--shed', choices=('oldest', 'newest'), default='oldest')
+    parser.add_argument('--rate', type=int, default=16000)
+    args = parser.parse_args(argv)
+
+    if args.model == 'tiny-whisper':
+        try:
+            import torch, transformers  # noqa: F401
+        except ImportError as e:
+            print(f"tiny-whisper needs transformers and torch: {e}")
+            return 1
+
+    service = SpeechToText(MODELS[args.model], args.rate, args.workers,
+                           args.max_queue, args.max_batch, shed=args.shed)
+    service.start()
+
+    # Warm Up the Workers (Process Start and Model Construction) Before Timing
+    warm_up = [service.submit(np.zeros(args.rate // 10, dtype=np.float32)) for _ in range(args.workers)]
+    for future in warm_up:
+        future.result(timeout=600)
+    service.latencies.clear()
+    service.waits.clear()
+    warm_batches = service.batches
+
+    # Submit Segments of 0.5-3 s at a Steady Rate
+    rng = np.random.default_rng(0)
+    futures = []
+    start = time.perf_counter()
+    for i in range(args.segments):
+        seconds = rng.uniform(0.5, 3.0)
+        audio = (0.1 * rng.standard_normal(int(seconds * args.rate))).astype(np.float32)
+        futures.append(service.submit(audio, i / args.arrival, i / args.arrival + seconds))
+        time.sleep(max(0.0, start + (i + 1) / args.arrival - time.perf_counter()))
+
+    done = [future.result(timeout=600) for future in futures if not future.cancelled()]
+    elapsed = time.perf_counter() - start
+    stats = service.stats()
+    service.close()
+
+    print(f"model={args.model} workers={args.workers} arrival={args.arrival}/s max_queue={args.max_queue} "
+          f"max_batch={args.max_batch} shed={args.shed}")
+    print(f"{len(done)}/{args.segments} transcribed, {stats['shed']} shed, {stats['failed']} failed, "
+          f"{stats['batches'] - warm_batches} batches (mean size {len(done) / max(1, stats['batches'] - warm_batches):.2f}) "
+          f"in {elapsed:.1f} s")
+    print(f"latency p50={stats['latency_p50_ms']:.0f} ms p95={stats['latency_p95_ms']:.0f} ms, "
+          f"queue wait p50={stats['wait_p50_ms']:.0f} ms p95={stats['wait_p95_ms']:.0f} ms")
+    if done:
+        print(f"example: {done[-1].text!r}")
+    return 0 if stats['failed'] == 0 and len(done) + stats['shed'] == args.segments else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
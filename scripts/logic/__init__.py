@@ -1,2 +1,9 @@
-from .loader import *
 from .icons import *
+
+# The Loader pulls in PyAudio and Qt, so it is only imported on first access.
+# This keeps `import scripts.logic.<module>` cheap for headless tools.
+def __getattr__(name):
+    if name in ('Loader', 'AudioDevices', 'AudioRouting', 'LabelPrefs'):
+        from . import loader
+        return getattr(loader, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,15 +1,31 @@
-import pyaudio
-import librosa
+try:
+    import pyaudio
+except ImportError:  # Headless tools (offline processing, benchmarks) can run without PortAudio
+    pyaudio = None
+
+# Callback Return Code (pyaudio.paContinue), Defined Here so the Callbacks Also Run Without PyAudio
+PA_CONTINUE = pyaudio.paContinue if pyaudio else 0
 
 import numpy as np
-from scipy.fftpack import fft, ifft
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
-import wave
 import time
 import os
 import sys
 import contextlib
+import threading
+from concurrent.futures import Future
+
+from scripts.logic.buffers import AudioBufferPool, ReplayBuffer, RingBuffer
+from scripts.logic.clips import ClipEngine
+from scripts.logic.devices import DeviceRegistry, listed_devices
+from scripts.logic.effects import ClipStage, CompressorStage, EffectChain, EqualizerStage, GainStage, GateStage, LimiterStage
+from scripts.logic.health import CallbackHealth, MetricsLogger
+from scripts.logic.keywords import KeywordSpotter
+from scripts.logic.latency import DEFAULT_LATENCY_MODE, LATENCY_MODES, LatencyTuner, mode_frames
+from scripts.logic.recorder import Recorder
+from scripts.logic.routing import RoutingGraph, Sink
+from scripts.logic.spectrum import SpectrumAnalyzer
+from scripts.logic.stft import SpectralGate
+from scripts.logic.vad import VAD_RATE, VoiceActivityDetector, VoiceActivityMonitor
 
 @contextlib.contextmanager
 def suppress_stderr():
@@ -30,6 +46,7 @@ class AudioDevices:
             self.p = pyaudio.PyAudio()
         
         # Get Devices
+        self.registry = DeviceRegistry(self.p)
         self.devices = self.get_all_devices()
         self.inputs = self.getAudioDevices('input')
         self.outputs = self.getAudioDevices('output')
@@ -39,21 +56,21 @@ class AudioDevices:
         self.mic_output = None
         self.speaker = None
         
+        # Set When Devices Changed but PortAudio Could Not Be Re-Initialized Yet (a Stream Was Open)
+        self.stale = False
+        
         # Print Info
         self.print_info()
         
     def get_all_devices(self):
-        """Get all audio devices using PyAudio"""
-        devices = []
-        for i in range(self.p.get_device_count()):
-            device_info = self.p.get_device_info_by_index(i)
-            devices.append(device_info)
-        return devices
+        """Get all audio devices from the registry (enumerated once per refresh)"""
+        return self.registry.devices
 
     def getAudioDevices(self, device_type):
         """
         Retrieves a dictionary of audio devices filtered by type (input/output).
-        Includes the default device and devices containing 'CABLE Input' or 'CABLE Output' in their names.
+        Includes the default device and devices containing 'CABLE Input' in their names
+        (see listed_devices()).
 
         Args:
             device_type (str): 'input' or 'output' to specify the type of device.
@@ -63,54 +80,28 @@ class AudioDevices:
         """
         if device_type not in ['input', 'output']:
             raise ValueError("Invalid device_type. Must be 'input' or 'output'.")
-
-        # Initialize a dictionary for filtered devices
-        filtered_devices = {}
-
-        # Get the default device for the specified type
-        default_host_api_info = self.p.get_default_host_api_info()
-        default_device_index = default_host_api_info['defaultInputDevice'] if device_type == 'input' else default_host_api_info['defaultOutputDevice']
-        
-        if default_device_index >= 0:  # -1 means no default device
-            default_device_info = self.p.get_device_info_by_index(default_device_index)
-            default_device_name = default_device_info['name']
-            filtered_devices[default_device_name] = default_device_index
-
-        # Add devices containing "CABLE Input" or "CABLE Output" in their names
-        for device in self.devices:
-            device_name = device['name']
-            index = device['index']
-            max_channels = device['maxInputChannels'] if device_type == 'input' else device['maxOutputChannels']
-            
-            if max_channels > 0:  # Device supports this direction
-                if device_type == 'input' and "CABLE Input" in device_name:
-                    filtered_devices[device_name] = index
-                elif device_type == 'output' and ("CABLE Input" in device_name):
-                    filtered_devices[device_name] = index
-        
-        # Remove the Following if they are in the list:
-        # - "CABLE Input (VB-Audio Virtual C"
-        # - "CABLE Output (VB-Audio Virtual "
-        # - "CABLE Output (VB-Audio Point)"
-        # filtered_devices = {k: v for k, v in filtered_devices.items() if k not in ["CABLE Input (VB-Audio Virtual C", "CABLE Output (VB-Audio Virtual ", "CABLE Output (VB-Audio Point)"]}
-
-        return filtered_devices
+        return {info['name']: info['index'] for info in listed_devices(self.registry, device_type)}
     
     def refresh_devices(self):
+        """
+        Re-initializes PortAudio so it sees added and removed devices. Every
+        stream opened on the old instance becomes invalid, so only call this
+        with no stream open (see AudioRouting.refresh_devices()).
+        """
         self.p.terminate()
         # Initialize with stderr suppressed
         with suppress_stderr():
             self.p = pyaudio.PyAudio()
+        self.registry = DeviceRegistry(self.p)
         self.devices = self.get_all_devices()
         self.outputs = self.getAudioDevices('output')
         self.inputs = self.getAudioDevices('input')
+        self.stale = False
         self.print_info()
     
     def get_device_index(self, device_name):
-        for device in self.devices:
-            if device['name'] == device_name:
-                return device['index']
-        return None
+        device = self.registry.find(device_name)
+        return device['index'] if device is not None else None
 
     def print_info(self):
         print("\n\033[94m-- Audio Devices --\033[0m")
@@ -126,175 +117,813 @@ class AudioRouting:
         self.stream = None
         self.running = False
         
-        # PyAudio-specific attributes
-        self.p = self.audio_devices.p  # Use the existing PyAudio instance
+        # PyAudio-specific attributes (the PyAudio Instance Is Read Through audio_devices, Which May Replace It)
         self.stream_callback = None
         self.buffer = None
+        self.buffer_size = None
+        
+        # Serializes Opening and Closing the Stream (the Latency Tuner Reopens It From Its Thread)
+        self.stream_lock = threading.RLock()
+        
+        # Latency Mode, and Whether frames_per_buffer Is Tuned While Running
+        self.latency_mode = DEFAULT_LATENCY_MODE
+        self.adaptive_latency = True
+        self.latency_tuner = LatencyTuner(self)
+        
+        # Stream Configuration and Preallocated Callback Buffers
+        self.sample_rate = None
+        self.channel_count = None
+        self.buffers = None
+        
+        # Outputs Fed From the Processed Capture. The Mic Output Plays Straight From a Full-Duplex
+        # Stream When It Shares the Input's Rate; Otherwise It, Like the Speaker Monitor, Is a Sink
+        # With Its Own Gain, Resampler, Ring and Output Stream (See RoutingGraph)
+        self.output_rate = None
+        self.graph = RoutingGraph()
+        self.sink_gains = {'mic': 1.0, 'speaker': 0.0}
         
-        # Add new attributes for spectral analysis
-        self.fft_data = None
-        self.fig = None
-        self.ax = None
-        self.line = None
-        self.animation = None
+        # Spectral Gate (STFT) Configuration
+        self.stft_window = 'hann'
+        self.stft_size = 1024
+        self.stft_hop = 512
+        self.spectral_gate = None
+        
+        # Add new attributes for spectral analysis (Computed Off the Audio Thread)
+        self.analysis_ring = None
+        self.spectrum_analyzer = None
         self.spectrum_enabled = False
         
+        # Soundboard Clips, Decoded Ahead of Time and Mixed Into the Processed Mic
+        self.clip_engine = ClipEngine()
+        
+        # Processing Chain, Run in Place Over Each Block: Gate, Volume, EQ, Dynamics, Then Clips.
+        # Stages Can Be Reordered or Bypassed While Running; EQ and Dynamics Start Bypassed
+        self.effects = EffectChain([
+            GateStage(self.audio_values),
+            GainStage('volume', source=lambda: self.audio_values.get_volume() / 100.0),
+            EqualizerStage(bypass=True),
+            CompressorStage(bypass=True),
+            LimiterStage(bypass=True),
+            ClipStage(self.clip_engine),
+        ])
+        
+        # Voice Activity Detection, Fed by a Device-Less Mono Sink (Started With start_vad())
+        self.vad_monitor = None
+        
+        # Wake-Word Spotting on the Same Mono Feed (Started With start_keywords())
+        self.keyword_spotter = None
+        
+        # Instant Replay: the Last Few Seconds of the Processed Signal (Enabled With enable_replay())
+        self.replay_seconds = 0.0
+        self.replay = None
+        
+        # Disk Recording of the Processed Signal, Fed by a Device-Less Sink (Started With start_recording())
+        self.recorder = None
+        
+        # Optional Worker Process Running the Chain Off This Process's GIL (Enabled With enable_dsp_worker())
+        self.dsp_worker_blocks = 0
+        self.dsp_worker = None
+        self.dsp_worker_lock = threading.Lock()
+        
+        # Callback Health (Xruns, Timing), Optionally Logged to a File
+        self.health = CallbackHealth()
+        self.metrics_logger = None
+        
         # First Instance
         self.first_instance = True
         
+    @property
+    def p(self):
+        """The current PyAudio instance (None when driven without devices)."""
+        return self.audio_devices.p if self.audio_devices is not None else None
+    
     # Add a method to start the spectrum analyzer
     def start_spectrum_analyzer(self):
-        if not self.running:
-            print("Cannot start spectrum analyzer: Audio routing not running")
-            return
-            
+        """Starts computing display spectra, now or as soon as routing starts."""
         self.spectrum_enabled = True
-        self.fig, self.ax = plt.figure(figsize=(10, 6)), plt.axes(xlim=(0, 5000), ylim=(0, 1))
-        self.ax.set_title('Real-time Audio Spectrum')
-        self.ax.set_xlabel('Frequency (Hz)')
-        self.ax.set_ylabel('Amplitude')
-        self.line, = self.ax.plot([], [], lw=2)
-        
-        def init():
-            self.line.set_data([], [])
-            return self.line,
-            
-        def animate(i):
-            if self.fft_data is not None:
-                self.line.set_data(self.fft_data[0], self.fft_data[1])
-            return self.line,
-            
-        self.animation = FuncAnimation(self.fig, animate, init_func=init, 
-                                      interval=50, blit=True)
-        plt.show(block=False)
+        if self.running:
+            self.spectrum_analyzer.start()
         
     def stop_spectrum_analyzer(self):
-        if self.animation:
-            self.animation.event_source.stop()
-            plt.close(self.fig)
         self.spectrum_enabled = False
+        if self.spectrum_analyzer:
+            self.spectrum_analyzer.stop()
 
-    def start_route(self, speaker, mic_input, mic_output):
+    def start_vad(self, detector=None):
+        """
+        Starts detecting speech in the processed capture, now and across
+        routes. Finished segments go to listeners added with add_speech_listener().
+        
+        Args:
+            detector (VoiceActivityDetector): Custom detector; its sample rate sets the sink's rate.
+        """
+        if self.vad_monitor is not None:
+            return self.vad_monitor
+        detector = detector or VoiceActivityDetector(VAD_RATE)
+        sink = self.graph.add(Sink('vad', detector.sample_rate, 1, downmix=True))
+        self.vad_monitor = VoiceActivityMonitor(sink, detector)
+        self.vad_monitor.start()
+        return self.vad_monitor
+    
+    def stop_vad(self):
+        if self.vad_monitor is None:
+            return
+        self.graph.remove('vad')
+        self.vad_monitor.stop()
+        self.vad_monitor = None
+        self.keyword_spotter = None
+    
+    def start_keywords(self, spotter=None):
+        """
+        Starts spotting wake words on the VAD's mono feed (starting VAD if needed).
+        Enroll keywords with keyword_spotter.enroll() and listen with add_keyword_listener().
+        """
+        if self.keyword_spotter is not None:
+            return self.keyword_spotter
+        monitor = self.start_vad()
+        spotter = spotter or KeywordSpotter(monitor.detector.sample_rate)
+        monitor.add_tap(spotter.process)
+        self.keyword_spotter = spotter
+        return spotter
+    
+    def stop_keywords(self):
+        if self.keyword_spotter is None:
+            return
+        self.vad_monitor.remove_tap(self.keyword_spotter.process)
+        self.keyword_spotter = None
+    
+    def enable_replay(self, seconds=30.0):
+        """
+        Keeps the last `seconds` of the processed signal in memory, for save_replay().
+        The buffer takes seconds x rate x channels x 4 bytes, allocated once per stream configuration.
+        """
+        self.replay_seconds = seconds
+        if self.sample_rate:
+            self.replay = ReplayBuffer(seconds, self.sample_rate, self.channel_count)
+            print(f"Replay Buffer: {seconds:g} s, {self.replay.nbytes / 2 ** 20:.1f} MiB")
+    
+    def disable_replay(self):
+        self.replay_seconds = 0.0
+        self.replay = None
+    
+    def save_replay(self, path, seconds=None):
+        """
+        Writes the last `seconds` (all held by default) to a WAV file from a background thread.
+        
+        Returns:
+            Future: Resolves to the seconds written, or None if replay is off or empty.
+        """
+        future = Future()
+        replay = self.replay
+        if replay is None or not replay.available():
+            future.set_result(None)
+            return future
+        
+        def export():
+            try:
+                future.set_result(replay.export(path, seconds))
+            except Exception as e:
+                print(f"\033[91mSaving replay failed: {e}\033[0m")
+                future.set_exception(e)
+        
+        threading.Thread(target=export, name="ReplayExport", daemon=True).start()
+        return future
+    
+    def enable_dsp_worker(self, latency_blocks=2):
+        """
+        Runs the effect chain in a worker process, off this process's GIL. The
+        callback itself still waits on a busy UI thread, so this does not
+        shorten its tail (see scripts.logic.dsp_worker). Adds a fixed latency of latency_blocks blocks (see DspWorker);
+        clips are still mixed here. Starts now if the stream is configured, or
+        with the next configure_stream().
+        
+        Blocks while the process spawns (up to seconds), so never call it from
+        the audio thread; configure_stream() uses restart_dsp_worker() instead.
+        
+        Returns:
+            DspWorker: The running worker, or None if it is not started yet.
+        """
+        self.dsp_worker_blocks = latency_blocks
+        with self.dsp_worker_lock:
+            if self.sample_rate and self.dsp_worker is None:
+                # multiprocessing and shared_memory Are Slow Imports, so Load Them Only for an Opt-In Worker
+                from scripts.logic.dsp_worker import DspWorker
+                worker = DspWorker(self.audio_values, self.effects, self.sample_rate, self.channel_count,
+                                   self.buffers.frames, latency_blocks=latency_blocks,
+                                   stft=(self.stft_size, self.stft_hop, self.stft_window))
+                if worker.start():
+                    # The Stream May Have Changed, or the Worker Been Disabled, While It Started
+                    if self.dsp_worker_blocks and worker.fits(self.sample_rate, self.channel_count, self.buffers.frames):
+                        self.dsp_worker = worker
+                        print(f"DSP Worker: +{worker.latency * 1000:.1f} ms ({latency_blocks} blocks)")
+                    else:
+                        worker.stop()
+        return self.dsp_worker
+    
+    def restart_dsp_worker(self, stale=None):
+        """
+        Stops a worker that no longer fits the stream and starts one that does,
+        on a thread of its own. Safe to call from the audio callback: until the
+        new worker is ready, the callback runs the chain in this process.
+        
+        Args:
+            stale (DspWorker): The worker to stop, already detached from the callback.
+        """
+        def restart():
+            if stale is not None:
+                stale.stop()
+            if self.dsp_worker_blocks:
+                self.enable_dsp_worker(self.dsp_worker_blocks)
+        
+        threading.Thread(target=restart, name="DspWorkerRestart", daemon=True).start()
+    
+    def disable_dsp_worker(self):
+        self.dsp_worker_blocks = 0
+        worker = self.dsp_worker
+        self.dsp_worker = None
+        if worker is not None:
+            worker.stop()
+    
+    def start_recording(self, directory, format='wav', rate=None, channels=None, buffer_seconds=10.0, **options):
+        """
+        Records the processed signal to files in directory, from a writer thread.
+        
+        Args:
+            directory (str): Where the files go.
+            format (str): 'wav' (16-bit) or 'raw' (float32), see Recorder.
+            rate (int): Recording rate; the stream's rate by default (resampled if different).
+            channels (int): Channels recorded; the stream's channels by default.
+            buffer_seconds (float): How long the disk may stall before frames are dropped.
+            **options: Passed to Recorder (prefix, chunk_seconds, max_bytes, max_seconds).
+        
+        Returns:
+            Recorder: The running recorder, or None if no rate is known yet.
+        """
+        if self.recorder is not None:
+            return self.recorder
+        rate = rate or self.sample_rate
+        if not rate:
+            print(f"\033[91mCannot record: start routing first or give a sample rate.\033[0m")
+            return None
+        sink = self.graph.add(Sink('recorder', rate, channels or self.channel_count or 2, ring_seconds=buffer_seconds))
+        self.recorder = Recorder(sink, directory, format, **options)
+        self.recorder.start()
+        return self.recorder
+    
+    def stop_recording(self):
+        """Stops recording; what is already queued is still written."""
+        if self.recorder is None:
+            return None
+        recorder = self.recorder
+        self.graph.remove('recorder')
+        recorder.stop()
+        self.recorder = None
+        return recorder.stats()
+    
+    def add_keyword_listener(self, listener):
+        """Calls listener(KeywordEvent) when an enrolled keyword is heard (on the VAD thread)."""
+        self.start_keywords().add_listener(listener)
+    
+    def add_speech_listener(self, listener):
+        """Calls listener(SpeechSegment) for each detected speech segment (on the VAD thread), starting VAD if needed."""
+        self.start_vad().add_listener(listener)
+    
+    def start_route(self, speaker, mic_input, mic_output, frames=None):
         # If Already Running, Return
         if self.running:
             return
         
-        # Get the Device Indices for the Devices if they are indices
-        if isinstance(speaker, int):
-            speaker_info = self.p.get_device_info_by_index(speaker)
-        else:
-            # Find the device by name
-            speaker_info = None
-            for i in range(self.p.get_device_count()):
-                info = self.p.get_device_info_by_index(i)
-                if info['name'] == speaker:
-                    speaker_info = info
-                    break
+        # Resolve and Open Under the Stream Lock, so the Device Watcher Cannot Swap PortAudio in Between
+        with self.stream_lock:
+            if self.audio_devices.stale:
+                self.audio_devices.refresh_devices()
+            
+            # Resolve the Devices (Indices, Names or (Host API, Name) Keys) Through the Registry
+            registry = self.audio_devices.registry
+            speaker_info = registry.resolve(speaker, 'output')
             if not speaker_info:
                 print(f"Could not find speaker device: {speaker}")
                 return
-        
-        # Do the same for input and output
-        if isinstance(mic_input, int):
-            mic_input_info = self.p.get_device_info_by_index(mic_input)
-        else:
-            mic_input_info = None
-            for i in range(self.p.get_device_count()):
-                info = self.p.get_device_info_by_index(i)
-                if info['name'] == mic_input:
-                    mic_input_info = info
-                    break
+            
+            # Do the same for input and output
+            mic_input_info = registry.resolve(mic_input, 'input')
             if not mic_input_info:
                 print(f"Could not find input device: {mic_input}")
                 return
-        
-        if isinstance(mic_output, int):
-            mic_output_info = self.p.get_device_info_by_index(mic_output)
-        else:
-            mic_output_info = None
-            for i in range(self.p.get_device_count()):
-                info = self.p.get_device_info_by_index(i)
-                if info['name'] == mic_output:
-                    mic_output_info = info
-                    break
+            
+            mic_output_info = registry.resolve(mic_output, 'output')
             if not mic_output_info:
                 print(f"Could not find output device: {mic_output}")
                 return
+            
+            # Set the Devices
+            self.audio_devices.mic_input = mic_input_info
+            self.audio_devices.mic_output = mic_output_info
+            self.audio_devices.speaker = speaker_info
+            
+            # Use the Lower Channel Count to Ensure Compatibility
+            channel_count = min(int(mic_input_info['maxInputChannels']), int(mic_output_info['maxOutputChannels']))
+            channel_count = max(1, channel_count)  # Ensure at least mono
+            
+            # Each Device Runs at Its Own Default Rate; the Audio Is Resampled if They Differ
+            sample_rate = int(mic_input_info['defaultSampleRate'])
+            output_rate = int(mic_output_info['defaultSampleRate'])
+            
+            # Print the Indices
+            self.print_routing_info(mic_input_info['index'], mic_output_info['index'], channel_count, sample_rate)
+            
+            # Buffer Size From the Latency Mode, Unless Given (e.g. by a Saved Profile)
+            if not frames:
+                frames, _, _ = mode_frames(self.latency_mode, sample_rate)
+            self.configure_stream(sample_rate, channel_count, frames, output_rate)
+            
+            # Monitor the Processed Mic on the Speaker Too, Unless It Is the Mic Output Itself or Muted
+            self.graph.remove('speaker')
+            self.sync_speaker_sink()
+            self.health.reset()
+            for sink in self.graph.active:
+                target = sink.device['name'] if sink.device is not None else 'no device'
+                print(f"Sink '{sink.name}': {target}, {sink.rate} Hz, {sink.channels} ch "
+                      f"(+{sink.latency * 1000:.1f} ms)")
+            
+            if not self.open_stream(frames):
+                return
+            self.running = True
+            
+            # Resume the Spectrum Analyzer if It Was Left On
+            if self.spectrum_enabled:
+                self.spectrum_analyzer.start()
         
-        # Set the Devices
-        self.audio_devices.mic_input = mic_input_info
-        self.audio_devices.mic_output = mic_output_info
-        self.audio_devices.speaker = speaker_info
-        
-        # Use the Lower Channel Count to Ensure Compatibility
-        channel_count = min(int(mic_input_info['maxInputChannels']), int(mic_output_info['maxOutputChannels']))
-        channel_count = max(1, channel_count)  # Ensure at least mono
-        
-        # Use a common Sample Rate
-        sample_rate = int(mic_input_info['defaultSampleRate'])
-        
-        # Configure format
-        format_type = pyaudio.paFloat32  # Using float32 for better quality and compatibility with DSP
-        
-        # Print the Indices
-        self.print_routing_info(mic_input_info['index'], mic_output_info['index'], channel_count, sample_rate)
+        if self.adaptive_latency:
+            self.latency_tuner.start()
+    
+    def open_stream(self, frames):
+        """
+        Opens and starts the stream(s) on the current devices: the capture
+        stream (full duplex with the mic output when their rates match) and
+        one output stream per device sink.
         
-        # Create a buffer to store audio data
-        self.buffer_size = 1024  # standard buffer size
+        Returns:
+            bool: True if the capture stream and the mic output were opened.
+        """
+        mic_input_info = self.audio_devices.mic_input
+        mic_output_info = self.audio_devices.mic_output
+        self.configure_stream(self.sample_rate, self.channel_count, frames, self.output_rate)
+        self.graph.reset()
+        duplex = 'mic' not in self.graph
         
         try:
-            # Define the callback function for streaming
-            def pyaudio_callback(in_data, frame_count, time_info, status):
-                # Convert buffer to numpy array
-                indata = np.frombuffer(in_data, dtype=np.float32).reshape(-1, channel_count)
-                
-                # Create output buffer
-                outdata = np.zeros((frame_count, channel_count), dtype=np.float32)
-                
-                # Process audio using our existing method
-                self.process_audio(indata, outdata, frame_count, time_info, status)
-                
-                # Convert numpy array back to bytes
-                return (outdata.tobytes(), pyaudio.paContinue)
-            
             # Store the callback function
-            self.stream_callback = pyaudio_callback
+            self.stream_callback = self.pyaudio_callback if duplex else self.capture_callback
             
             # Start the Stream with stderr suppressed
+            # (PyAudio requests each device's default low latency; the latency mode sets the buffer)
             with suppress_stderr():
                 self.stream = self.p.open(
-                    format=format_type,
-                    channels=channel_count,
-                    rate=sample_rate,
+                    format=pyaudio.paFloat32,  # Using float32 for better quality and compatibility with DSP
+                    channels=self.channel_count,
+                    rate=self.sample_rate,
                     input=True,
-                    output=True,
+                    output=duplex,
                     input_device_index=mic_input_info['index'],
-                    output_device_index=mic_output_info['index'],
-                    frames_per_buffer=self.buffer_size,
-                    stream_callback=pyaudio_callback
+                    output_device_index=mic_output_info['index'] if duplex else None,
+                    frames_per_buffer=frames,
+                    stream_callback=self.stream_callback
                 )
-            
-            self.running = True
+            self.buffer_size = frames
         except Exception as e:
             print(f"Error starting stream: {e}")
+            return False
+        
+        # One Output Stream per Sink; Only the Mic Output Is Required
+        for sink in self.graph.active:
+            if sink.device is not None and not self.open_sink_stream(sink) and sink.name == 'mic':
+                self.close_streams()
+                return False
+        return True
+    
+    def open_sink_stream(self, sink):
+        """
+        Opens the output stream playing one device sink. If it fails, the
+        sink is removed from the graph (the caller decides whether that is fatal).
+        
+        Returns:
+            bool: True if the stream was opened.
+        """
+        try:
+            with suppress_stderr():
+                sink.stream = self.p.open(
+                    format=pyaudio.paFloat32,
+                    channels=sink.channels,
+                    rate=sink.rate,
+                    output=True,
+                    output_device_index=sink.device['index'],
+                    frames_per_buffer=sink.frames,
+                    stream_callback=self.sink_callback(sink)
+                )
+        except Exception as e:
+            print(f"Error starting output stream '{sink.name}': {e}")
+            self.graph.remove(sink.name)
+            return False
+        return True
+    
+    def sync_speaker_sink(self):
+        """
+        Adds the speaker monitor sink while its gain is above zero (opening its
+        output stream if routing is running), and closes and removes it at zero,
+        so a muted monitor keeps no device open. There is no speaker sink when
+        the speaker is the mic output itself.
+        """
+        devices = self.audio_devices
+        speaker_info = devices.speaker if devices is not None else None
+        mic_output_info = devices.mic_output if devices is not None else None
+        wanted = (speaker_info is not None and mic_output_info is not None
+                  and speaker_info['index'] != mic_output_info['index'] and self.sink_gains['speaker'] > 0)
+        sink = self.graph.get('speaker')
+        if wanted and sink is None:
+            sink = self.graph.add(Sink('speaker', int(speaker_info['defaultSampleRate']), int(speaker_info['maxOutputChannels']),
+                                       self.sink_gains['speaker'], speaker_info))
+            if self.running:
+                self.open_sink_stream(sink)
+        elif not wanted and sink is not None:
+            self.graph.remove('speaker')
+            self.close_stream(sink.stream)
+            sink.stream = None
+    
+    def sink_callback(self, sink):
+        """Builds the PyAudio callback that plays one sink's queue on its own output stream."""
+        health = self.health
+        
+        def callback(in_data, frame_count, time_info, status):
+            if status:
+                health.record_status(status)
+            out = sink.block
+            if frame_count != len(out):
+                out = sink.block = np.zeros((frame_count, sink.channels), dtype=np.float32)
+            sink.pull(out)
+            return (out, PA_CONTINUE)
+        return callback
+    
+    def close_streams(self):
+        """Stops and closes the capture stream and every sink's output stream, if open."""
+        for stream in [self.stream] + [sink.stream for sink in self.graph.active]:
+            self.close_stream(stream)
+        self.stream = None
+        for sink in self.graph.active:
+            sink.stream = None
+    
+    def close_stream(self, stream):
+        """Stops and closes one stream, if there is one."""
+        if stream is None:
+            return
+        try:
+            stream.stop_stream()
+            stream.close()
+        except OSError as e:  # The Device Was Unplugged Under the Stream
+            print(f"\033[91mClosing stream failed: {e}\033[0m")
+    
+    def refresh_devices(self):
+        """
+        Re-initializes PortAudio to pick up device changes, unless a stream is
+        open on the current instance; then the devices are only marked stale
+        and refreshed by the next start_route().
+        
+        Returns:
+            bool: True if PortAudio was re-initialized.
+        """
+        with self.stream_lock:
+            if self.stream is not None:
+                self.audio_devices.stale = True
+                return False
+            self.audio_devices.refresh_devices()
+            return True
+    
+    def handle_device_changes(self, added, removed, changed):
+        """
+        Follows a DeviceWatcher report. Call it on the thread that owns the
+        route (the GUI thread, or the daemon's main thread), never on the
+        watcher's: refreshing PortAudio and rebinding close and reopen streams.
+        A running route is only rebound if one of its own devices was removed;
+        otherwise the devices are only marked stale, and start_route() refreshes
+        PortAudio before the next route (re-initializing it takes long enough to
+        stall the GUI on every plug and unplug).
+        """
+        if not self.running:
+            self.audio_devices.stale = True
+            return
+        registry = self.audio_devices.registry
+        gone = set(registry.key(info) for info in removed)
+        used = [info for info in (self.audio_devices.speaker, self.audio_devices.mic_input, self.audio_devices.mic_output)
+                if info is not None]
+        if any(registry.key(info) in gone for info in used):
+            self.rebind_devices()
+        else:
+            self.audio_devices.stale = True
+    
+    def rebind_devices(self):
+        """
+        Moves the running route onto the current devices: PortAudio is
+        re-initialized, devices still present are reopened (found by their
+        stable key), and the default device replaces any that disappeared.
+        
+        Returns:
+            bool: True if the route runs again.
+        """
+        # Stop Tuning First, as stop_route() Does; start_route() Resumes It Only if the Route Comes Back
+        self.latency_tuner.stop()
+        
+        with self.stream_lock:
+            if not self.running:
+                return False
+            devices = self.audio_devices
+            old = devices.registry
+            keys = [(old.key(info), direction) for info, direction in
+                    ((devices.speaker, 'output'), (devices.mic_input, 'input'), (devices.mic_output, 'output'))]
+            frames = self.buffer_size
+            self.close_streams()
+            self.running = False
+            devices.refresh_devices()
+            
+            # Same Devices Where They Still Exist, the Defaults Where Not
+            registry = devices.registry
+            chosen = []
+            for key, direction in keys:
+                info = registry.resolve(key, direction) or registry.default(direction)
+                if info is None:
+                    print(f"\033[91mNo {direction} device left to route to; routing stopped.\033[0m")
+                    if self.spectrum_analyzer:
+                        self.spectrum_analyzer.stop()
+                    return False
+                if registry.key(info) != key:
+                    print(f"\033[93m{key[1]} disappeared; routing through {info['name']} instead.\033[0m")
+                chosen.append(info['index'])
+            self.start_route(*chosen, frames=frames)
+            return self.running
+    
+    def set_sink_gain(self, name, gain):
+        """
+        Sets the linear gain of one output ('mic' or 'speaker'), now and for later
+        routes. Moving the speaker's gain to or from zero closes or opens its stream.
+        """
+        with self.stream_lock:
+            self.sink_gains[name] = gain
+            self.graph.set_gain(name, gain)
+            if name == 'speaker':
+                self.sync_speaker_sink()
+    
+    def reopen_stream(self, frames):
+        """
+        Closes the running stream and opens it again with a new buffer size,
+        falling back to the previous size if the new one is refused.
+        
+        Returns:
+            bool: True if the stream now runs with the requested frames.
+        """
+        with self.stream_lock:
+            if not self.running or self.stream is None:
+                return False
+            previous = self.buffer_size
+            self.close_streams()
+            self.health.io_latency = None
+            if self.open_stream(frames):
+                return True
+            if not self.open_stream(previous):
+                self.running = False
+                if self.spectrum_analyzer:
+                    self.spectrum_analyzer.stop()
+            return False
+    
+    def set_latency_mode(self, mode):
+        """Switches to 'lowest', 'balanced' or 'safe', reopening the stream if it is running."""
+        if mode not in LATENCY_MODES:
+            raise ValueError(f"Unknown latency mode '{mode}'. Must be one of: {', '.join(LATENCY_MODES)}.")
+        self.latency_mode = mode
+        if self.running:
+            frames, _, _ = mode_frames(mode, self.sample_rate)
+            if frames != self.buffer_size and self.reopen_stream(frames):
+                print(f"\033[93mLatency mode: {mode} ({frames} frames)\033[0m")
+            self.latency_tuner.reset()
+    
+    def set_adaptive_latency(self, enabled):
+        self.adaptive_latency = enabled
+        if enabled and self.running:
+            self.latency_tuner.start()
+        elif not enabled:
+            self.latency_tuner.stop()
+    
+    def latency_report(self):
+        """
+        Estimated and measured latency of the running stream, in milliseconds.
+        
+        Returns:
+            dict: 'frames', 'buffer_ms', 'input_ms' and 'output_ms' (PortAudio's
+            estimates), 'measured_ms' (ADC to DAC from the callback's time info,
+            None if the driver does not report it), 'gate_ms' (spectral gate delay:
+            one STFT window, fixed at 1024 frames or about 21 ms at 48 kHz by default,
+            added on top of the latency mode's buffer, so it dominates the 'lowest' mode),
+            'resample_ms' (the mic sink's resampler delay plus prefill, 0 at full duplex),
+            'worker_ms' (the DSP worker's fixed delay, 0 when off),
+            'total_ms' (measured, or estimated, plus the gate, resampling and worker) and
+            'sinks' (each sink's own added latency).
+        """
+        rate = self.sample_rate
+        report = {'frames': self.buffer_size, 'buffer_ms': None, 'input_ms': None, 'output_ms': None,
+                  'measured_ms': None, 'gate_ms': 0.0, 'resample_ms': 0.0, 'worker_ms': 0.0, 'total_ms': None,
+                  'sinks': {sink.name: sink.latency * 1000 for sink in self.graph.active}}
+        stream = self.stream
+        mic_sink = self.graph.get('mic')
+        output_stream = mic_sink.stream if mic_sink is not None else stream
+        if not rate or not self.buffer_size or stream is None:
+            return report
+        report['buffer_ms'] = self.buffer_size / rate * 1000
+        try:
+            report['input_ms'] = stream.get_input_latency() * 1000
+            report['output_ms'] = output_stream.get_output_latency() * 1000
+        except (OSError, AttributeError):
+            pass
+        if mic_sink is not None:
+            report['resample_ms'] = mic_sink.latency * 1000
+        if self.health.io_latency is not None:
+            report['measured_ms'] = self.health.io_latency * 1000
+        if self.audio_values.get_spectrum() and self.spectral_gate is not None:
+            report['gate_ms'] = self.spectral_gate.latency / rate * 1000
+        worker = self.dsp_worker
+        if worker is not None:
+            report['worker_ms'] = worker.latency * 1000
+        
+        # The Callback Adds One Buffer Between Capture and Playback on Top of the Device Latencies
+        added_ms = report['gate_ms'] + report['resample_ms'] + report['worker_ms']
+        if report['measured_ms'] is not None:
+            report['total_ms'] = report['measured_ms'] + added_ms
+        elif report['input_ms'] is not None:
+            report['total_ms'] = report['input_ms'] + report['buffer_ms'] + report['output_ms'] + added_ms
+        return report
+        
+    def configure_stream(self, sample_rate, channel_count, frames, output_rate=None):
+        """
+        Sizes the callback buffers for a stream configuration. Called once per
+        stream, so the callback itself never has to allocate.
+        
+        If output_rate differs from sample_rate, the mic output becomes a sink
+        of its own; every sink is sized here too.
+        """
+        self.sample_rate = sample_rate
+        self.channel_count = channel_count
+        self.output_rate = output_rate or sample_rate
+        if self.buffers is None or not self.buffers.fits(frames, channel_count, sample_rate):
+            self.buffers = AudioBufferPool(frames, channel_count, sample_rate)
+        self.health.set_budget(frames, sample_rate)
+        self.clip_engine.configure(sample_rate, channel_count, frames)
+        gate = self.spectral_gate
+        if gate is None or gate.sample_rate != sample_rate or gate.channels != channel_count:
+            self.spectral_gate = SpectralGate(sample_rate, self.stft_size, self.stft_hop, self.stft_window, channel_count)
+        gate_stage = self.effects.get('gate')
+        if gate_stage is not None:
+            gate_stage.gate = self.spectral_gate
+        self.effects.configure(sample_rate, channel_count, frames)
+        
+        # The Replay Buffer's Size Depends on the Rate and Channels, so It Is Rebuilt if They Change
+        replay = self.replay
+        if self.replay_seconds and (replay is None or replay.sample_rate != sample_rate or replay.channels != channel_count
+                                    or replay.seconds != self.replay_seconds):
+            self.replay = ReplayBuffer(self.replay_seconds, sample_rate, channel_count)
+        
+        # The Worker's Rings Are Sized for a Rate, Channel Count and Largest Block; Restart It Otherwise.
+        # This Also Runs on the Audio Thread When the Block Size Changes, so the Restart Happens on a
+        # Thread of Its Own and the Chain Runs In-Process Until Then
+        worker = self.dsp_worker
+        if worker is not None and worker.fits(sample_rate, channel_count, frames):
+            worker.configure(frames)
+        elif self.dsp_worker_blocks:
+            self.dsp_worker = None
+            self.restart_dsp_worker(worker)
+        
+        # About a Second of Ring Feeding the Spectrum Analyzer Thread
+        analyzer = self.spectrum_analyzer
+        if analyzer is None or analyzer.sample_rate != sample_rate or analyzer.ring.channels != channel_count:
+            if analyzer is not None:
+                analyzer.stop()
+            self.analysis_ring = RingBuffer(max(sample_rate, 4 * frames), channel_count)
+            self.spectrum_analyzer = SpectrumAnalyzer(self.analysis_ring, sample_rate, self.audio_values, self.stft_size)
+            if self.spectrum_enabled and self.running:
+                self.spectrum_analyzer.start()
+        
+        # The Mic Output Only Needs a Sink (and Its Own Stream) if It Runs at Another Rate
+        mic_sink = self.graph.get('mic')
+        if self.output_rate == sample_rate:
+            self.graph.remove('mic')
+        elif mic_sink is None or mic_sink.rate != self.output_rate:
+            device = self.audio_devices.mic_output if self.audio_devices is not None else None
+            self.graph.add(Sink('mic', self.output_rate, channel_count, self.sink_gains['mic'], device))
+        self.graph.configure(sample_rate, channel_count, frames)
+    
+    def pyaudio_callback(self, in_data, frame_count, time_info, status):
+        start = time.perf_counter()
+        
+        # Only Resize the Buffers if PortAudio Changed the Block Size
+        if frame_count != self.buffers.frames:
+            self.configure_stream(self.sample_rate, self.channel_count, frame_count, self.output_rate)
+        
+        # View the Input Bytes as a NumPy Array (No Copy)
+        indata = np.frombuffer(in_data, dtype=np.float32).reshape(frame_count, self.channel_count)
+        
+        # Process audio into the preallocated output buffer
+        outdata = self.buffers.output
+        self.process_audio(indata, outdata, frame_count, time_info, status)
+        
+        # Queue the Processed Block to the Other Outputs, Then Apply the Mic Output's Own Gain
+        self.graph.push(outdata)
+        mic_gain = self.sink_gains['mic']
+        if mic_gain != 1.0:
+            np.multiply(outdata, mic_gain, out=outdata)
+        
+        # Count Xruns and Timing (No Printing on the Audio Thread)
+        self.health.record(status, time.perf_counter() - start, time_info)
+        
+        # PyAudio reads the array through the buffer protocol, so no tobytes() copy
+        return (outdata, PA_CONTINUE)
+    
+    def capture_callback(self, in_data, frame_count, time_info, status):
+        """Input-only stream callback (the mic output is a sink): processes once and queues to every sink."""
+        start = time.perf_counter()
+        if frame_count != self.buffers.frames:
+            self.configure_stream(self.sample_rate, self.channel_count, frame_count, self.output_rate)
+        
+        indata = np.frombuffer(in_data, dtype=np.float32).reshape(frame_count, self.channel_count)
+        outdata = self.buffers.output
+        self.process_audio(indata, outdata, frame_count, time_info, status)
+        self.graph.push(outdata)
+        
+        self.health.record(status, time.perf_counter() - start)
+        return (None, PA_CONTINUE)
         
     def stop_route(self):
         # Reset the Devices
         self.audio_devices.mic_input = None
         self.audio_devices.mic_output = None
         self.audio_devices.speaker = None
-        self.stop_spectrum_analyzer()
+        if self.spectrum_analyzer:
+            self.spectrum_analyzer.stop()
         
-        if self.stream:
-            print(f"\033[91mStopping Audio Routing...\033[0m")
-            self.stream.stop_stream()
-            self.stream.close()
-            self.stream = None
-            self.running = False
+        # Stop Tuning First, so the Stream Is Not Reopened Behind Our Back
+        self.latency_tuner.stop()
+        
+        with self.stream_lock:
+            if self.stream:
+                print(f"\033[91mStopping Audio Routing...\033[0m")
+                self.close_streams()
+                self.running = False
+                
+                # Both Sides Are Stopped, Drop Any Frames Left for the Analyzer
+                self.analysis_ring.reset()
     
     def get_device_index(self, device_name):
         return self.audio_devices.get_device_index(device_name)
     
+    def health_snapshot(self):
+        """
+        Callback health counters plus the stream's CPU load, for the UI or the metrics file.
+        
+        Returns:
+            dict: See CallbackHealth.snapshot(), with 'running', 'cpu_load' (summed over
+            all streams), 'sink_underruns' (summed over sinks), per-sink 'sinks' stats,
+            per-stage 'effects' timing (see EffectChain.stats()), 'recording' (see
+            Recorder.stats(), None when off), 'dsp_worker' (see DspWorker.stats(),
+            None when off) and 'vad_load' and 'keyword_load' (CPU per second of
+            audio, None when off) added.
+        """
+        snapshot = self.health.snapshot()
+        snapshot['running'] = self.running
+        snapshot['effects'] = self.effects.stats()
+        recorder = self.recorder
+        snapshot['recording'] = recorder.stats() if recorder is not None else None
+        worker = self.dsp_worker
+        snapshot['dsp_worker'] = worker.stats() if worker is not None else None
+        sinks = self.graph.active
+        snapshot['sinks'] = {sink.name: sink.stats() for sink in sinks}
+        snapshot['sink_underruns'] = sum(sink.underruns for sink in sinks)
+        monitor = self.vad_monitor
+        snapshot['vad_load'] = monitor.load if monitor is not None else None
+        spotter = self.keyword_spotter
+        snapshot['keyword_load'] = spotter.busy_seconds / spotter.audio_seconds if spotter and spotter.audio_seconds else None
+        streams = [stream for stream in [self.stream] + [sink.stream for sink in sinks] if stream is not None]
+        try:
+            snapshot['cpu_load'] = sum(stream.get_cpu_load() for stream in streams) if streams and self.running else None
+        except (OSError, AttributeError):  # The Stream Was Closed Between the Check and the Call
+            snapshot['cpu_load'] = None
+        return snapshot
+    
+    def start_metrics_log(self, path, interval=5.0):
+        """Appends a JSON line of health_snapshot() to path every interval seconds."""
+        self.stop_metrics_log()
+        self.metrics_logger = MetricsLogger(self.health_snapshot, path, interval)
+        self.metrics_logger.start()
+    
+    def stop_metrics_log(self):
+        if self.metrics_logger:
+            self.metrics_logger.stop()
+            self.metrics_logger = None
+    
     def print_routing_info(self, input_index, mic_output_index, channel_count, sample_rate):
         print(f"\n\033[91m-- Audio Routing Starting... --\033[0m")
         print(f"Input Index: {input_index}")
@@ -311,75 +940,33 @@ class AudioRouting:
     def process_audio(self, indata, outdata, frames, time_info, status):
         """
         Audio callback function that processes input audio data and routes it to output.
-        Now includes spectral analysis and reconstruction.
-        """
-        if status:
-            print(f"Status: {status}")
-        
-        original_audio = indata.copy()
+        Copies the input into outdata and runs the effect chain over it in place
+        (see EffectChain): by default the streaming STFT noise gate (which delays
+        the gated signal by one STFT window), the volume, and the soundboard clips.
         
-        # Perform FFT if spectrum analyzer is enabled
-        if self.audio_values.get_spectrum():
-            # Get sample rate from the input device
-            sample_rate = int(self.audio_devices.mic_input['defaultSampleRate'])
-            
-            # Compute FFT (use only first channel if stereo)
-            audio_data = indata[:, 0] if indata.ndim > 1 else indata
-            
-            # Store the complete FFT result (including phase information)
-            self.complete_fft_result = fft(audio_data)
-            
-            # For visualization purposes only
-            fft_result = self.complete_fft_result.copy()
-            n = len(audio_data)
-            freq_bins = np.fft.fftfreq(n, 1/sample_rate)
-            
-            # Get the positive frequencies (for visualization)
-            positive_mask = freq_bins > 0
-            freq_bins_positive = freq_bins[positive_mask]
-            fft_magnitude = np.abs(fft_result[positive_mask]) / n  # Normalize
-            
-            # Apply noise threshold to the magnitude for visualization
-            noise_threshold = self.audio_values.get_noise_threshold()
-            fft_magnitude[fft_magnitude < noise_threshold] = 0
-            
-            # Store the FFT data for plotting
-            self.fft_data = (freq_bins_positive, fft_magnitude)
-        
-        # Reconstruct audio from FFT data if needed
-        if hasattr(self, 'complete_fft_result'):
-            # Apply noise threshold to the complete FFT result if desired
-            if self.audio_values.get_spectrum():
-                # Apply noise threshold to the complete FFT result
-                noise_threshold = self.audio_values.get_noise_threshold()
-                n = len(self.complete_fft_result)
-                # Create mask using normalized magnitudes
-                mask = np.abs(self.complete_fft_result) / n < noise_threshold
-                filtered_fft = self.complete_fft_result.copy()
-                filtered_fft[mask] = 0
-                
-                # Ensure the DC component (0 Hz) is preserved
-                if len(filtered_fft) > 0:
-                    filtered_fft[0] = self.complete_fft_result[0]
-                
-                # Ensure conjugate symmetry for real input
-                if n % 2 == 0:  # If even number of samples
-                    filtered_fft[n//2] = self.complete_fft_result[n//2]
-                
-                # Use inverse FFT to reconstruct the audio
-                reconstructed_audio = ifft(filtered_fft).real
-                
-                # Handle stereo if needed
-                if indata.ndim > 1:
-                    reconstructed_audio = np.column_stack([reconstructed_audio] * indata.shape[1])
-                
-                indata = reconstructed_audio
+        Works entirely in the preallocated buffers from configure_stream(), writing
+        the result into outdata, so steady-state calls do not allocate arrays.
+        """
+        # Hand the input to the spectrum analyzer thread, a copy is all we do here
+        if self.spectrum_enabled:
+            self.analysis_ring.write(indata)
         
-        # Apply volume adjustment
-        indata *= self.audio_values.get_volume() / 100.0
+        # With a Worker, the Chain Runs in Its Process and Comes Back latency_blocks Later; Clips Are Mixed Here
+        worker = self.dsp_worker
+        if worker is not None:
+            worker.exchange(indata, outdata)
+            clips = self.effects.get('clips')
+            if clips is not None and not clips.bypass:
+                clips.process(outdata)
+        else:
+            # Every Stage Works on the Output Block in Place
+            np.copyto(outdata, indata)
+            self.effects.process(outdata)
         
-        # Route audio to output
-        outdata[:] = indata
+        # Keep the Processed Block for Instant Replay (At Most Two Slice Copies)
+        replay = self.replay
+        if replay is not None:
+            replay.write(outdata)
 
 
 class AudioValues:
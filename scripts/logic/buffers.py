@@ -0,0 +1,241 @@
+import os
+import wave
+
+import numpy as np
+
+class AudioBufferPool:
+    """
+    Preallocated working memory for the real-time audio callback.
+
+    Block-sized arrays the callback writes into are allocated here once per
+    stream configuration, so steady-state callbacks only ever write into
+    existing memory instead of creating new arrays.
+
+    Args:
+        frames (int): Frames per buffer the stream was opened with.
+        channels (int): Number of interleaved channels.
+        sample_rate (int): Stream sample rate.
+    """
+    def __init__(self, frames, channels, sample_rate):
+        self.frames = frames
+        self.channels = channels
+        self.sample_rate = sample_rate
+
+        # Output Block Handed Back to PortAudio
+        self.output = np.zeros((frames, channels), dtype=np.float32)
+
+        # Scratch Block for Intermediate Processing
+        self.scratch = np.zeros((frames, channels), dtype=np.float32)
+
+    def fits(self, frames, channels, sample_rate):
+        """Returns True if this pool was sized for the given stream configuration."""
+        return self.frames == frames and self.channels == channels and self.sample_rate == sample_rate
+
+class RingBuffer:
+    """
+    Single-producer/single-consumer ring of float32 frames.
+
+    The producer (the audio callback) only ever copies into the preallocated
+    array and never waits: if the consumer has fallen behind and the ring is
+    full, the frames that do not fit are dropped and counted instead. Each
+    side only advances its own index, so no lock is needed.
+
+    Args:
+        capacity (int): Number of frames the ring holds.
+        channels (int): Number of channels per frame.
+    """
+    def __init__(self, capacity, channels):
+        self.capacity = capacity
+        self.channels = channels
+        self.data = np.zeros((capacity, channels), dtype=np.float32)
+
+        # Monotonic Frame Counters, Each Advanced by One Side Only
+        self.write_index = 0
+        self.read_index = 0
+        self.dropped = 0
+
+    def available(self):
+        """Number of frames written but not yet read."""
+        return self.write_index - self.read_index
+
+    def write(self, block):
+        """
+        Producer side: copies as much of the block as fits, in at most two slices.
+
+        Returns:
+            int: Number of frames written; the rest were dropped.
+        """
+        frames = min(len(block), self.capacity - (self.write_index - self.read_index))
+        if frames < len(block):
+            self.dropped += len(block) - frames
+        if frames <= 0:
+            return 0
+
+        start = self.write_index % self.capacity
+        first = min(frames, self.capacity - start)
+        self.data[start:start + first] = block[:first]
+        if first < frames:
+            self.data[:frames - first] = block[first:frames]
+
+        # Publish Only After the Copy Is Complete
+        self.write_index += frames
+        return frames
+
+    def read(self, out):
+        """
+        Consumer side: copies up to len(out) frames into out.
+
+        Returns:
+            int: Number of frames read.
+        """
+        frames = min(len(out), self.write_index - self.read_index)
+        if frames <= 0:
+            return 0
+
+        start = self.read_index % self.capacity
+        first = min(frames, self.capacity - start)
+        out[:first] = self.data[start:start + first]
+        if first < frames:
+            out[first:frames] = self.data[:frames - first]
+
+        # Release the Space Only After the Copy Is Complete
+        self.read_index += frames
+        return frames
+
+    def skip(self, frames):
+        """Consumer side: discards up to `frames` of the oldest unread frames."""
+        frames = min(frames, self.write_index - self.read_index)
+        self.read_index += frames
+        return frames
+
+    def reset(self):
+        """Empties the ring. Only call while neither side is running."""
+        self.write_index = 0
+        self.read_index = 0
+        self.dropped = 0
+
+class ReplayBuffer:
+    """
+    The last `seconds` of audio, in one fixed circular float32 array.
+
+    The array is sized from sample rate x channels x seconds when the buffer is
+    built, so memory is bounded and known up front (see nbytes). The writer (the
+    audio callback) copies each block in at most two slices and never
+    allocates. It overwrites the oldest audio and never waits on readers.
+
+    Readers either take zero-copy views (at most two, oldest first) of the live
+    array, which stay valid only until the writer laps them, or one contiguous
+    copy. The copy checks the write position before and after it and trims any
+    part the writer overwrote meanwhile, so it is never torn. A little headroom
+    past `seconds` lets a full-length copy finish while the stream runs.
+
+    Args:
+        seconds (float): Audio held.
+        sample_rate (int): Stream sample rate.
+        channels (int): Number of channels.
+        headroom (float): Extra seconds the array holds, so the writer can advance during a copy.
+    """
+    def __init__(self, seconds, sample_rate, channels, headroom=0.25):
+        self.seconds = seconds
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.length = max(1, int(round(seconds * sample_rate)))
+        self.capacity = self.length + int(headroom * sample_rate)
+        self.data = np.zeros((self.capacity, channels), dtype=np.float32)
+        self.nbytes = self.data.nbytes
+
+        # Monotonic Frame Counter and the Largest Block Seen, Both Advanced by the Writer Only
+        self.write_index = 0
+        self.largest_block = 0
+
+    def write(self, block):
+        """Writer side: appends a block, overwriting the oldest frames."""
+        frames = len(block)
+        if frames > self.largest_block:
+            self.largest_block = frames
+        if frames >= self.capacity:
+            # Longer Than the Buffer: Only Its Tail Survives
+            block = block[frames - self.capacity:]
+            self.write_index += frames - self.capacity
+            frames = self.capacity
+        start = self.write_index % self.capacity
+        first = min(frames, self.capacity - start)
+        self.data[start:start + first] = block[:first]
+        if first < frames:
+            self.data[:frames - first] = block[first:]
+        self.write_index += frames
+
+    def available(self):
+        """Frames a snapshot can return (`seconds` worth once the buffer has filled)."""
+        return min(self.write_index, self.length)
+
+    def reset(self):
+        self.write_index = 0
+        self.largest_block = 0
+
+    def views(self, frames=None):
+        """
+        Zero-copy views of the newest frames, oldest first.
+
+        Args:
+            frames (int): How many frames (up to `seconds` worth, all available by default).
+
+        Returns:
+            tuple: (views, end) where views is a list of one or two arrays into the
+            live buffer and end is the write position they end at. They stay intact
+            while write_index + largest_block - end <= capacity - frames.
+        """
+        end = self.write_index
+        frames = min(self.available() if frames is None else frames, end, self.length)
+        start = (end - frames) % self.capacity
+        if start + frames <= self.capacity:
+            return [self.data[start:start + frames]], end
+        return [self.data[start:], self.data[:start + frames - self.capacity]], end
+
+    def snapshot(self, seconds=None, copy=True):
+        """
+        The newest audio.
+
+        Args:
+            seconds (float): How much (all held by default).
+            copy (bool): One contiguous copy (safe to keep) or, if False, the views from views().
+
+        Returns:
+            np.ndarray or list: (frames, channels) copy, or a list of views, oldest first.
+        """
+        frames = None if seconds is None else int(round(seconds * self.sample_rate))
+        views, end = self.views(frames)
+        if not copy:
+            return views
+        total = sum(len(view) for view in views)
+        out = np.empty((total, self.channels), dtype=np.float32)
+        position = 0
+        for view in views:
+            out[position:position + len(view)] = view
+            position += len(view)
+
+        # Frames the Writer Reached While We Copied (Plus the Block It May Be Copying
+        # but Has Not Published Yet) Were Overwritten at the Oldest End
+        overwritten = self.write_index + self.largest_block - end - (self.capacity - total)
+        if overwritten > 0:
+            return out[min(overwritten, total):]
+        return out
+
+    def export(self, path, seconds=None, sampwidth=2):
+        """
+        Writes a snapshot to a WAV file. Call it off the audio thread.
+
+        Returns:
+            float: Seconds of audio written.
+        """
+        from scripts.logic.offline import float_to_pcm
+        audio = self.snapshot(seconds)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with wave.open(path, 'wb') as writer:
+            writer.setnchannels(self.channels)
+            writer.setsampwidth(sampwidth)
+            writer.setframerate(self.sample_rate)
+            writer.writeframes(float_to_pcm(audio, sampwidth))
+        return len(audio) / self.sample_rate
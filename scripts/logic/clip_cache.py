@@ -0,0 +1,258 @@
+"""
+On-disk cache of decoded soundboard clips.
+
+Decoded clips are stored as .npy files named after a hash of the source
+file's contents plus the sample rate and channel count, and opened with
+np.load(mmap_mode='r'), so a library of thousands of clips costs one decode
+ever and, afterwards, only the pages actually played are read from disk.
+Entries are mapped lazily, the first time a clip is played or when it is in
+the hot set. The cache is capped in bytes and evicts the least recently
+played files; a background thread records plays and pages in the start of
+every mapped clip and the hot set, so the audio callback rarely has to wait
+on the disk. A clip larger than the whole cap is not cached at all.
+"""
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from scripts.logic.clips import decode_clip
+
+INDEX_FILE = 'index.json'
+PAGE_BYTES = 4096
+
+class ClipCache:
+    """
+    Args:
+        directory (str): Where the .npy files and the index live.
+        max_bytes (int): Size cap of the cached files; least recently played files are evicted beyond it.
+        head_seconds (float): Start of every clip to keep paged in, so triggers begin without disk reads.
+        resident_bytes (int): How much of the most recently played clips the warm-up thread pages in fully.
+    """
+    def __init__(self, directory, max_bytes=2 * 1024 ** 3, head_seconds=0.5, resident_bytes=256 * 1024 ** 2):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.head_seconds = head_seconds
+        self.resident_bytes = resident_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        # Cached Files (Name -> Size, Last Used) and Source Hashes (Path -> Size, mtime, Hash)
+        self.lock = threading.RLock()
+        self.entries = {}
+        self.hashes = {}
+        self.dirty = False
+        self.load_index()
+
+        # Arrays Currently Mapped, by File Name
+        self.mapped = {}
+
+        # Warm-Up Requests (Arrays to Page In) and Plays to Record, Served by a Background Thread
+        self.warm_queue = collections.deque()
+        self.touched = collections.deque()
+        self.warm_event = threading.Event()
+        self.warm_thread = None
+
+    def load_index(self):
+        path = os.path.join(self.directory, INDEX_FILE)
+        try:
+            with open(path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        self.hashes = index.get('hashes', {})
+
+        # Trust the Files on Disk Over the Index
+        entries = index.get('entries', {})
+        for name in os.listdir(self.directory):
+            if name.endswith('.npy'):
+                size = os.path.getsize(os.path.join(self.directory, name))
+                self.entries[name] = {'size': size, 'last_used': entries.get(name, {}).get('last_used', 0.0)}
+
+    def save_index(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            index = {'entries': self.entries, 'hashes': self.hashes}
+            self.dirty = False
+        path = os.path.join(self.directory, INDEX_FILE)
+        temporary = path + '.tmp'
+        try:
+            with open(temporary, 'w') as f:
+                json.dump(index, f)
+            os.replace(temporary, path)
+        except OSError as e:
+            print(f"\033[91mCould not save the clip cache index: {e}\033[0m")
+
+    def content_hash(self, path):
+        """SHA-1 of the file's contents, remembered per (size, mtime) so unchanged files are not read again."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        known = self.hashes.get(path)
+        if known is not None and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        with self.lock:
+            self.hashes[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+            self.dirty = True
+        return digest.hexdigest()
+
+    @staticmethod
+    def file_name(content_hash, sample_rate, channels):
+        return f"{content_hash}_{int(sample_rate)}hz_{int(channels)}ch.npy"
+
+    def lookup(self, path, sample_rate, channels):
+        """The entry (file name) holding a clip in this format, or None if it is not cached. Does not map it."""
+        name = self.file_name(self.content_hash(path), sample_rate, channels)
+        with self.lock:
+            cached = name in self.entries
+        if cached and os.path.exists(os.path.join(self.directory, name)):
+            return name
+        return None
+
+    def add(self, path, sample_rate, channels, make_room=True):
+        """
+        Decodes a clip and caches it, evicting least recently played entries to
+        make room unless make_room is False.
+
+        Returns:
+            tuple: (entry name, None) once cached; (None, decoded array) if the clip
+            alone is larger than max_bytes, so it is kept in memory instead; or
+            (None, None) if it did not fit and make_room was False.
+        """
+        name = self.file_name(self.content_hash(path), sample_rate, channels)
+        data = decode_clip(path, sample_rate, channels)
+        if data.nbytes > self.max_bytes:
+            print(f"\033[93mClip {os.path.basename(path)} ({data.nbytes / 1024 ** 2:.0f} MB) is larger than the "
+                  f"clip cache; keeping it in memory.\033[0m")
+            return None, data
+        if not make_room and self.size() + data.nbytes > self.max_bytes:
+            return None, None
+        self.store(name, data)
+        return name, None
+
+    def open(self, name, sample_rate):
+        """
+        Maps a cached entry (once; later calls return the same array) and queues
+        its start to be paged in.
+
+        Returns:
+            np.ndarray: Read-only (frames, channels) float32 array, or None if the entry was evicted.
+        """
+        with self.lock:
+            data = self.mapped.get(name)
+        if data is not None:
+            return data
+
+        # A Plain ndarray View of the Mapping (Cheaper to Slice Than np.memmap)
+        try:
+            data = np.asarray(np.load(os.path.join(self.directory, name), mmap_mode='r'))
+        except FileNotFoundError:
+            with self.lock:
+                if self.entries.pop(name, None) is not None:
+                    self.dirty = True
+            return None
+        with self.lock:
+            self.mapped[name] = data
+        self.warm(data, self.head_frames(sample_rate))
+        return data
+
+    def touch(self, name):
+        """Marks an entry as just played. Only queues the name; the warm-up thread updates the index."""
+        self.touched.append(name)
+        self.start_warm_up()
+
+    def store(self, name, data):
+        """Writes a decoded clip atomically, then evicts least recently played files over the cap."""
+        file = os.path.join(self.directory, name)
+        temporary = file + '.tmp'
+        with open(temporary, 'wb') as f:
+            np.save(f, np.ascontiguousarray(data, dtype=np.float32))
+        os.replace(temporary, file)
+        with self.lock:
+            self.entries[name] = {'size': os.path.getsize(file), 'last_used': time.time()}
+            self.dirty = True
+        self.evict(keep=name)
+
+    def size(self):
+        with self.lock:
+            return sum(entry['size'] for entry in self.entries.values())
+
+    def evict(self, keep=None):
+        """Deletes least recently played files until the cache fits max_bytes, never the entry `keep`."""
+        with self.lock:
+            total = self.size()
+            for name, entry in sorted(self.entries.items(), key=lambda item: item[1]['last_used']):
+                if total <= self.max_bytes:
+                    break
+                if name == keep:
+                    continue
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    continue  # Still Mapped on Platforms That Lock Open Files
+                total -= entry['size']
+                del self.entries[name]
+                self.mapped.pop(name, None)
+                self.dirty = True
+
+    def head_frames(self, sample_rate):
+        return int(self.head_seconds * sample_rate)
+
+    def warm(self, data, frames=None):
+        """Queues an array's first `frames` (or all of it) to be paged in by the warm-up thread."""
+        self.warm_queue.append((data, frames))
+        self.start_warm_up()
+
+    def start_warm_up(self):
+        self.warm_event.set()
+        if self.warm_thread is None:
+            self.warm_thread = threading.Thread(target=self.run_warm_up, name="ClipCacheWarmUp", daemon=True)
+            self.warm_thread.start()
+
+    def warm_hot_set(self, names, sample_rate):
+        """Maps the most recently played of the given entries, up to resident_bytes, and queues them to be paged in fully."""
+        with self.lock:
+            ranked = sorted((name for name in names if name in self.entries),
+                            key=lambda name: self.entries[name]['last_used'], reverse=True)
+            sizes = [self.entries[name]['size'] for name in ranked]
+        budget = self.resident_bytes
+        for name, size in zip(ranked, sizes):
+            if size > budget:
+                break
+            data = self.open(name, sample_rate)
+            if data is not None:
+                budget -= size
+                self.warm_queue.append((data, None))
+        self.start_warm_up()
+
+    def run_warm_up(self):
+        while True:
+            self.warm_event.wait()
+            self.warm_event.clear()
+            while self.touched:
+                name = self.touched.popleft()
+                with self.lock:
+                    entry = self.entries.get(name)
+                    if entry is not None:
+                        entry['last_used'] = time.time()
+                        self.dirty = True
+            while self.warm_queue:
+                data, frames = self.warm_queue.popleft()
+                self.page_in(data if frames is None else data[:frames])
+            self.save_index()
+
+    @staticmethod
+    def page_in(data):
+        """Touches one value per page, so the OS reads the pages into memory."""
+        flat = data.reshape(-1)
+        step = max(1, PAGE_BYTES // flat.itemsize)
+        float(flat[::step].sum())
@@ -0,0 +1,343 @@
+"""
+Soundboard clip playback mixed into the live stream.
+
+Clips are decoded ahead of time, off the audio thread, to float32 at the
+stream's sample rate and channel count. The Qt thread triggers clips by
+appending to a deque, which the audio callback drains; the callback then
+adds each playing clip's next slice into outdata. Mixing costs
+O(active clips x frames) and never decodes, resamples or allocates arrays.
+"""
+import collections
+import os
+import threading
+
+import numpy as np
+
+CLIP_EXTENSIONS = ('.wav', '.mp3', '.ogg', '.flac', '.m4a', '.aac', '.aiff', '.aif')
+
+def decode_clip(path, sample_rate, channels):
+    """
+    Decodes an audio file to a (frames, channels) float32 array at sample_rate.
+
+    librosa is used when available (it resamples with a high-quality filter);
+    pydub (ffmpeg) is the fallback. Both are imported only when a clip is
+    decoded, so the audio path does not pay for them at startup.
+
+    Raises:
+        ImportError: If neither librosa nor pydub is installed.
+    """
+    try:
+        import librosa
+        data, _ = librosa.load(path, sr=sample_rate, mono=False, dtype=np.float32)
+        data = data[np.newaxis, :] if data.ndim == 1 else data
+        data = data.T
+    except ImportError:
+        from pydub import AudioSegment
+        segment = AudioSegment.from_file(path).set_frame_rate(sample_rate)
+        samples = np.array(segment.get_array_of_samples(), dtype=np.float32)
+        data = samples.reshape(-1, segment.channels) / float(1 << (8 * segment.sample_width - 1))
+    return match_channels(data, channels)
+
+def match_channels(data, channels):
+    """Maps a (frames, n) clip to `channels`: mono is copied to every channel, extra channels are averaged in."""
+    have = data.shape[1]
+    if have == channels:
+        mapped = data
+    elif have == 1:
+        mapped = np.repeat(data, channels, axis=1)
+    elif channels == 1:
+        mapped = data.mean(axis=1, keepdims=True)
+    elif have > channels:
+        mapped = data[:, :channels]
+    else:
+        mapped = np.concatenate([data, np.repeat(data[:, -1:], channels - have, axis=1)], axis=1)
+    return np.ascontiguousarray(mapped, dtype=np.float32)
+
+class Voice:
+    """One playing instance of a clip (reused between triggers)."""
+    __slots__ = ('name', 'data', 'position', 'gain')
+
+    def __init__(self):
+        self.name = None
+        self.data = None
+        self.position = 0
+        self.gain = 1.0
+
+class ClipEngine:
+    """
+    Decodes, holds and mixes soundboard clips.
+
+    Args:
+        max_voices (int): Most clips playing at once; further triggers steal the oldest voice.
+        gain (float): Master gain of all clips.
+        cache (ClipCache): On-disk cache of decoded clips, or None to decode into memory.
+    """
+    def __init__(self, max_voices=32, gain=1.0, cache=None):
+        self.max_voices = max_voices
+        self.gain = gain
+        self.cache = cache
+
+        # Registered Clips (Name -> Path) and Their Decoded Audio for the Current Format. The
+        # Decoder Thread Reads the Registry While the Owning Thread Edits It, so Both Hold the Lock
+        self.sources = {}
+        self.decoded = {}
+        self.clip_gains = {}
+        self.sources_lock = threading.Lock()
+
+        # With a Cache: Clips Cached but Not Mapped Yet (Name -> Cache Entry), Mapped on First Trigger,
+        # and Clips Triggered Before They Were Ready, Decoded Even When the Cache Is Full
+        self.cached = {}
+        self.requested = set()
+        self.cache_full = False
+
+        # Decoder -> Owning Thread: (Name, Path) of Clips That Failed to Decode, Dropped by drop_failed()
+        self.failures = collections.deque()
+
+        # Stream Format the Decoded Clips Match
+        self.sample_rate = None
+        self.channels = None
+        self.scratch = None
+
+        # Qt Thread -> Audio Thread Commands; deque Appends and Pops Are Atomic
+        self.commands = collections.deque()
+
+        # Voices, Owned by the Audio Thread Once Configured
+        self.voices = [Voice() for _ in range(max_voices)]
+        self.free = list(self.voices)
+        self.active = []
+
+        # Background Decoding
+        self.decode_lock = threading.Lock()
+        self.decode_thread = None
+
+    def add(self, name, path, gain=1.0):
+        """Registers a clip and decodes it in the background if the format is known."""
+        with self.sources_lock:
+            self.sources[name] = path
+            self.clip_gains[name] = gain
+        self.decoded.pop(name, None)
+        self.cached.pop(name, None)
+        if self.sample_rate is not None:
+            self.preload()
+
+    def add_directory(self, directory):
+        """Registers every audio file in a directory, named after the file."""
+        if not os.path.isdir(directory):
+            return []
+        names = []
+        for file in sorted(os.listdir(directory)):
+            if file.lower().endswith(CLIP_EXTENSIONS):
+                name = os.path.splitext(file)[0]
+                self.add(name, os.path.join(directory, file))
+                names.append(name)
+        return names
+
+    def remove(self, name):
+        with self.sources_lock:
+            self.sources.pop(name, None)
+            self.clip_gains.pop(name, None)
+            self.requested.discard(name)
+        self.decoded.pop(name, None)
+        self.cached.pop(name, None)
+        self.commands.append(('stop', name))
+
+    def names(self):
+        """Registered clip names in the order they were added (a snapshot), without those that failed to decode."""
+        self.drop_failed()
+        with self.sources_lock:
+            return list(self.sources)
+
+    def drop_failed(self):
+        """
+        Unregisters the clips the decoder reported as undecodable. Runs on the
+        thread that owns the clip list (the decoder only reports them).
+
+        Returns:
+            list: Names of the clips dropped.
+        """
+        dropped = []
+        while self.failures:
+            name, path = self.failures.popleft()
+            with self.sources_lock:
+                # Unless It Was Added Again With Another File Since
+                if self.sources.get(name) == path:
+                    del self.sources[name]
+                    self.clip_gains.pop(name, None)
+                    dropped.append(name)
+        return dropped
+
+    def configure(self, sample_rate, channels, frames):
+        """
+        Matches the stream format. Clips decoded for another rate or channel
+        count are decoded again in the background; block size changes only
+        resize the scratch buffer.
+        """
+        if self.scratch is None or len(self.scratch) < frames or self.scratch.shape[1] != channels:
+            self.scratch = np.zeros((frames, channels), dtype=np.float32)
+        if sample_rate == self.sample_rate and channels == self.channels:
+            return
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.decoded = {}
+        self.cached = {}
+        self.cache_full = False
+        self.commands.append(('stop', None))
+        self.preload()
+
+    def preload(self):
+        """Decodes every registered clip that is not decoded yet, on a background thread."""
+        if self.decode_thread is not None and self.decode_thread.is_alive():
+            return
+        self.decode_thread = threading.Thread(target=self.decode_missing, name="ClipDecoder", daemon=True)
+        self.decode_thread.start()
+
+    def decode_missing(self):
+        with self.decode_lock:
+            failed = set()
+            deferred = set()
+            while True:
+                sample_rate, channels = self.sample_rate, self.channels
+                with self.sources_lock:
+                    requested = set(self.requested)
+                    missing = [(name, path) for name, path in self.sources.items()
+                               if name not in self.decoded and name not in self.cached and (name, path) not in failed
+                               and ((name, path) not in deferred or name in requested)]
+                if not missing or sample_rate is None:
+                    break
+                for name, path in missing:
+                    data = entry = None
+                    try:
+                        if self.cache is None:
+                            data = decode_clip(path, sample_rate, channels)
+                        else:
+                            entry = self.cache.lookup(path, sample_rate, channels)
+                            if entry is None:
+                                # Fill the Cache Only Until It Is Full, so a Library Larger Than the Cap Does
+                                # Not Evict Itself; the Rest Are Decoded When First Triggered, Evicting the
+                                # Least Recently Played
+                                wanted = name in requested
+                                if not wanted and self.cache_full:
+                                    deferred.add((name, path))
+                                    continue
+                                entry, data = self.cache.add(path, sample_rate, channels, make_room=wanted)
+                                if entry is None and data is None:
+                                    self.cache_full = True
+                                    deferred.add((name, path))
+                                    continue
+                    except Exception as e:
+                        print(f"\033[91mCould not decode clip '{name}' ({path}): {e}\033[0m")
+                        failed.add((name, path))
+                        self.failures.append((name, path))
+                        continue
+                    finally:
+                        with self.sources_lock:
+                            if (name, path) not in deferred:
+                                self.requested.discard(name)
+
+                    # Only Publish if the Format and the Clip's File Did Not Change While Decoding
+                    if (sample_rate, channels) == (self.sample_rate, self.channels) and self.sources.get(name) == path:
+                        if entry is not None:
+                            self.cached[name] = entry
+                        else:
+                            self.decoded[name] = data
+
+            # Map and Page In the Most Recently Played Clips
+            if self.cache is not None and sample_rate is not None:
+                self.cache.warm_hot_set(list(self.cached.values()), sample_rate)
+
+    def is_ready(self, name):
+        return name in self.decoded or name in self.cached
+
+    def trigger(self, name, gain=None):
+        """
+        Starts playing a clip. Safe to call from any thread but the audio
+        thread: it appends to a deque that the audio callback drains, after
+        mapping a cached clip on its first trigger.
+
+        Returns:
+            bool: False if the clip is not decoded (yet).
+        """
+        data = self.decoded.get(name)
+        entry = self.cached.get(name)
+        if data is None and entry is not None:
+            data = self.cache.open(entry, self.sample_rate)
+            if data is None:
+                self.cached.pop(name, None)  # Evicted Since; Decoded Again Below
+            else:
+                self.decoded[name] = data
+        if data is None:
+            if name in self.sources:
+                with self.sources_lock:
+                    self.requested.add(name)
+                self.preload()
+            return False
+        if entry is not None:
+            # Page In the Rest of the Clip While Its (Already Resident) Start Plays, and Record
+            # the Play (on the Cache's Own Thread) for Eviction and the Hot Set
+            self.cache.warm(data)
+            self.cache.touch(entry)
+        self.commands.append(('play', (name, data, self.clip_gains.get(name, 1.0) if gain is None else gain)))
+        return True
+
+    def stop(self, name=None):
+        """Stops one clip, or every clip if name is None."""
+        self.commands.append(('stop', name))
+
+    def mix(self, outdata):
+        """
+        Audio thread: applies pending triggers, then adds every playing clip's
+        next slice into outdata.
+        """
+        commands = self.commands
+        active = self.active
+        if not active and not commands:
+            return
+
+        # Apply Triggers and Stops From Other Threads
+        while commands:
+            command, argument = commands.popleft()
+            if command == 'play':
+                name, data, gain = argument
+                if len(data) == 0 or data.shape[1] != outdata.shape[1]:
+                    continue
+                voice = self.free.pop() if self.free else active.pop(0)
+                voice.name = name
+                voice.data = data
+                voice.position = 0
+                voice.gain = gain
+                active.append(voice)
+            else:
+                for i in range(len(active) - 1, -1, -1):
+                    if argument is None or active[i].name == argument:
+                        self.release(active.pop(i))
+
+        # Add the Next Slice of Each Voice; Finished Voices Go Back to the Pool
+        frames = len(outdata)
+        scratch = self.scratch
+        master = self.gain
+        i = 0
+        while i < len(active):
+            voice = active[i]
+            data = voice.data
+            start = voice.position
+            count = min(frames, len(data) - start)
+            gain = voice.gain * master
+            if gain == 1.0:
+                np.add(outdata[:count], data[start:start + count], out=outdata[:count])
+            else:
+                np.multiply(data[start:start + count], gain, out=scratch[:count])
+                np.add(outdata[:count], scratch[:count], out=outdata[:count])
+            voice.position = start + count
+            if voice.position >= len(data):
+                self.release(active.pop(i))
+            else:
+                i += 1
+
+    def release(self, voice):
+        voice.data = None
+        voice.name = None
+        self.free.append(voice)
+
+    def playing(self):
+        """Names of the clips playing right now (a snapshot, for display)."""
+        return [voice.name for voice in list(self.active)]
@@ -0,0 +1,195 @@
+"""
+Handlers for the voice commands listed in the README: web search, weather by
+zip code, backups, pushing repositories and sending messages. Also commands
+on the audio route itself, such as saving the last seconds of audio.
+
+The handlers never touch the network, the browser, git or the file system
+directly. They go through a Services object, so local stand-ins (a local HTTP
+server, a bare repository in a temporary directory) can replace the real
+services. What each handler acts on (search engines, backup targets,
+repositories, webhooks) comes from json/commands.json.
+"""
+import asyncio
+import datetime
+import difflib
+import json
+import os
+import shutil
+import urllib.parse
+import urllib.request
+import webbrowser
+
+DEFAULT_SETTINGS = {
+    'search_engines': {
+        'perplexity': 'https://www.perplexity.ai/search?q={query}',
+        'chatgpt': 'https://chatgpt.com/?q={query}',
+        'google': 'https://www.google.com/search?q={query}',
+    },
+    'default_engine': 'perplexity',
+    'weather_url': 'https://wttr.in/{zip}?format=3',
+    'backups': {},
+    'repositories': {},
+    'webhooks': {},
+}
+
+def load_settings(path):
+    """Reads commands.json over the defaults; a missing file gives the defaults."""
+    settings = json.loads(json.dumps(DEFAULT_SETTINGS))
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            settings.update(json.load(f))
+    return settings
+
+def pick(kind, name, choices):
+    """Resolves a spoken name to a configured one, tolerating misheard words."""
+    key = name.replace(' ', '').lower()
+    names = {choice.replace(' ', '').replace('_', '').replace('-', '').lower(): choice for choice in choices}
+    close = difflib.get_close_matches(key, names, n=1, cutoff=0.6)
+    if not close:
+        known = ', '.join(choices) if choices else 'none configured'
+        raise LookupError(f"Unknown {kind} '{name}' (known: {known}).")
+    return names[close[0]]
+
+class Services:
+    """
+    The outside world as the handlers see it.
+
+    Args:
+        http_timeout (float): Seconds an HTTP request may take.
+    """
+    def __init__(self, http_timeout=10.0):
+        self.http_timeout = http_timeout
+
+    def open_url(self, url):
+        return webbrowser.open(url)
+
+    async def http_get(self, url):
+        """Returns the response body as text."""
+        request = urllib.request.Request(url, headers={'User-Agent': 'curl/8'})
+        return await asyncio.to_thread(self.read, request)
+
+    async def http_post_json(self, url, payload):
+        """POSTs payload as JSON and returns the response body as text."""
+        request = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'), method='POST',
+                                         headers={'Content-Type': 'application/json'})
+        return await asyncio.to_thread(self.read, request)
+
+    def read(self, request):
+        with urllib.request.urlopen(request, timeout=self.http_timeout) as response:
+            return response.read().decode('utf-8', errors='replace')
+
+    async def run(self, args, cwd=None):
+        """
+        Runs a program without blocking the loop; it is killed if the command is cancelled.
+
+        Returns:
+            tuple: (exit code, stdout, stderr) with the output as text.
+        """
+        process = await asyncio.create_subprocess_exec(*args, cwd=cwd, stdin=asyncio.subprocess.DEVNULL,
+                                                       stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        try:
+            stdout, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+        return process.returncode, stdout.decode(errors='replace'), stderr.decode(errors='replace')
+
+    async def copy(self, source, destination):
+        """Copies a file or directory tree in a worker thread."""
+        if os.path.isdir(source):
+            await asyncio.to_thread(shutil.copytree, source, destination)
+        else:
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            await asyncio.to_thread(shutil.copy2, source, destination)
+        return destination
+
+class DefaultCommands:
+    """
+    The README's commands.
+
+    Args:
+        settings (dict): As returned by load_settings.
+        services (Services): What the handlers act through; a Services() if None.
+    """
+    def __init__(self, settings=None, services=None):
+        self.settings = settings if settings is not None else load_settings('')
+        self.services = services if services is not None else Services()
+
+    def register(self, registry):
+        registry.add('search', ["search {query}", "search for {query}", "look up {query}",
+                                "search {engine:word} for {query}", "ask {engine:word} {query}"],
+                     self.search, timeout=5.0, description="Opens a web search (Perplexity, ChatGPT, ...).")
+        registry.add('weather', ["weather {zip:number}", "weather for {zip:number}", "weather in {zip:number}",
+                                 "whats the weather in {zip:number}", "whats the weather for {zip:number}"],
+                     self.weather, timeout=15.0, description="Current weather for a zip code.")
+        registry.add('backup', ["back up {target}", "backup {target}", "run backup {target}", "run the {target} backup"],
+                     self.backup, timeout=600.0, exclusive=True, description="Copies a configured backup target.")
+        registry.add('push', ["push {repo}", "git push {repo}", "push repository {repo}", "push the {repo} repository"],
+                     self.push, timeout=120.0, exclusive=True, description="Runs git push in a configured repository.")
+        registry.add('message', ["message {channel} saying {text}", "send {channel} {text}",
+                                 "send a message to {channel} saying {text}", "tell {channel} {text}"],
+                     self.message, timeout=15.0, description="Posts to a configured Discord or Slack webhook.")
+        return registry
+
+    async def search(self, query, engine=None):
+        engines = self.settings['search_engines']
+        name = pick('search engine', engine, list(engines)) if engine else self.settings['default_engine']
+        url = engines[name].format(query=urllib.parse.quote_plus(query))
+        self.services.open_url(url)
+        return url
+
+    async def weather(self, zip):
+        text = await self.services.http_get(self.settings['weather_url'].format(zip=zip))
+        return text.strip()
+
+    async def backup(self, target):
+        backups = self.settings['backups']
+        name = pick('backup', target, list(backups))
+        source = os.path.expanduser(backups[name]['source'])
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        destination = os.path.join(os.path.expanduser(backups[name]['destination']),
+                                   f"{name}-{stamp}{os.path.splitext(source)[1]}")
+        return await self.services.copy(source, destination)
+
+    async def push(self, repo):
+        repositories = self.settings['repositories']
+        name = pick('repository', repo, list(repositories))
+        code, stdout, stderr = await self.services.run(['git', 'push'], cwd=os.path.expanduser(repositories[name]))
+        if code != 0:
+            raise RuntimeError(f"git push in '{name}' failed ({code}): {stderr.strip()}")
+        return (stdout + stderr).strip()
+
+    async def message(self, channel, text):
+        webhooks = self.settings['webhooks']
+        name = pick('channel', channel, list(webhooks))
+        hook = webhooks[name]
+        payload = {'text': text} if hook.get('kind', 'discord') == 'slack' else {'content': text}
+        await self.services.http_post_json(hook['url'], payload)
+        return name
+
+class RoutingCommands:
+    """
+    Commands acting on the running audio route.
+
+    Args:
+        routing (AudioRouting): The route.
+        directory (str): Where saved replays go.
+    """
+    def __init__(self, routing, directory):
+        self.routing = routing
+        self.directory = directory
+
+    def register(self, registry):
+        registry.add('replay', ["save the last {seconds:number} seconds", "save last {seconds:number} seconds",
+                                "save replay", "save that", "clip that"],
+                     self.save_replay, timeout=30.0, description="Saves the last seconds of audio to a WAV file.")
+        return registry
+
+    async def save_replay(self, seconds=None):
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(self.directory, f"replay_{stamp}.wav")
+        written = await asyncio.wrap_future(self.routing.save_replay(path, float(seconds) if seconds else None))
+        if written is None:
+            raise RuntimeError("Nothing to save: replay is off or the route has not started.")
+        return path
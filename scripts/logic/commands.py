@@ -0,0 +1,453 @@
+"""
+Voice commands: matching transcripts to handlers, and running the handlers.
+
+Command phrases such as "weather in {zip:number}" are indexed in a token
+trie. Literal words are trie edges and {slots} capture one or more words. A
+transcript is normalized to tokens and walked down the trie, so matching
+costs about the transcript's length rather than the number of commands.
+Misheard words ("whether" for "weather") are matched fuzzily, but only when
+no exact walk succeeds. Each trie node then looks the word up in an index of
+its children with one or two letters deleted (a symmetric delete index), so
+the lookup is a few dictionary probes and not a comparison against every
+child. Only the few candidates it finds are scored with difflib.
+
+Handlers run on an asyncio event loop in its own thread, with a concurrency
+limit, a timeout per command and cancellation, so a slow backup or network
+call never blocks audio or the UI. A handler may be async (and is then
+cancelled properly) or plain, in which case it runs in the loop's thread pool.
+"""
+import asyncio
+import difflib
+import functools
+import inspect
+import itertools
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+# Spoken Digits, Merged Into Numbers ("nine oh two one oh" -> "90210", "thirty five" -> "35")
+NUMBER_WORDS = {
+    'zero': '0', 'oh': '0', 'one': '1', 'two': '2', 'three': '3', 'four': '4',
+    'five': '5', 'six': '6', 'seven': '7', 'eight': '8', 'nine': '9',
+    'ten': '10', 'eleven': '11', 'twelve': '12', 'thirteen': '13', 'fourteen': '14',
+    'fifteen': '15', 'sixteen': '16', 'seventeen': '17', 'eighteen': '18', 'nineteen': '19',
+}
+TENS_WORDS = {
+    'twenty': '20', 'thirty': '30', 'forty': '40', 'fifty': '50',
+    'sixty': '60', 'seventy': '70', 'eighty': '80', 'ninety': '90',
+}
+SLOT_PATTERN = re.compile(r'^\{(\w+)(?::(\w+))?\}$')
+SLOT_KINDS = ('text', 'number', 'word')
+RESULT_STATUSES = ('ok', 'error', 'timeout', 'cancelled', 'rejected')
+
+def tokenize(text):
+    """Lowercases, drops punctuation (and apostrophes: "what's" -> "whats") and merges spoken numbers."""
+    words = re.sub(r"[^\w\s{}:]", '', text.lower().replace("'", '')).split()
+    tokens = []
+    tens = False
+    for word in words:
+        if word in TENS_WORDS:
+            tokens.append(TENS_WORDS[word])
+            tens = True
+            continue
+        digit = NUMBER_WORDS.get(word, word)
+        if tens and len(digit) == 1 and digit != '0' and word in NUMBER_WORDS:
+            # "Thirty Five": Add the Unit to the Tens
+            tokens[-1] = tokens[-1][0] + digit
+        elif digit.isdigit() and tokens and tokens[-1].isdigit():
+            # Digits Read One by One: Concatenate
+            tokens[-1] += digit
+        else:
+            tokens.append(digit)
+        tens = False
+    return tokens
+
+class Command:
+    """
+    A named command, the phrases that trigger it and its handler.
+
+    Args:
+        name (str): Unique name.
+        phrases (list): Patterns like "search for {query}"; slots are {name} or {name:kind}
+            with kind 'text' (one or more words, the default), 'word' (exactly one) or 'number'.
+        handler (callable): Called with each slot as a keyword argument; may be async.
+        timeout (float): Seconds before the handler is cancelled, or None for the dispatcher's default.
+        exclusive (bool): If True, only one run of this command at a time; later ones wait.
+        description (str): Shown in help listings.
+    """
+    def __init__(self, name, phrases, handler, timeout=None, exclusive=False, description=''):
+        self.name = name
+        self.phrases = list(phrases)
+        self.handler = handler
+        self.timeout = timeout
+        self.exclusive = exclusive
+        self.description = description
+
+class Match:
+    """A transcript resolved to a command, with its slot values and how closely its words matched (0-1)."""
+    __slots__ = ('command', 'slots', 'score', 'text', 'phrase')
+
+    def __init__(self, command, slots, score, text, phrase):
+        self.command = command
+        self.slots = slots
+        self.score = score
+        self.text = text
+        self.phrase = phrase
+
+    def __repr__(self):
+        return f"Match({self.command.name!r}, {self.slots}, score={self.score:.2f})"
+
+@functools.lru_cache(maxsize=4096)
+def deletions(word):
+    """The word with up to one (short words) or two letters deleted."""
+    variants = frontier = {word}
+    for _ in range(1 if len(word) <= 4 else 2):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        variants = variants | frontier
+    return variants
+
+class TrieNode:
+    __slots__ = ('children', 'slots', 'commands', 'near')
+
+    def __init__(self):
+        self.children = {}
+        self.slots = []
+        self.commands = []
+        self.near = None
+
+    def child(self, token):
+        node = self.children.get(token)
+        if node is None:
+            node = self.children[token] = TrieNode()
+            self.near = None
+        return node
+
+    def close_children(self, token, cutoff):
+        """(similarity, word) of the children within two edits of token and at least cutoff similar, best first."""
+        if self.near is None:
+            self.near = {}
+            for word in self.children:
+                for variant in deletions(word):
+                    self.near.setdefault(variant, set()).add(word)
+        candidates = set()
+        for variant in deletions(token):
+            candidates.update(self.near.get(variant, ()))
+        scored = [(difflib.SequenceMatcher(None, token, word).ratio(), word) for word in candidates]
+        return sorted([pair for pair in scored if pair[0] >= cutoff], reverse=True)[:2]
+
+class CommandRegistry:
+    """
+    Index of command phrases.
+
+    Args:
+        fuzzy_cutoff (float): Lowest difflib similarity for a misheard word to still match (0-1).
+        max_skip (int): Leading words a match may skip (e.g. "hey agent, search ...").
+    """
+    def __init__(self, fuzzy_cutoff=0.75, max_skip=3):
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.max_skip = max_skip
+        self.commands = {}
+        self.root = TrieNode()
+
+    def register(self, command):
+        """Adds (or replaces) a command and indexes its phrases."""
+        if command.name in self.commands:
+            self.unregister(command.name)
+        self.commands[command.name] = command
+        for phrase in command.phrases:
+            self.index(command, phrase)
+        return command
+
+    def add(self, name, phrases, handler, **options):
+        """Shorthand for register(Command(name, phrases, handler, **options))."""
+        return self.register(Command(name, phrases, handler, **options))
+
+    def command(self, name, *phrases, **options):
+        """Decorator registering the decorated function as a command's handler."""
+        def decorator(handler):
+            self.add(name, phrases, handler, **options)
+            return handler
+        return decorator
+
+    def unregister(self, name):
+        """Removes a command; the trie is rebuilt from the remaining commands."""
+        self.commands.pop(name, None)
+        self.root = TrieNode()
+        for command in self.commands.values():
+            for phrase in command.phrases:
+                self.index(command, phrase)
+
+    def index(self, command, phrase):
+        node = self.root
+        for word in phrase.split():
+            slot = SLOT_PATTERN.match(word)
+            if slot is None:
+                for token in tokenize(word):
+                    node = node.child(token)
+                continue
+            name, kind = slot.group(1), slot.group(2) or 'text'
+            if kind not in SLOT_KINDS:
+                raise ValueError(f"Unknown slot kind '{kind}' in '{phrase}'. Must be one of: {', '.join(SLOT_KINDS)}.")
+            for existing_name, existing_kind, child in node.slots:
+                if (existing_name, existing_kind) == (name, kind):
+                    node = child
+                    break
+            else:
+                child = TrieNode()
+                node.slots.append((name, kind, child))
+                node = child
+        node.commands.append((command, phrase))
+
+    def match(self, text):
+        """
+        Resolves a transcript to its best matching command.
+
+        Exact words are tried first; misheard words only if nothing matched exactly.
+
+        Returns:
+            Match: The best match, or None.
+        """
+        tokens = tokenize(text)
+        for fuzzy in (False, True):
+            best = None
+            for start in range(min(self.max_skip, max(0, len(tokens) - 1)) + 1):
+                for command, phrase, slots, score, literals in self.walk(self.root, tokens, start, {}, 0.0, 0, fuzzy):
+                    # Closest Words First, Then the Most Specific Phrase, Then the Fewest Skipped Words
+                    key = (score / max(1, literals), literals, -start)
+                    if best is None or key > best[0]:
+                        best = (key, Match(command, slots, key[0], text, phrase))
+            if best is not None:
+                return best[1]
+        return None
+
+    def walk(self, node, tokens, i, slots, score, literals, fuzzy):
+        """Yields (command, phrase, slots, summed similarity, literal count) for every way tokens[i:] ends in a command."""
+        if i == len(tokens):
+            for command, phrase in node.commands:
+                yield command, phrase, slots, score, literals
+            return
+        token = tokens[i]
+
+        # Literal Words: Exact, or (Second Pass) the Closest Children
+        child = node.children.get(token)
+        if child is not None:
+            yield from self.walk(child, tokens, i + 1, slots, score + 1.0, literals + 1, fuzzy)
+        elif fuzzy and node.children:
+            for similarity, word in node.close_children(token, self.fuzzy_cutoff):
+                yield from self.walk(node.children[word], tokens, i + 1, slots, score + similarity, literals + 1, fuzzy)
+
+        # Slots: One Word, a Number, or Any Run of Words Up to Where the Rest of the Phrase Matches
+        for name, kind, child in node.slots:
+            if kind == 'number':
+                ends = [i + 1] if token.isdigit() else []
+            elif kind == 'word':
+                ends = [i + 1]
+            else:
+                ends = range(i + 1, len(tokens) + 1)
+            for end in ends:
+                # Skip Splits Where Nothing Could Follow (Most of Them, for Long Free-Text Slots)
+                if end < len(tokens) and not (child.slots or fuzzy and child.children or tokens[end] in child.children):
+                    continue
+                if end == len(tokens) and not child.commands:
+                    continue
+                captured = dict(slots)
+                captured[name] = ' '.join(tokens[i:end])
+                yield from self.walk(child, tokens, end, captured, score, literals, fuzzy)
+
+    def help(self):
+        """One line per command: its name, first phrase and description."""
+        return [f"{command.name}: \"{command.phrases[0]}\" {command.description}".rstrip()
+                for command in self.commands.values()]
+
+class CommandResult:
+    """
+    How one command run ended.
+
+    Attributes:
+        task_id (int): Dispatcher task id.
+        name (str): Command name.
+        slots (dict): Slot values it ran with.
+        status (str): 'ok', 'error', 'timeout', 'cancelled' or 'rejected'.
+        value: The handler's return value (status 'ok').
+        error (BaseException): What went wrong (status 'error').
+        elapsed (float): Seconds from dispatch to the end, including waiting for a free slot.
+    """
+    __slots__ = ('task_id', 'name', 'slots', 'status', 'value', 'error', 'elapsed')
+
+    def __init__(self, task_id, name, slots, status, value=None, error=None, elapsed=0.0):
+        self.task_id = task_id
+        self.name = name
+        self.slots = slots
+        self.status = status
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return f"CommandResult({self.name!r}, {self.status}, {self.elapsed * 1000:.0f} ms)"
+
+class CommandDispatcher:
+    """
+    Runs matched commands on an asyncio loop in a background thread.
+
+    Args:
+        registry (CommandRegistry): Commands to match against.
+        max_concurrency (int): Handlers running at once; more wait their turn.
+        max_pending (int): Runs waiting or running at most; beyond it dispatches are rejected.
+        default_timeout (float): Seconds a handler may take when its command sets no timeout.
+        min_score (float): Lowest match score (word similarity, 0-1) that is acted on.
+    """
+    def __init__(self, registry, max_concurrency=4, max_pending=16, default_timeout=30.0, min_score=0.8):
+        self.registry = registry
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.default_timeout = default_timeout
+        self.min_score = min_score
+        self.listeners = []
+
+        # Loop Thread State (the Loop Owns the Semaphore and Locks)
+        self.loop = None
+        self.thread = None
+        self.semaphore = None
+        self.exclusive_locks = {}
+        self.lock = threading.Lock()
+
+        # Runs Not Finished Yet (Task Id -> (Name, asyncio.Task or None While Queued))
+        self.task_ids = itertools.count(1)
+        self.tasks = {}
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.loop = asyncio.new_event_loop()
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.loop.call_soon(started.set)
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run, name="CommandDispatcher", daemon=True)
+        self.thread.start()
+        started.wait()
+
+    def stop(self, timeout=5.0):
+        """Cancels every run, then stops the loop."""
+        if self.thread is None:
+            return
+        self.cancel_all()
+
+        async def drain():
+            pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            await asyncio.wait(pending, timeout=timeout) if pending else None
+
+        asyncio.run_coroutine_threadsafe(drain(), self.loop).result(timeout + 1.0)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.thread = None
+        self.loop = None
+
+    def add_listener(self, listener):
+        """Calls listener(CommandResult) when a run ends, on the dispatcher's loop thread."""
+        self.listeners.append(listener)
+
+    def attach(self, speech_to_text):
+        """Dispatches every transcript SpeechToText produces."""
+        speech_to_text.add_listener(lambda transcript: self.dispatch(transcript.text))
+
+    def dispatch(self, text):
+        """
+        Matches a transcript and runs its command. Safe to call from any thread; never blocks.
+
+        Returns:
+            Future: Resolves to a CommandResult, or None if nothing matched well enough.
+        """
+        match = self.registry.match(text)
+        if match is None or match.score < self.min_score:
+            return None
+        return self.submit(match)
+
+    def submit(self, match):
+        """Runs an already matched command. Returns a Future of its CommandResult."""
+        self.start()
+        task_id = next(self.task_ids)
+        with self.lock:
+            if len(self.tasks) >= self.max_pending:
+                future = Future()
+                future.set_result(CommandResult(task_id, match.command.name, match.slots, 'rejected'))
+                return future
+            self.tasks[task_id] = (match.command.name, None)
+        return asyncio.run_coroutine_threadsafe(self.execute(task_id, match, time.perf_counter()), self.loop)
+
+    async def execute(self, task_id, match, queued):
+        command = match.command
+        task = asyncio.current_task()
+        with self.lock:
+            self.tasks[task_id] = (command.name, task)
+        timeout = command.timeout if command.timeout is not None else self.default_timeout
+        try:
+            async with self.semaphore:
+                exclusive = self.exclusive_locks.setdefault(command.name, asyncio.Lock()) if command.exclusive else None
+                if exclusive is not None:
+                    await exclusive.acquire()
+                try:
+                    value = await asyncio.wait_for(self.call(command.handler, match.slots), timeout)
+                    result = CommandResult(task_id, command.name, match.slots, 'ok', value)
+                finally:
+                    if exclusive is not None:
+                        exclusive.release()
+        except asyncio.TimeoutError:
+            result = CommandResult(task_id, command.name, match.slots, 'timeout')
+        except asyncio.CancelledError:
+            result = CommandResult(task_id, command.name, match.slots, 'cancelled')
+        except Exception as e:
+            result = CommandResult(task_id, command.name, match.slots, 'error', error=e)
+            print(f"\033[91mCommand '{command.name}' failed: {e}\033[0m")
+        finally:
+            with self.lock:
+                self.tasks.pop(task_id, None)
+        result.elapsed = time.perf_counter() - queued
+        for listener in list(self.listeners):
+            try:
+                listener(result)
+            except Exception as e:
+                print(f"\033[91mCommand listener failed: {e}\033[0m")
+        return result
+
+    async def call(self, handler, slots):
+        """Awaits an async handler, or runs a plain one in the loop's thread pool."""
+        if inspect.iscoroutinefunction(handler):
+            return await handler(**slots)
+        result = await self.loop.run_in_executor(None, functools.partial(handler, **slots))
+        if inspect.isawaitable(result):
+            return await result
+        return result
+
+    def running(self):
+        """(task id, command name) of every run not finished yet."""
+        with self.lock:
+            return [(task_id, name) for task_id, (name, _) in self.tasks.items()]
+
+    def cancel(self, task_id):
+        """
+        Cancels one run. Async handlers stop at their next await; plain handlers
+        keep running in their thread but their result is discarded.
+
+        Returns:
+            bool: True if the run was found.
+        """
+        with self.lock:
+            entry = self.tasks.get(task_id)
+        if entry is None or entry[1] is None or self.loop is None:
+            return False
+        self.loop.call_soon_threadsafe(entry[1].cancel)
+        return True
+
+    def cancel_all(self, name=None):
+        """Cancels every run, or every run of one command."""
+        for task_id, command_name in self.running():
+            if name is None or command_name == name:
+                self.cancel(task_id)
@@ -0,0 +1,388 @@
+"""
+Local control API for the headless routing daemon.
+
+The protocol is one JSON object per line in each direction. A request is
+{"command": name, "args": {...}}. A reply is {"ok": true, "result": ...} or
+{"ok": false, "error": message}. The daemon listens on a Unix socket (in the
+json directory by default) that only its owner may connect to. Where the
+platform has no Unix sockets (Windows), it listens on a TCP port bound to
+localhost instead. Any local process can reach that port, so each TCP request
+also carries a "token": a random secret the daemon writes at startup to a
+file only its owner can read (json/daemon.token by default).
+
+ControlClient speaks the protocol. RemoteRouting and RemoteValues give the
+Qt widgets the parts of AudioRouting and AudioValues they use, backed by the
+daemon, so the GUI can run as a thin client over a daemon that owns the audio.
+"""
+import hmac
+import json
+import os
+import secrets
+import shutil
+import socket
+import socketserver
+import threading
+from concurrent.futures import Future
+
+DEFAULT_PORT = 47821
+
+def default_address(json_dir):
+    """The Unix socket in json_dir, or localhost:DEFAULT_PORT where Unix sockets are unavailable."""
+    if hasattr(socket, 'AF_UNIX'):
+        return os.path.join(json_dir, 'daemon.sock')
+    return ('127.0.0.1', DEFAULT_PORT)
+
+def default_token_path(json_dir):
+    """The file holding the secret that TCP requests must carry."""
+    return os.path.join(json_dir, 'daemon.token')
+
+def write_token(path):
+    """Writes a fresh random token to path, readable and writable only by its owner; returns the token."""
+    token = secrets.token_hex(32)
+    descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, 'w') as file:
+        file.write(token)
+    # A File Left by an Older Daemon Keeps Its Mode Through O_CREAT, so Tighten It Too
+    os.chmod(path, 0o600)
+    return token
+
+def read_token(path):
+    with open(path) as file:
+        return file.read().strip()
+
+def parse_address(text):
+    """'host:port' or a bare port gives a TCP address; anything else is a Unix socket path."""
+    host, _, port = text.rpartition(':')
+    if port.isdigit() and os.sep not in text:
+        return (host or '127.0.0.1', int(port))
+    return text
+
+class ControlError(RuntimeError):
+    """The daemon refused or failed a command."""
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                token = self.server.token
+                if token is not None and not hmac.compare_digest(str(request.get('token', '')), token):
+                    raise PermissionError("Missing or wrong token.")
+                reply = {'ok': True, 'result': self.server.dispatch(request['command'], request.get('args') or {})}
+            except Exception as e:
+                reply = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+class ControlServer:
+    """
+    Serves commands from local clients, each connection on its own thread.
+    Commands run one at a time, so handlers need no locking of their own.
+
+    Args:
+        address (str or tuple): Unix socket path, or (host, port).
+        handlers (dict): Command name -> callable taking the request's args as keywords.
+        token_path (str): Where a TCP server writes the token its requests must carry.
+    """
+    def __init__(self, address, handlers, token_path=None):
+        self.address = address
+        self.handlers = handlers
+        self.token_path = token_path
+        self.lock = threading.Lock()
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        if isinstance(self.address, tuple):
+            if self.token_path is None:
+                raise ValueError("A TCP control server needs a token file.")
+            self.server = socketserver.ThreadingTCPServer(self.address, ControlHandler, bind_and_activate=False)
+            self.server.allow_reuse_address = True
+            self.server.server_bind()
+            self.server.server_activate()
+            self.server.token = write_token(self.token_path)
+        else:
+            self.claim_socket_path()
+            # Created Owner-Only, so No Other User Can Connect Before the chmod
+            umask = os.umask(0o077)
+            try:
+                self.server = socketserver.ThreadingUnixStreamServer(self.address, ControlHandler)
+            finally:
+                os.umask(umask)
+            os.chmod(self.address, 0o600)
+            self.server.token = None
+        self.server.daemon_threads = True
+        self.server.dispatch = self.dispatch
+        self.thread = threading.Thread(target=self.server.serve_forever, name="ControlServer", daemon=True)
+        self.thread.start()
+        print(f"\033[94mControl API listening on {self.address}\033[0m")
+
+    def claim_socket_path(self):
+        """Removes a socket file left by a daemon that exited, refusing if one still answers."""
+        if not os.path.exists(self.address):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.address)
+        except OSError:
+            os.unlink(self.address)
+            return
+        finally:
+            probe.close()
+        raise RuntimeError(f"Another daemon is already listening on {self.address}.")
+
+    def stop(self):
+        if self.server is None:
+            return
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.server = None
+        self.thread = None
+        if not isinstance(self.address, tuple) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+    def dispatch(self, command, args):
+        handler = self.handlers.get(command)
+        if handler is None:
+            raise KeyError(f"Unknown command '{command}' (known: {', '.join(sorted(self.handlers))})")
+        with self.lock:
+            return handler(**args)
+
+class ControlClient:
+    """
+    Client for the daemon's control API, keeping one connection open.
+
+    Args:
+        address (str or tuple): Unix socket path, or (host, port).
+        timeout (float): Seconds to wait for a reply.
+        token_path (str): The daemon's token file, read on each TCP connect (a restarted daemon writes a new one).
+    """
+    def __init__(self, address, timeout=5.0, token_path=None):
+        self.address = address
+        self.timeout = timeout
+        self.token_path = token_path
+        self.token = None
+        self.lock = threading.Lock()
+        self.socket = None
+        self.file = None
+
+    def connect(self):
+        if isinstance(self.address, tuple):
+            if self.token_path is None:
+                raise ConnectionError("A TCP connection to the daemon needs its token file.")
+            self.token = read_token(self.token_path)
+            self.socket = socket.create_connection(self.address, self.timeout)
+        else:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.settimeout(self.timeout)
+            self.socket.connect(self.address)
+        self.file = self.socket.makefile('rwb')
+
+    def close(self):
+        if self.socket is not None:
+            self.file.close()
+            self.socket.close()
+        self.socket = None
+        self.file = None
+
+    def request(self, command, **args):
+        """
+        Runs a command on the daemon, reconnecting once if the connection was lost.
+
+        Returns:
+            The command's result.
+
+        Raises:
+            ControlError: If the daemon reports a failure.
+            OSError: If the daemon cannot be reached.
+        """
+        with self.lock:
+            for attempt in range(2):
+                try:
+                    if self.socket is None:
+                        self.connect()
+                    request = {'command': command, 'args': args}
+                    if self.token is not None:
+                        request['token'] = self.token
+                    self.file.write(json.dumps(request).encode('utf-8') + b'\n')
+                    self.file.flush()
+                    reply = self.file.readline()
+                    if not reply:
+                        raise ConnectionError("The daemon closed the connection.")
+                    break
+                except OSError:
+                    self.close()
+                    if attempt:
+                        raise
+        reply = json.loads(reply)
+        if not reply['ok']:
+            raise ControlError(reply['error'])
+        return reply['result']
+
+class RemoteValues:
+    """AudioValues whose setters go to the daemon; the getters return the last values set."""
+    def __init__(self, client, status):
+        self.client = client
+        self.volume = status['volume']
+        self.noise_threshold = status['noise_threshold']
+        self.spectrum_enabled = status['spectrum']
+
+    def set_spectrum(self, enabled):
+        self.spectrum_enabled = bool(enabled)
+        self.client.request('set', spectrum=self.spectrum_enabled)
+
+    def get_spectrum(self):
+        return self.spectrum_enabled
+
+    def set_noise_threshold(self, noise_threshold):
+        self.noise_threshold = noise_threshold
+        self.client.request('set', noise_threshold=noise_threshold)
+
+    def get_noise_threshold(self):
+        return self.noise_threshold
+
+    def set_volume(self, volume):
+        self.volume = volume
+        self.client.request('set', volume=volume)
+
+    def get_volume(self):
+        return self.volume
+
+class RemoteClips:
+    """
+    The soundboard's view of the daemon's ClipEngine.
+
+    The daemon only reads clips from its sounds directory, so a clip from
+    elsewhere is copied into sounds_dir (the same directory when the GUI and
+    the daemon share a working directory) before it is added.
+    """
+    def __init__(self, client, sounds_dir=None):
+        self.client = client
+        self.sounds_dir = sounds_dir
+        self.sources = {name: None for name in client.request('clips')}
+
+    def add(self, name, path, gain=1.0):
+        path = os.path.abspath(path)
+        if self.sounds_dir is not None and os.path.dirname(path) != os.path.abspath(self.sounds_dir):
+            destination = os.path.join(self.sounds_dir, os.path.basename(path))
+            if os.path.exists(destination):
+                raise FileExistsError(f"{destination} already exists; rename the clip to add it.")
+            os.makedirs(self.sounds_dir, exist_ok=True)
+            shutil.copy2(path, destination)
+            path = destination
+        self.client.request('add_clip', name=name, path=path, gain=gain)
+        self.sources[name] = path
+
+    def names(self):
+        return list(self.sources)
+
+    def drop_failed(self):
+        # The Daemon Drops Clips That Fail to Decode Itself; Refresh the List From It
+        names = self.client.request('clips')
+        dropped = [name for name in self.sources if name not in names]
+        self.sources = {name: self.sources.get(name) for name in names}
+        return dropped
+
+    def trigger(self, name, gain=None):
+        return self.client.request('play', name=name, gain=gain)
+
+    def stop(self, name=None):
+        self.client.request('stop_clips', name=name)
+
+class RemoteRouting:
+    """
+    The parts of AudioRouting the Qt widgets use, run by the daemon.
+
+    Device indices from the GUI's own enumeration are sent as stable
+    (host API, name) keys, since the daemon's indices may differ. The spectrum
+    display needs the analyzer's arrays, so it stays empty in this mode.
+    The daemon writes replays and metrics only inside its recordings directory,
+    taking relative paths from there.
+
+    Args:
+        client (ControlClient): Connection to the daemon.
+        registry (DeviceRegistry): The GUI's device registry, to turn indices into keys.
+        sounds_dir (str): Where clips added from elsewhere are copied for the daemon (see RemoteClips).
+    """
+    def __init__(self, client, registry, sounds_dir=None):
+        self.client = client
+        self.registry = registry
+        status = client.request('status')
+        self.audio_values = RemoteValues(client, status)
+        self.clip_engine = RemoteClips(client, sounds_dir)
+        self.latency_mode = status['latency_mode']
+        self.adaptive_latency = status['adaptive_latency']
+        self.sink_gains = {'mic': 1.0, 'speaker': status['monitor']}
+        self.spectrum_analyzer = None
+        self.spectrum_enabled = False
+        self.metrics_path = None
+
+    def key(self, device):
+        """A device index (from this process's enumeration) as a [host API, name] key; keys pass through."""
+        if not isinstance(device, int):
+            return list(device)
+        info = self.registry.get(device)
+        return list(self.registry.key(info)) if info is not None else device
+
+    def start_route(self, speaker, mic_input, mic_output, frames=None):
+        self.client.request('start', speaker=self.key(speaker), mic_input=self.key(mic_input),
+                            mic_output=self.key(mic_output), frames=frames)
+
+    def stop_route(self):
+        self.client.request('stop')
+
+    def set_sink_gain(self, name, gain):
+        self.sink_gains[name] = gain
+        self.client.request('set_sink_gain', name=name, gain=gain)
+
+    def set_latency_mode(self, mode):
+        self.latency_mode = mode
+        self.client.request('set', latency_mode=mode)
+
+    def set_adaptive_latency(self, enabled):
+        self.adaptive_latency = enabled
+        self.client.request('set', adaptive_latency=enabled)
+
+    def start_spectrum_analyzer(self):
+        self.spectrum_enabled = True
+
+    def stop_spectrum_analyzer(self):
+        self.spectrum_enabled = False
+
+    def save_replay(self, path, seconds=None):
+        """
+        Has the daemon write its replay buffer to path, from a background thread.
+
+        Returns:
+            Future: Resolves to the seconds written, or None if replay is off or empty.
+        """
+        future = Future()
+
+        def export():
+            try:
+                future.set_result(self.client.request('replay', path=path, seconds=seconds))
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=export, name="ReplayExport", daemon=True).start()
+        return future
+
+    def health_snapshot(self):
+        try:
+            return self.client.request('health')
+        except OSError:
+            # The Daemon Went Away; Show the Route as Stopped Until It Is Back
+            return {'running': False, 'callbacks': 0}
+
+    def start_metrics_log(self, path, interval=5.0):
+        self.client.request('metrics', path=path, interval=interval)
+        self.metrics_path = path
+
+    def stop_metrics_log(self):
+        # Only Stop a Log This Client Started, Not One the Daemon Was Launched With
+        if self.metrics_path is not None:
+            self.client.request('metrics', path=None)
+            self.metrics_path = None
@@ -0,0 +1,320 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+DIRECTIONS = ('input', 'output')
+
+# Run in a Fresh Interpreter by enumerate_devices(); Prints the Enumeration as JSON
+ENUMERATE_SCRIPT = """
+import json
+import pyaudio
+p = pyaudio.PyAudio()
+try:
+    data = {
+        'host_apis': [p.get_host_api_info_by_index(i) for i in range(p.get_host_api_count())],
+        'default_host_api': p.get_default_host_api_info(),
+        'devices': [p.get_device_info_by_index(i) for i in range(p.get_device_count())],
+    }
+finally:
+    p.terminate()
+print(json.dumps(data))
+"""
+
+class DeviceRegistry:
+    """
+    Indexed snapshot of the PortAudio devices, built once per enumeration.
+
+    Lookups by index, by (host API, name) and by direction are dictionary
+    reads. Names are not unique (the same endpoint shows up once per host
+    API), so name-only lookups prefer the default host API.
+
+    Args:
+        p (pyaudio.PyAudio): The PyAudio instance to enumerate.
+    """
+    def __init__(self, p):
+        # Host APIs, by Index
+        self.host_apis = {}
+        for i in range(p.get_host_api_count()):
+            info = p.get_host_api_info_by_index(i)
+            self.host_apis[info.get('index', i)] = info
+        default_host_api = p.get_default_host_api_info()
+        self.default_host_api = default_host_api.get('index')
+
+        # Default Devices of the Default Host API
+        self.defaults = {
+            'input': default_host_api['defaultInputDevice'],
+            'output': default_host_api['defaultOutputDevice'],
+        }
+
+        # Devices and Their Indexes
+        self.devices = []
+        self.by_index = {}
+        self.by_key = {}
+        self.by_name = {}
+        self.by_direction = {direction: {} for direction in DIRECTIONS}
+        for i in range(p.get_device_count()):
+            info = p.get_device_info_by_index(i)
+            key = self.key(info)
+            self.devices.append(info)
+            self.by_index[info['index']] = info
+            self.by_key[key] = info
+            self.by_name.setdefault(info['name'], []).append(info)
+            for direction in DIRECTIONS:
+                if self.channels(info, direction) > 0:
+                    self.by_direction[direction][key] = info
+
+    def __len__(self):
+        return len(self.devices)
+
+    def host_api_name(self, info):
+        host_api = self.host_apis.get(info['hostApi'])
+        return host_api['name'] if host_api else str(info['hostApi'])
+
+    def key(self, info):
+        """Stable (host API name, device name) key, unlike indices which change between enumerations."""
+        return (self.host_api_name(info), info['name'])
+
+    @staticmethod
+    def channels(info, direction):
+        return int(info['maxInputChannels'] if direction == 'input' else info['maxOutputChannels'])
+
+    def get(self, index):
+        return self.by_index.get(index)
+
+    def default(self, direction):
+        """Default device info for 'input' or 'output', or None if there is none."""
+        return self.by_index.get(self.defaults[direction])
+
+    def find(self, name, direction=None, host_api=None):
+        """
+        Finds a device by name.
+
+        Args:
+            name (str): Device name as reported by PortAudio.
+            direction (str): Only consider devices supporting 'input' or 'output'.
+            host_api (str): Host API name; if omitted the default host API is preferred.
+
+        Returns:
+            dict: Device info, or None if not found.
+        """
+        if host_api is not None:
+            info = self.by_key.get((host_api, name))
+            if info is None or (direction and self.channels(info, direction) == 0):
+                return None
+            return info
+
+        candidates = self.by_name.get(name, ())
+        if direction:
+            candidates = [info for info in candidates if self.channels(info, direction) > 0]
+        for info in candidates:
+            if info['hostApi'] == self.default_host_api:
+                return info
+        return candidates[0] if candidates else None
+
+    def resolve(self, device, direction=None):
+        """
+        Resolves an index, a name or a (host API, name) key to device info.
+
+        Returns:
+            dict: Device info, or None if not found.
+        """
+        if isinstance(device, int):
+            info = self.get(device)
+            if info is not None and direction and self.channels(info, direction) == 0:
+                return None
+            return info
+        if isinstance(device, (tuple, list)):
+            return self.find(device[1], direction, host_api=device[0])
+        return self.find(device, direction)
+
+def listed_devices(registry, direction):
+    """
+    The devices offered for a direction: the default device, then every
+    "CABLE Input" device supporting the direction (preferring the default
+    host API when a name exists under several).
+
+    Returns:
+        list: Device infos, in display order.
+    """
+    listed = {}
+    default = registry.default(direction)
+    if default is not None:
+        listed[default['name']] = default
+    for name in registry.by_name:
+        if "CABLE Input" in name and name not in listed:
+            info = registry.find(name, direction)
+            if info is not None:
+                listed[name] = info
+    return list(listed.values())
+
+class DeviceList:
+    """An enumeration captured as plain data, answering the PyAudio calls DeviceRegistry makes."""
+    def __init__(self, data):
+        self.data = data
+
+    def get_host_api_count(self):
+        return len(self.data['host_apis'])
+
+    def get_host_api_info_by_index(self, index):
+        return self.data['host_apis'][index]
+
+    def get_default_host_api_info(self):
+        return self.data['default_host_api']
+
+    def get_device_count(self):
+        return len(self.data['devices'])
+
+    def get_device_info_by_index(self, index):
+        return self.data['devices'][index]
+
+def enumerate_devices(timeout=10.0):
+    """
+    Enumerates the devices as a fresh PortAudio sees them. PortAudio only
+    notices hot-plugged devices when it is initialized again, which would
+    invalidate every stream of this process's instance, so the enumeration
+    runs in a short-lived child interpreter instead.
+
+    Returns:
+        DeviceRegistry: The current devices.
+    """
+    result = subprocess.run([sys.executable, '-c', ENUMERATE_SCRIPT], stdin=subprocess.DEVNULL,
+                            capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"exit code {result.returncode}")
+    return DeviceRegistry(DeviceList(json.loads(result.stdout)))
+
+def device_nodes(directory='/dev/snd'):
+    """
+    A cheap fingerprint of the sound hardware the OS exposes: the ALSA device
+    nodes, which appear and vanish with hot-plugged cards. None where there is
+    no such directory (Windows, macOS), so only the full scan interval applies.
+    """
+    try:
+        return tuple(sorted(os.listdir(directory)))
+    except OSError:
+        return None
+
+def diff_devices(old, new):
+    """
+    Compares two enumerations by stable key.
+
+    Returns:
+        tuple: (added, removed, changed) lists of device infos (removed from old,
+        the others from new); changed devices kept their key but not their
+        channel counts or default rate.
+    """
+    added = [info for key, info in new.by_key.items() if key not in old.by_key]
+    removed = [info for key, info in old.by_key.items() if key not in new.by_key]
+    changed = []
+    for key, info in new.by_key.items():
+        previous = old.by_key.get(key)
+        if previous is not None and any(previous[field] != info[field] for field in
+                                        ('maxInputChannels', 'maxOutputChannels', 'defaultSampleRate')):
+            changed.append(info)
+    return added, removed, changed
+
+class DeviceWatcher:
+    """
+    Re-enumerates the devices on a background thread and reports what changed.
+
+    A scan spawns an interpreter, so it runs only when the OS's device nodes
+    change (see device_nodes(), polled every `poll` seconds), on check_now(),
+    or every `interval` seconds as a fallback for devices without nodes (e.g.
+    sound servers' virtual devices) and platforms without them.
+
+    Listeners are called on the watcher's thread as listener(added, removed,
+    changed), with lists of device infos (see diff_devices()), and only when
+    something changed; hand the work to the thread that owns the route. registry
+    always holds the latest enumeration.
+
+    Args:
+        registry (DeviceRegistry): The enumeration to compare the first scan against.
+        interval (float): Most seconds between scans.
+        poll (float): Seconds between checks of the device nodes.
+        enumerate (callable): Returns a fresh DeviceRegistry (enumerate_devices by default).
+        probe (callable): Returns a fingerprint of the device nodes, or None (device_nodes by default).
+    """
+    def __init__(self, registry, interval=30.0, poll=1.0, enumerate=enumerate_devices, probe=device_nodes):
+        self.registry = registry
+        self.interval = interval
+        self.poll = poll
+        self.enumerate = enumerate
+        self.probe = probe
+        self.nodes = probe()
+        self.listeners = []
+        self.failed = False
+        self.thread = None
+        self.stopping = False
+        self.wake = threading.Event()
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.stopping = False
+        self.thread = threading.Thread(target=self.run, name="DeviceWatcher", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.stopping = True
+        self.wake.set()
+        self.thread.join()
+        self.thread = None
+
+    def check_now(self):
+        """Scans as soon as possible instead of waiting for the interval (e.g. from a Refresh button)."""
+        self.wake.set()
+
+    def run(self):
+        scanned = time.monotonic()
+        while True:
+            woken = self.wake.wait(self.poll)
+            self.wake.clear()
+            if self.stopping:
+                return
+            nodes = self.probe()
+            if woken or nodes != self.nodes or time.monotonic() - scanned >= self.interval:
+                self.nodes = nodes
+                scanned = time.monotonic()
+                self.check()
+
+    def check(self):
+        """
+        Scans once and notifies the listeners of any differences.
+
+        Returns:
+            tuple: (added, removed, changed), or None if the scan failed.
+        """
+        try:
+            registry = self.enumerate()
+        except (RuntimeError, OSError, ValueError, subprocess.TimeoutExpired) as e:
+            # Report a Failing Scan Once, Not Every Interval
+            if not self.failed:
+                print(f"\033[91mDevice scan failed: {e}\033[0m")
+            self.failed = True
+            return None
+        self.failed = False
+        added, removed, changed = diff_devices(self.registry, registry)
+        self.registry = registry
+        if added or removed or changed:
+            for label, infos in (('added', added), ('removed', removed), ('changed', changed)):
+                if infos:
+                    print(f"\033[93mDevices {label}: {', '.join(info['name'] for info in infos)}\033[0m")
+            for listener in list(self.listeners):
+                try:
+                    listener(added, removed, changed)
+                except Exception as e:
+                    print(f"\033[91mDevice change listener failed: {e}\033[0m")
+        return added, removed, changed
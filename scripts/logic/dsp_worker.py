@@ -0,0 +1,371 @@
+"""
+Running the processing chain in a separate process.
+
+The PortAudio callback thread and the Qt GUI thread share one GIL. A busy UI
+(dropdown refreshes, slider signals, repaints) therefore delays the
+callback's Python work, and the more NumPy calls the chain makes, the more
+chances it has to wait. With a DspWorker, the callback only copies its input
+block into a shared-memory ring, rings a doorbell (a semaphore) and copies
+out the block the worker finished `latency_blocks` callbacks ago. The worker
+runs the same effect chain, with its own GIL, in a spawned process.
+
+Latency is fixed: output block n is input block n - latency_blocks. The
+callback never waits for the worker. A block that is not back in time is
+played as silence and counted as late; when it arrives it is skipped as stale,
+so the delay never drifts. Soundboard clips stay in the callback process (the
+decoded clips live there) and are mixed into the worker's output.
+
+The worker does not fix GIL contention. The callback still needs the GIL
+for its copies and doorbell, so a UI thread holding it delays the callback
+just as much; the worker only moves the chain's own work out of the way. On
+scripts.bench.dsp_worker (one core, 256 frames at 48 kHz, a UI thread holding
+the GIL in 20 ms bursts) the tail was worse with the worker than in process:
+p99 9.3-9.7 ms against 6.5-8.1 ms, 99-159 blocks over budget against 81-161,
+plus 7-20 late blocks, since the worker process competes for the same core.
+Only a chain far heavier than the default, on a machine with cores to spare,
+is likely to gain from it.
+"""
+import multiprocessing
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Shared Parameters, Written by the Callback Process, Read by the Worker
+PARAM_VOLUME = 0
+PARAM_NOISE_THRESHOLD = 1
+PARAM_SPECTRUM = 2
+PARAM_WORKER_DROPPED = 3
+PARAM_COUNT = 4
+
+class SharedBlockRing:
+    """
+    Single-producer/single-consumer ring of block slots in shared memory.
+
+    Layout: two int64 counters (write index, read index), then an int64
+    (sequence number, frames) header per slot, then the float32 slots. Each
+    side only advances its own counter, and only after the slot is written
+    or read.
+
+    Args:
+        slots (int): Blocks the ring holds.
+        max_frames (int): Largest block.
+        channels (int): Channels per frame.
+        name (str): Shared memory block to attach to, or None to create one.
+    """
+    def __init__(self, slots, max_frames, channels, name=None):
+        self.slots = slots
+        self.max_frames = max_frames
+        self.channels = channels
+        size = 16 + slots * 16 + slots * max_frames * channels * 4
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.name = self.shm.name
+        buffer = self.shm.buf
+        self.counters = np.ndarray((2,), dtype=np.int64, buffer=buffer, offset=0)
+        self.headers = np.ndarray((slots, 2), dtype=np.int64, buffer=buffer, offset=16)
+        self.data = np.ndarray((slots, max_frames, channels), dtype=np.float32, buffer=buffer, offset=16 + slots * 16)
+        if name is None:
+            self.counters[:] = 0
+
+    def readable(self):
+        return int(self.counters[0] - self.counters[1])
+
+    def writable(self):
+        return self.slots - self.readable()
+
+    def write_slot(self):
+        """Producer: index of the slot to fill next (publish() makes it visible)."""
+        return int(self.counters[0] % self.slots)
+
+    def publish(self):
+        self.counters[0] += 1
+
+    def read_slot(self):
+        """Consumer: index of the oldest unread slot (release() frees it)."""
+        return int(self.counters[1] % self.slots)
+
+    def release(self):
+        self.counters[1] += 1
+
+    def close(self, unlink=False):
+        # Drop Our Views First, or the Mapping Cannot Be Closed
+        self.counters = self.headers = self.data = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+class SharedValues:
+    """AudioValues read from the shared parameter array, for the worker's AudioRouting."""
+    def __init__(self, params):
+        self.params = params
+
+    def get_volume(self):
+        return float(self.params[PARAM_VOLUME])
+
+    def get_noise_threshold(self):
+        return float(self.params[PARAM_NOISE_THRESHOLD])
+
+    def get_spectrum(self):
+        return bool(self.params[PARAM_SPECTRUM])
+
+def _worker_main(config, doorbell, stop_event, ready, connection):
+    """Worker process: runs AudioRouting.process_audio over every block in the inbox."""
+    from scripts.logic.audio import AudioRouting
+
+    inbox = SharedBlockRing(config['slots'], config['max_frames'], config['channels'], config['inbox'])
+    outbox = SharedBlockRing(config['slots'], config['max_frames'], config['channels'], config['outbox'])
+    params_shm = shared_memory.SharedMemory(name=config['params'])
+    params = np.ndarray((PARAM_COUNT,), dtype=np.float64, buffer=params_shm.buf)
+
+    routing = AudioRouting(None, SharedValues(params))
+    routing.stft_size, routing.stft_hop, routing.stft_window = config['stft']
+    routing.configure_stream(config['sample_rate'], config['channels'], config['frames'])
+
+    def apply(state):
+        routing.effects.apply_state(state)
+        # Clips Are Mixed in the Callback Process
+        if 'clips' in routing.effects:
+            routing.effects.set_bypass('clips', True)
+
+    apply(config['effects'])
+
+    # Run the Chain Once Before Reporting Ready, so the First Real Block Is Not Late
+    silence = np.zeros((config['frames'], config['channels']), dtype=np.float32)
+    routing.process_audio(silence, silence.copy(), config['frames'], None, 0)
+    routing.effects.reset()
+    ready.set()
+    try:
+        while not stop_event.is_set():
+            if not doorbell.acquire(timeout=0.1):
+                continue
+            while connection.poll():
+                apply(connection.recv())
+            while inbox.readable():
+                slot = inbox.read_slot()
+                sequence, frames = int(inbox.headers[slot, 0]), int(inbox.headers[slot, 1])
+                if not outbox.writable():
+                    # The Callback Stopped Collecting; Drop Rather Than Wait
+                    params[PARAM_WORKER_DROPPED] += 1
+                    inbox.release()
+                    continue
+                # Blocks Come at the Callback's Size, so Follow It Like pyaudio_callback() Does
+                if frames != routing.buffers.frames:
+                    routing.configure_stream(config['sample_rate'], config['channels'], frames)
+                out = outbox.write_slot()
+                routing.process_audio(inbox.data[slot, :frames], outbox.data[out, :frames], frames, None, 0)
+                outbox.headers[out, 0] = sequence
+                outbox.headers[out, 1] = frames
+                outbox.publish()
+                inbox.release()
+    finally:
+        params = None
+        inbox.close()
+        outbox.close()
+        params_shm.close()
+
+class DspWorker:
+    """
+    Callback-side handle of the worker process.
+
+    Args:
+        audio_values (AudioValues): Volume, threshold and gate switch, copied to the worker every block.
+        effects (EffectChain): Chain whose order, bypass flags and settings the worker follows.
+        sample_rate (int): Stream sample rate.
+        channels (int): Stream channels.
+        frames (int): Block size of the stream.
+        max_frames (int): Largest block the rings hold, so the block size can change without a restart.
+        latency_blocks (int): Blocks between a block going in and coming out.
+        stft (tuple): (size, hop, window) of the worker's spectral gate.
+        slots (int): Blocks each ring holds (must exceed latency_blocks).
+        sync_interval (float): Seconds between checks for effect chain edits.
+    """
+    def __init__(self, audio_values, effects, sample_rate, channels, frames, max_frames=4096, latency_blocks=2,
+                 stft=(1024, 512, 'hann'), slots=8, sync_interval=0.05):
+        if slots <= latency_blocks:
+            raise ValueError("slots must be larger than latency_blocks.")
+        self.audio_values = audio_values
+        self.effects = effects
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames = frames
+        self.max_frames = max(frames, max_frames)
+        self.latency_blocks = latency_blocks
+        self.stft = stft
+        self.slots = slots
+        self.sync_interval = sync_interval
+
+        # Shared Memory and Process State (Created by start())
+        self.inbox = None
+        self.outbox = None
+        self.params_shm = None
+        self.params = None
+        self.process = None
+        self.doorbell = None
+        self.stop_event = None
+        self.connection = None
+        self.sync_thread = None
+        self.synced_version = None
+        self.running = False
+
+        # Callback-Side Counters
+        self.sent = 0
+        self.received = 0
+        self.late = 0
+        self.stale = 0
+        self.dropped = 0
+
+    def fits(self, sample_rate, channels, frames):
+        return self.sample_rate == sample_rate and self.channels == channels and frames <= self.max_frames
+
+    def configure(self, frames):
+        """Follows a new block size (at most max_frames); the latency stays latency_blocks blocks."""
+        self.frames = frames
+
+    @property
+    def latency(self):
+        """Added delay in seconds: latency_blocks blocks at the current block size."""
+        return self.latency_blocks * self.frames / self.sample_rate
+
+    def start(self, timeout=30.0):
+        """
+        Creates the rings and spawns the worker, waiting until its chain is built.
+
+        Returns:
+            bool: True if the worker is ready.
+        """
+        if self.running:
+            return True
+        context = multiprocessing.get_context('spawn')
+        self.inbox = SharedBlockRing(self.slots, self.max_frames, self.channels)
+        self.outbox = SharedBlockRing(self.slots, self.max_frames, self.channels)
+        self.params_shm = shared_memory.SharedMemory(create=True, size=PARAM_COUNT * 8)
+        self.params = np.ndarray((PARAM_COUNT,), dtype=np.float64, buffer=self.params_shm.buf)
+        self.params[:] = 0
+        self.write_params()
+
+        self.doorbell = context.Semaphore(0)
+        self.stop_event = context.Event()
+        ready = context.Event()
+        self.connection, worker_connection = context.Pipe()
+        self.synced_version = self.effects.version
+        config = {
+            'inbox': self.inbox.name, 'outbox': self.outbox.name, 'params': self.params_shm.name,
+            'slots': self.slots, 'max_frames': self.max_frames, 'frames': self.frames, 'channels': self.channels,
+            'sample_rate': self.sample_rate, 'stft': self.stft, 'effects': self.effects.state(),
+        }
+        self.process = context.Process(target=_worker_main, name="DspWorker", daemon=True,
+                                       args=(config, self.doorbell, self.stop_event, ready, worker_connection))
+        self.process.start()
+        deadline = time.perf_counter() + timeout
+        while not ready.wait(0.05):
+            if not self.process.is_alive() or time.perf_counter() > deadline:
+                print(f"\033[91mDSP worker failed to start (exit code {self.process.exitcode}).\033[0m")
+                self.stop()
+                return False
+        self.sent = self.received = self.late = self.stale = self.dropped = 0
+        self.running = True
+        self.sync_thread = threading.Thread(target=self.sync, name="DspWorkerSync", daemon=True)
+        self.sync_thread.start()
+        return True
+
+    def stop(self):
+        self.running = False
+        if self.process is not None:
+            self.stop_event.set()
+            self.doorbell.release()
+            self.process.join(5.0)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process = None
+        if self.sync_thread is not None:
+            self.sync_thread.join()
+            self.sync_thread = None
+        for ring in (self.inbox, self.outbox):
+            if ring is not None:
+                ring.close(unlink=True)
+        self.inbox = self.outbox = None
+        if self.params_shm is not None:
+            self.params = None
+            self.params_shm.close()
+            self.params_shm.unlink()
+            self.params_shm = None
+
+    def sync(self):
+        """Sends the chain's state to the worker whenever it was edited."""
+        while self.running:
+            version = self.effects.version
+            if version != self.synced_version:
+                self.synced_version = version
+                try:
+                    self.connection.send(self.effects.state())
+                    self.doorbell.release()
+                except (OSError, EOFError):
+                    return
+            time.sleep(self.sync_interval)
+
+    def write_params(self):
+        params = self.params
+        values = self.audio_values
+        params[PARAM_VOLUME] = values.get_volume()
+        params[PARAM_NOISE_THRESHOLD] = values.get_noise_threshold()
+        params[PARAM_SPECTRUM] = 1.0 if values.get_spectrum() else 0.0
+
+    def exchange(self, indata, outdata):
+        """
+        Callback side: hands indata to the worker and fills outdata with the
+        block sent latency_blocks callbacks ago (silence if it is late).
+        Never waits.
+        """
+        frames = len(indata)
+        self.write_params()
+
+        # Send This Block
+        inbox = self.inbox
+        if inbox.writable():
+            slot = inbox.write_slot()
+            inbox.data[slot, :frames] = indata
+            inbox.headers[slot, 0] = self.sent
+            inbox.headers[slot, 1] = frames
+            inbox.publish()
+            self.doorbell.release()
+        else:
+            self.dropped += 1
+        expected = self.sent - self.latency_blocks
+        self.sent += 1
+        if expected < 0:
+            outdata.fill(0)
+            return
+
+        # Collect the Block Sent latency_blocks Ago, Skipping Any That Came Back Too Late
+        outbox = self.outbox
+        while outbox.readable():
+            slot = outbox.read_slot()
+            sequence = outbox.headers[slot, 0]
+            if sequence < expected:
+                outbox.release()
+                self.stale += 1
+                continue
+            if sequence == expected:
+                count = min(frames, int(outbox.headers[slot, 1]))
+                outdata[:count] = outbox.data[slot, :count]
+                if count < frames:
+                    outdata[count:].fill(0)
+                outbox.release()
+                self.received += 1
+                return
+            break
+        self.late += 1
+        outdata.fill(0)
+
+    def stats(self):
+        return {
+            'running': self.running,
+            'latency_ms': self.latency * 1000,
+            'latency_blocks': self.latency_blocks,
+            'sent': self.sent,
+            'received': self.received,
+            'late': self.late,
+            'stale': self.stale,
+            'dropped': self.dropped + (int(self.params[PARAM_WORKER_DROPPED]) if self.params is not None else 0),
+        }
@@ -0,0 +1,188 @@
+"""
+Real-time health counters for the audio callback.
+
+The callback only increments plain integers and one histogram bucket per
+call; everything else (formatting, CPU load, files) happens on other threads
+from snapshot().
+"""
+import bisect
+import json
+import threading
+import time
+
+# PortAudio Callback Status Flags (paInputUnderflow etc., Same Values as pyaudio)
+INPUT_UNDERFLOW = 0x1
+INPUT_OVERFLOW = 0x2
+OUTPUT_UNDERFLOW = 0x4
+OUTPUT_OVERFLOW = 0x8
+PRIMING_OUTPUT = 0x10
+
+STATUS_FLAGS = (
+    ('input_underflow', INPUT_UNDERFLOW),
+    ('input_overflow', INPUT_OVERFLOW),
+    ('output_underflow', OUTPUT_UNDERFLOW),
+    ('output_overflow', OUTPUT_OVERFLOW),
+)
+
+# Callback Duration Histogram Bucket Edges, as Fractions of the Buffer Budget
+HISTOGRAM_EDGES = (0.1, 0.25, 0.5, 0.75, 0.9, 1.0, 1.5, 2.0)
+
+class CallbackHealth:
+    """
+    Counts xruns and callback durations for one stream.
+
+    Written only by the audio callback through record(); read from any
+    thread through snapshot().
+
+    Args:
+        budget (float): Real-time budget of one callback in seconds (frames / sample rate).
+    """
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.reset()
+
+    def reset(self):
+        self.callbacks = 0
+        self.over_budget = 0
+        self.input_underflow = 0
+        self.input_overflow = 0
+        self.output_underflow = 0
+        self.output_overflow = 0
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+        self.io_latency = None
+        self.histogram = [0] * (len(HISTOGRAM_EDGES) + 1)
+        self.started = time.time()
+
+    def set_budget(self, frames, sample_rate):
+        self.budget = frames / sample_rate
+
+    def record(self, status, duration, time_info=None):
+        """
+        Records one callback. Called from the audio thread, so it only does
+        integer increments and a bisect over a short tuple.
+
+        Args:
+            status (int): PortAudio status flags passed to the callback.
+            duration (float): Time spent in the callback, in seconds.
+            time_info (dict): PortAudio stream times; ADC to DAC time is kept
+                as the measured input-to-output latency when the driver reports it.
+        """
+        self.callbacks += 1
+        if time_info:
+            adc = time_info.get('input_buffer_adc_time', 0)
+            dac = time_info.get('output_buffer_dac_time', 0)
+            if adc and dac > adc:
+                self.io_latency = dac - adc
+        if status:
+            self.record_status(status)
+
+        self.last_duration = duration
+        if duration > self.max_duration:
+            self.max_duration = duration
+        if self.budget:
+            load = duration / self.budget
+            if load > 1.0:
+                self.over_budget += 1
+            self.histogram[bisect.bisect_left(HISTOGRAM_EDGES, load)] += 1
+
+    def record_status(self, status):
+        """Counts the xrun flags of a callback, e.g. of a second (output-only) stream."""
+        if status & INPUT_UNDERFLOW:
+            self.input_underflow += 1
+        if status & INPUT_OVERFLOW:
+            self.input_overflow += 1
+        if status & OUTPUT_UNDERFLOW:
+            self.output_underflow += 1
+        if status & OUTPUT_OVERFLOW:
+            self.output_overflow += 1
+
+    @property
+    def xruns(self):
+        return self.input_underflow + self.input_overflow + self.output_underflow + self.output_overflow
+
+    def percentile(self, q, histogram=None):
+        """
+        Approximate duration percentile, as the upper edge of the histogram
+        bucket it falls in (a fraction of the budget; inf for the last bucket).
+        """
+        histogram = histogram if histogram is not None else list(self.histogram)
+        total = sum(histogram)
+        if total == 0:
+            return None
+        target = q / 100.0 * total
+        seen = 0
+        for edge, count in zip(HISTOGRAM_EDGES + (float('inf'),), histogram):
+            seen += count
+            if seen >= target:
+                return edge
+        return float('inf')
+
+    def snapshot(self):
+        """
+        Copies the counters into a plain dict, safe to format or serialize.
+
+        Returns:
+            dict: Counters, durations in milliseconds and the duration histogram.
+        """
+        histogram = list(self.histogram)
+        snapshot = {
+            'time': time.time(),
+            'uptime': time.time() - self.started,
+            'callbacks': self.callbacks,
+            'over_budget': self.over_budget,
+            'xruns': self.xruns,
+            'budget_ms': self.budget * 1000 if self.budget else None,
+            'last_ms': self.last_duration * 1000,
+            'max_ms': self.max_duration * 1000,
+            'io_latency_ms': self.io_latency * 1000 if self.io_latency is not None else None,
+            'p99_budget': self.percentile(99, histogram),
+            'histogram': {'edges': list(HISTOGRAM_EDGES), 'counts': histogram},
+        }
+        for name, _ in STATUS_FLAGS:
+            snapshot[name] = getattr(self, name)
+        return snapshot
+
+class MetricsLogger:
+    """
+    Appends a JSON line of health metrics to a file at a fixed interval.
+
+    Args:
+        snapshot (callable): Returns the metrics dict to write.
+        path (str): File to append to.
+        interval (float): Seconds between lines.
+    """
+    def __init__(self, snapshot, path, interval=5.0):
+        self.snapshot = snapshot
+        self.path = path
+        self.interval = interval
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="MetricsLogger", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+
+        # One Last Line, so the Final Counters Are Never Lost
+        self.write()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.write()
+
+    def write(self):
+        try:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(self.snapshot()) + '\n')
+        except OSError as e:
+            print(f"\033[91mCould not write metrics to {self.path}: {e}\033[0m")
@@ -0,0 +1,172 @@
+"""
+Latency modes and automatic tuning of frames_per_buffer.
+
+A mode picks a starting buffer size and the range the tuner may move in.
+The tuner watches the callback health counters off the audio thread: when
+misses (xruns or callbacks over budget) cross a threshold it reopens the
+stream with twice the buffer, and after a quiet, lightly loaded period it
+probes half the buffer again.
+"""
+import threading
+import time
+
+# Target Buffer Durations in Milliseconds, Converted to Power-of-Two Frames per Rate. These Only
+# Size the Stream's Buffer: the Spectral Gate's Window (About 21 ms) Comes on Top When It Is On
+LATENCY_MODES = {
+    'lowest': {'target_ms': 3, 'min_ms': 1.5, 'max_ms': 25},
+    'balanced': {'target_ms': 10, 'min_ms': 3, 'max_ms': 50},
+    'safe': {'target_ms': 40, 'min_ms': 20, 'max_ms': 100},
+}
+DEFAULT_LATENCY_MODE = 'balanced'
+
+def frames_for(milliseconds, sample_rate):
+    """Nearest power-of-two frame count to a duration, at least 32 frames."""
+    frames = max(32.0, milliseconds / 1000.0 * sample_rate)
+    power = 32
+    while power * 2 <= frames:
+        power *= 2
+    return power * 2 if frames - power > power * 2 - frames else power
+
+def mode_frames(mode, sample_rate):
+    """
+    Buffer sizes for a latency mode at a sample rate.
+
+    Returns:
+        tuple: (starting frames, smallest frames, largest frames)
+    """
+    if mode not in LATENCY_MODES:
+        raise ValueError(f"Unknown latency mode '{mode}'. Must be one of: {', '.join(LATENCY_MODES)}.")
+    settings = LATENCY_MODES[mode]
+    return (frames_for(settings['target_ms'], sample_rate),
+            frames_for(settings['min_ms'], sample_rate),
+            frames_for(settings['max_ms'], sample_rate))
+
+class LatencyTuner:
+    """
+    Grows or shrinks the stream's buffer from the callback health counters.
+
+    Args:
+        routing (AudioRouting): Routing whose stream is tuned (through reopen_stream()).
+        interval (float): Seconds between checks.
+        miss_ratio (float): Fraction of missed callbacks in one interval that triggers a larger buffer.
+        min_misses (int): Misses needed in one interval before growing, so a single glitch does not.
+        probe_after (float): Seconds without misses before probing a smaller buffer.
+        probe_load (float): Highest callback load (fraction of budget) and CPU load allowed for a probe.
+    """
+    def __init__(self, routing, interval=1.0, miss_ratio=0.01, min_misses=2, probe_after=20.0, probe_load=0.5):
+        self.routing = routing
+        self.interval = interval
+        self.miss_ratio = miss_ratio
+        self.min_misses = min_misses
+        self.probe_after = probe_after
+        self.probe_load = probe_load
+
+        # Each Buffer Change: Time, Frames, Reason and Latency Report
+        self.changes = []
+
+        self.reset()
+
+        # Thread State
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def reset(self):
+        self.last = None
+        self.quiet_since = time.monotonic()
+        self.backoff = 1.0
+        self.probed_from = None
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.reset()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="LatencyTuner", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.check()
+
+    def check(self):
+        """
+        Compares the health counters with the previous check and resizes the
+        buffer if needed.
+
+        Returns:
+            int: The new frames_per_buffer, or None if nothing changed.
+        """
+        routing = self.routing
+        if not routing.running:
+            return None
+        health = routing.health_snapshot()
+        frames = routing.buffer_size
+        _, min_frames, max_frames = mode_frames(routing.latency_mode, routing.sample_rate)
+
+        # Counters Since the Last Check (or Since the Last Reopen)
+        last = self.last
+        self.last = health
+        if last is None or health['callbacks'] < last['callbacks']:
+            return None
+        callbacks = health['callbacks'] - last['callbacks']
+        if callbacks == 0:
+            return None
+        misses = (health['xruns'] - last['xruns']) + (health['over_budget'] - last['over_budget'])
+        misses += health.get('sink_underruns', 0) - last.get('sink_underruns', 0)
+        counts = [now - before for now, before in zip(health['histogram']['counts'], last['histogram']['counts'])]
+        edges = health['histogram']['edges']
+        heavy = sum(count for edge, count in zip([0.0] + edges, counts) if edge >= self.probe_load)
+
+        now = time.monotonic()
+        if misses >= self.min_misses and misses / callbacks >= self.miss_ratio:
+            self.quiet_since = now
+
+            # A Failed Probe Goes Back and Waits Twice as Long Before the Next One
+            if self.probed_from is not None and frames < self.probed_from:
+                self.backoff = min(self.backoff * 2, 16.0)
+                self.probed_from = None
+            if frames < max_frames:
+                return self.resize(frames * 2, f"{misses} misses in {callbacks} callbacks")
+            return None
+
+        if misses:
+            self.quiet_since = now
+            return None
+
+        # Quiet and Lightly Loaded for Long Enough: Try Half the Buffer
+        cpu_load = health['cpu_load']
+        lightly_loaded = heavy == 0 and (cpu_load is None or cpu_load < self.probe_load)
+        if frames > min_frames and lightly_loaded and now - self.quiet_since >= self.probe_after * self.backoff:
+            self.quiet_since = now
+            self.probed_from = frames
+            return self.resize(frames // 2, f"no misses for {self.probe_after * self.backoff:.0f}s")
+        if self.probed_from is not None and now - self.quiet_since >= self.probe_after:
+            self.probed_from = None  # The Probe Held Up
+        return None
+
+    def resize(self, frames, reason):
+        """Reopens the stream at a new buffer size and logs the change with its latency."""
+        before = self.routing.buffer_size
+        if not self.routing.reopen_stream(frames):
+            return None
+        self.last = None
+
+        # Let a Few Buffers Through so the Latency Is Measured on the New Stream
+        self.stop_event.wait(max(0.1, 4 * frames / self.routing.sample_rate))
+        report = self.routing.latency_report()
+        self.log(before, frames, reason, report)
+        return frames
+
+    def log(self, before, frames, reason, report):
+        self.changes.append({'time': time.time(), 'from': before, 'frames': frames, 'reason': reason, 'latency': report})
+        total = f", ~{report['total_ms']:.1f} ms end to end" if report['total_ms'] is not None else ""
+        if report['total_ms'] is not None and report['gate_ms']:
+            total += f" (including the noise gate's {report['gate_ms']:.1f} ms)"
+        print(f"\033[93mLatency: {before} -> {frames} frames ({reason}){total}\033[0m")
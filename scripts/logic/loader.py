@@ -2,16 +2,25 @@ import os
 
 from scripts.logic.icons import IconLoader
 from scripts.logic.audio import AudioDevices, AudioRouting
+from scripts.logic.clip_cache import ClipCache
+from scripts.logic.commands import CommandDispatcher, CommandRegistry
+from scripts.logic.control import ControlClient, RemoteRouting, default_address, default_token_path, parse_address
+from scripts.logic.devices import DeviceWatcher
+from scripts.logic.command_handlers import DefaultCommands, RoutingCommands, load_settings
 from scripts.qt.labels import LabelPrefs
 
 class Loader:
-    def __init__(self, dir, audio_values):
+    def __init__(self, dir, audio_values, daemon=None):
         # Audio Values
         self.audio_values = audio_values
         
         # Directories
         self.icons_dir = os.path.join(dir, 'icons')
         self.json_dir = os.path.join(dir, 'json')
+        self.sounds_dir = os.path.join(dir, 'sounds')
+        self.clip_cache_dir = os.path.join(self.json_dir, 'clip_cache')
+        self.commands_file = os.path.join(self.json_dir, 'commands.json')
+        self.recordings_dir = os.path.join(dir, 'recordings')
         
         # Print that gives Information for the loaded libraries
         self.print_library_info()
@@ -19,9 +28,47 @@ class Loader:
         # Individual Libraries
         self.icons = IconLoader(self.icons_dir)
         self.audio_devices = AudioDevices()
-        self.audio_routing = AudioRouting(self.audio_devices, self.audio_values)
+        
+        # Either Drive a Running Daemon, Which Owns the Devices, Clips and Replay, or Route Audio Here
+        if daemon is not None:
+            self.use_daemon(daemon or None)
+        else:
+            self.audio_routing = AudioRouting(self.audio_devices, self.audio_values)
+            # The Route Follows Device Changes on the GUI Thread (See AudioSelectionWidget)
+            self.device_watcher = DeviceWatcher(self.audio_devices.registry)
+            self.device_watcher.start()
+            self.clip_cache = ClipCache(self.clip_cache_dir)
+            self.audio_routing.clip_engine.cache = self.clip_cache
+            self.audio_routing.clip_engine.add_directory(self.sounds_dir)
+            self.audio_routing.enable_replay(30.0)
+        
+        # Commands Act on Whichever Routing Is in Use
+        self.commands = DefaultCommands(load_settings(self.commands_file)).register(CommandRegistry())
+        RoutingCommands(self.audio_routing, self.recordings_dir).register(self.commands)
+        self.command_dispatcher = CommandDispatcher(self.commands)
         self.labels = LabelPrefs()
         
+    def use_daemon(self, address=None):
+        """
+        Hands the audio to a running daemon (daemon.py): the widgets then drive
+        its routing over the control socket. No AudioRouting, device watcher,
+        clip cache or replay buffer is built in this process; the daemon has its own.
+        
+        Args:
+            address (str): Socket path or host:port; json/daemon.sock by default.
+        """
+        address = parse_address(address) if address else default_address(self.json_dir)
+        client = ControlClient(address, token_path=default_token_path(self.json_dir))
+        self.audio_routing = RemoteRouting(client, self.audio_devices.registry, self.sounds_dir)
+        self.audio_values = self.audio_routing.audio_values
+        self.device_watcher = None
+        self.clip_cache = None
+        print(f"\033[94mUsing the routing daemon at {address}\033[0m")
+    
     def print_library_info(self):
         print(f"Icons Directory: {self.icons_dir}")
-        print(f"JSON Directory: {self.json_dir}")
\ No newline at end of file
+        print(f"JSON Directory: {self.json_dir}")
+        print(f"Sounds Directory: {self.sounds_dir}")
+        print(f"Clip Cache Directory: {self.clip_cache_dir}")
+        print(f"Commands File: {self.commands_file}")
+        print(f"Recordings Directory: {self.recordings_dir}")
\ No newline at end of file
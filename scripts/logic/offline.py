@@ -0,0 +1,202 @@
+"""
+Headless offline processing of WAV files through the live DSP chain.
+
+Files are streamed in fixed-size chunks through AudioRouting.process_audio,
+exactly as the PortAudio callback would, without opening any audio device or
+Qt window. Memory use is bounded by the chunk size regardless of file length.
+
+Usage:
+    python offline.py recording.wav -o cleaned.wav --threshold 0.0005
+    python offline.py recordings/ -o cleaned/ --jobs 4
+"""
+import argparse
+import os
+import sys
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from scripts.logic.audio import AudioRouting, AudioValues
+
+# Full-Scale Value and NumPy Type per WAV Sample Width (24-Bit Is Unpacked by Hand)
+PCM_FORMATS = {
+    1: (128.0, np.uint8),
+    2: (32768.0, np.int16),
+    3: (8388608.0, None),
+    4: (2147483648.0, np.int32),
+}
+
+def pcm_to_float(raw, sampwidth, channels):
+    """Converts interleaved PCM bytes to a (frames, channels) float32 array."""
+    scale, dtype = PCM_FORMATS[sampwidth]
+    if sampwidth == 3:
+        bytes_ = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = bytes_[:, 0] | (bytes_[:, 1] << 8) | (bytes_[:, 2] << 16)
+        samples = np.where(samples >= 1 << 23, samples - (1 << 24), samples)
+    else:
+        samples = np.frombuffer(raw, dtype=dtype).astype(np.float32)
+        if sampwidth == 1:
+            samples -= 128.0
+    return (samples / scale).astype(np.float32).reshape(-1, channels)
+
+def float_to_pcm(block, sampwidth):
+    """Converts a float block to interleaved PCM bytes, clipping to full scale."""
+    scale, dtype = PCM_FORMATS[sampwidth]
+    samples = np.clip(np.round(block.reshape(-1).astype(np.float64) * scale), -scale, scale - 1).astype(np.int32)
+    if sampwidth == 3:
+        samples = samples & 0xFFFFFF
+        return np.stack([samples & 0xFF, (samples >> 8) & 0xFF, samples >> 16], axis=1).astype(np.uint8).tobytes()
+    if sampwidth == 1:
+        samples = samples + 128
+    return samples.astype(dtype).tobytes()
+
+def process_file(source, destination, settings):
+    """
+    Streams one WAV file through process_audio and writes the result.
+
+    The spectral gate's latency is compensated by dropping its leading output
+    and flushing its tail with silence, so the output lines up with the input.
+
+    Args:
+        source (str): Input WAV path.
+        destination (str): Output WAV path (same format as the input).
+        settings (dict): 'volume', 'noise_threshold', 'spectrum', 'frames',
+            'stft_size' and 'stft_hop'.
+
+    Returns:
+        dict: Source, destination, audio seconds, processing seconds and real-time factor.
+    """
+    start = time.perf_counter()
+    frames = settings['frames']
+
+    # Same Values the Qt Sliders Set
+    audio_values = AudioValues()
+    audio_values.set_volume(settings['volume'])
+    audio_values.set_noise_threshold(settings['noise_threshold'])
+    audio_values.set_spectrum(settings['spectrum'])
+
+    with wave.open(source, 'rb') as reader, wave.open(destination, 'wb') as writer:
+        channels = reader.getnchannels()
+        sampwidth = reader.getsampwidth()
+        sample_rate = reader.getframerate()
+        total_frames = reader.getnframes()
+        writer.setnchannels(channels)
+        writer.setsampwidth(sampwidth)
+        writer.setframerate(sample_rate)
+
+        # A Routing Without Devices, Configured Like a Live Stream
+        routing = AudioRouting(None, audio_values)
+        routing.stft_size = settings['stft_size']
+        routing.stft_hop = settings['stft_hop']
+        routing.configure_stream(sample_rate, channels, frames)
+        latency = routing.spectral_gate.latency if settings['spectrum'] else 0
+
+        indata = routing.buffers.scratch
+        outdata = routing.buffers.output
+        to_skip = latency
+        remaining = total_frames
+        tail = latency
+        while remaining > 0 or tail > 0:
+            # Read a Chunk, Padding the End (and the Latency Flush) With Silence
+            if remaining > 0:
+                block = pcm_to_float(reader.readframes(min(frames, remaining)), sampwidth, channels)
+                read = len(block)
+                remaining = remaining - read if read else 0
+                indata[:read] = block
+                indata[read:] = 0
+            else:
+                read = 0
+                indata.fill(0)
+            if read < frames:
+                flushed = min(frames - read, tail)
+                tail -= flushed
+                valid = read + flushed
+            else:
+                valid = frames
+
+            routing.process_audio(indata, outdata, frames, None, 0)
+
+            # Drop the Gate's Leading Latency, Then Write Only the Frames That Map to Input
+            first = min(to_skip, valid)
+            to_skip -= first
+            if valid > first:
+                writer.writeframes(float_to_pcm(outdata[first:valid], sampwidth))
+
+    elapsed = time.perf_counter() - start
+    audio_seconds = total_frames / sample_rate
+    return {
+        'source': source,
+        'destination': destination,
+        'audio_seconds': audio_seconds,
+        'processing_seconds': elapsed,
+        'realtime_factor': audio_seconds / elapsed if elapsed > 0 else float('inf'),
+    }
+
+def collect_jobs(inputs, output):
+    """Expands files and directories of WAV files into (source, destination) pairs."""
+    jobs = []
+    for path in inputs:
+        if os.path.isdir(path):
+            sources = sorted(os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith('.wav'))
+        else:
+            sources = [path]
+        for source in sources:
+            name = os.path.basename(source)
+            if output is None:
+                destination = os.path.splitext(source)[0] + '_processed.wav'
+            elif os.path.isdir(output) or len(inputs) > 1 or os.path.isdir(path):
+                os.makedirs(output, exist_ok=True)
+                destination = os.path.join(output, name)
+            else:
+                destination = output
+            jobs.append((source, destination))
+    return jobs
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process WAV files through the live DSP chain, without audio devices.")
+    parser.add_argument('inputs', nargs='+', help="WAV files or directories of WAV files.")
+    parser.add_argument('-o', '--output', help="Output file, or directory for several inputs.")
+    parser.add_argument('--volume', type=float, default=100, help="Volume in percent, like the Volume slider.")
+    parser.add_argument('--threshold', type=float, default=0.0, help="Noise threshold, like the Noise Threshold slider.")
+    parser.add_argument('--no-gate', action='store_true', help="Disable the spectral noise gate.")
+    parser.add_argument('--frames', type=int, default=1024, help="Chunk size, like frames_per_buffer.")
+    parser.add_argument('--stft-size', type=int, default=1024)
+    parser.add_argument('--stft-hop', type=int, default=512)
+    parser.add_argument('--jobs', type=int, default=1, help="Process files in parallel with this many processes.")
+    args = parser.parse_args(argv)
+
+    settings = {
+        'volume': args.volume,
+        'noise_threshold': args.threshold,
+        'spectrum': not args.no_gate,
+        'frames': args.frames,
+        'stft_size': args.stft_size,
+        'stft_hop': args.stft_hop,
+    }
+    jobs = collect_jobs(args.inputs, args.output)
+    if not jobs:
+        print("No WAV files found.")
+        return 1
+
+    start = time.perf_counter()
+    if args.jobs > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            futures = [pool.submit(process_file, source, destination, settings) for source, destination in jobs]
+            results = [future.result() for future in futures]
+    else:
+        results = [process_file(source, destination, settings) for source, destination in jobs]
+    elapsed = time.perf_counter() - start
+
+    for result in results:
+        print(f"{result['source']} -> {result['destination']}: {result['audio_seconds']:.1f}s audio "
+              f"in {result['processing_seconds']:.2f}s ({result['realtime_factor']:.1f}x real time)")
+
+    total_audio = sum(result['audio_seconds'] for result in results)
+    print(f"\033[94mTotal: {total_audio:.1f}s audio in {elapsed:.2f}s "
+          f"({total_audio / elapsed if elapsed > 0 else float('inf'):.1f}x real time)\033[0m")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
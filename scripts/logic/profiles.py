@@ -0,0 +1,142 @@
+"""
+Saved routing profiles: which devices to route between, the buffer size and
+the processing settings, kept in json/profiles.json.
+
+Devices are stored by their stable (host API, device name) key (see
+DeviceRegistry.key()), never by PortAudio index, since indices change
+whenever devices are added or removed. One profile can be marked as the
+default, which the headless daemon starts with.
+"""
+import json
+import os
+
+from scripts.logic.latency import DEFAULT_LATENCY_MODE
+
+PROFILES_FILE = 'profiles.json'
+
+DEFAULT_PROFILE = {
+    'speaker': None,
+    'mic_input': None,
+    'mic_output': None,
+    'frames': None,
+    'latency_mode': DEFAULT_LATENCY_MODE,
+    'adaptive_latency': True,
+    'volume': 100,
+    'noise_threshold': 0.0,
+    'monitor': 0.0,
+}
+
+# Profile Keys Naming Devices, With the Direction Each Is Resolved For
+DEVICE_FIELDS = (('speaker', 'output'), ('mic_input', 'input'), ('mic_output', 'output'))
+
+class ProfileStore:
+    """
+    Profiles by name, read from and written to one JSON file.
+
+    Args:
+        json_dir (str): Directory holding profiles.json (Loader.json_dir).
+    """
+    def __init__(self, json_dir):
+        self.path = os.path.join(json_dir, PROFILES_FILE)
+        self.profiles = {}
+        self.default = None
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+        except (OSError, ValueError) as e:
+            print(f"\033[91mCould not read {self.path}: {e}\033[0m")
+            data = {}
+        self.profiles = data.get('profiles', {})
+        self.default = data.get('default')
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({'default': self.default, 'profiles': self.profiles}, f, indent=2)
+        os.replace(temporary, self.path)
+
+    def names(self):
+        return sorted(self.profiles)
+
+    def get(self, name=None):
+        """
+        A profile with every key filled in (missing keys take DEFAULT_PROFILE's values).
+
+        Args:
+            name (str): Profile name; the default profile if None.
+
+        Returns:
+            dict: The profile, or None if there is no such profile.
+        """
+        name = name or self.default
+        if name not in self.profiles:
+            return None
+        profile = dict(DEFAULT_PROFILE)
+        profile.update(self.profiles[name])
+        return profile
+
+    def put(self, name, profile, default=False):
+        """Stores a profile (and writes the file), optionally making it the default."""
+        self.profiles[name] = {key: profile.get(key, value) for key, value in DEFAULT_PROFILE.items()}
+        if default or self.default is None:
+            self.default = name
+        self.save()
+
+    def remove(self, name):
+        if self.profiles.pop(name, None) is None:
+            raise KeyError(name)
+        if self.default == name:
+            self.default = None
+        self.save()
+
+def capture_profile(routing):
+    """
+    The running route's devices, buffer size and settings as a profile.
+
+    Args:
+        routing (AudioRouting): Routing to read; devices and frames are None unless it is running.
+    """
+    devices = routing.audio_devices
+    registry = devices.registry
+    profile = dict(DEFAULT_PROFILE)
+    for field, _ in DEVICE_FIELDS:
+        info = getattr(devices, field)
+        profile[field] = list(registry.key(info)) if info is not None else None
+    values = routing.audio_values
+    profile.update({
+        'frames': routing.buffer_size if routing.running else None,
+        'latency_mode': routing.latency_mode,
+        'adaptive_latency': routing.adaptive_latency,
+        'volume': values.get_volume(),
+        'noise_threshold': values.get_noise_threshold(),
+        'monitor': routing.sink_gains['speaker'],
+    })
+    return profile
+
+def apply_profile(routing, profile, start=True):
+    """
+    Applies a profile's settings and, if start is set, starts routing between its devices.
+
+    Returns:
+        bool: True if routing is running afterwards (or start was not asked for).
+    """
+    values = routing.audio_values
+    values.set_volume(profile['volume'])
+    values.set_noise_threshold(profile['noise_threshold'])
+    routing.set_sink_gain('speaker', profile['monitor'])
+    routing.set_adaptive_latency(profile['adaptive_latency'])
+    routing.set_latency_mode(profile['latency_mode'])
+    if not start:
+        return True
+    missing = [field for field, _ in DEVICE_FIELDS if not profile[field]]
+    if missing:
+        print(f"\033[91mProfile has no device for: {', '.join(missing)}\033[0m")
+        return False
+    routing.start_route(profile['speaker'], profile['mic_input'], profile['mic_output'], profile['frames'])
+    return routing.running
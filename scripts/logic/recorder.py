@@ -0,0 +1,219 @@
+"""
+Recording the routed signal to disk.
+
+The audio callback never touches a file. It pushes each processed block to a
+device-less routing sink, which only copies it into the sink's preallocated
+ring (see Sink.push). A writer thread wakes a few times a second and drains
+the ring in large chunks. It writes them to 16-bit WAV files or to raw
+float32 files (each with a JSON sidecar giving the rate and channel count).
+If the disk stalls for longer than the ring holds, the ring drops the newest
+frames and counts them, and stats() reports them. Files are rotated by size
+or duration, and whenever the stream's format changes.
+"""
+import datetime
+import json
+import os
+import threading
+import time
+import wave
+
+import numpy as np
+
+RECORDING_FORMATS = ('wav', 'raw')
+
+# A WAV Header Stores Sizes in 32 Bits
+WAV_MAX_BYTES = 2 ** 32 - 1024
+
+class Recorder:
+    """
+    Writer thread draining a recording sink to files.
+
+    Args:
+        sink (Sink): Device-less sink to drain (see AudioRouting.start_recording()).
+        directory (str): Where files are written (created if needed).
+        format (str): 'wav' (16-bit PCM) or 'raw' (float32 frames, plus a .json sidecar).
+        prefix (str): File name prefix; a timestamp and part number follow it.
+        chunk_seconds (float): Audio drained per write, and how often the thread wakes.
+        max_bytes (int): Rotate to a new file once one reaches this size (None for no limit; WAV caps it at 4 GiB).
+        max_seconds (float): Rotate to a new file after this much audio (None for no limit).
+    """
+    def __init__(self, sink, directory, format='wav', prefix='recording', chunk_seconds=0.5,
+                 max_bytes=1 << 30, max_seconds=None):
+        if format not in RECORDING_FORMATS:
+            raise ValueError(f"Unknown recording format '{format}'. Must be one of: {', '.join(RECORDING_FORMATS)}.")
+        self.sink = sink
+        self.directory = directory
+        self.format = format
+        self.prefix = prefix
+        self.chunk_seconds = chunk_seconds
+        self.max_bytes = min(max_bytes or WAV_MAX_BYTES, WAV_MAX_BYTES) if format == 'wav' else max_bytes
+        self.max_seconds = max_seconds
+
+        # Current File, and the Format It Was Opened With
+        self.file = None
+        self.path = None
+        self.file_rate = None
+        self.file_channels = None
+        self.file_frames = 0
+        self.file_bytes = 0
+        self.part = 0
+        self.stamp = None
+        self.files = []
+
+        # Chunk Buffers, Sized to the Sink (Resized Only if the Stream's Format Changes)
+        self.chunk = None
+        self.scaled = None
+        self.pcm = None
+
+        # Counters
+        self.frames_written = 0
+        self.dropped = 0
+        self.dropped_seen = 0
+        self.write_seconds = 0.0
+        self.worst_write = 0.0
+        self.errors = 0
+
+        # Thread State
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        if self.thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="Recorder", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stops the thread after writing what is still queued, and closes the file."""
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+
+    def run(self):
+        try:
+            while not self.stop_event.wait(self.chunk_seconds):
+                self.drain()
+            self.drain()
+        finally:
+            self.close_file()
+
+    def drain(self):
+        """
+        Writes everything queued in the sink's ring, in chunks.
+
+        Returns:
+            int: Frames written.
+        """
+        sink = self.sink
+        ring = sink.ring
+        if ring is None:
+            return 0
+
+        # Frames the Ring Could Not Take While We Were Behind (the Counter Restarts With the Stream)
+        if ring.dropped < self.dropped_seen:
+            self.dropped_seen = 0
+        if ring.dropped > self.dropped_seen:
+            self.dropped += ring.dropped - self.dropped_seen
+            self.dropped_seen = ring.dropped
+
+        written = 0
+        while ring.available():
+            chunk_frames = max(1, int(sink.rate * self.chunk_seconds))
+            if self.chunk is None or self.chunk.shape != (chunk_frames, ring.channels):
+                self.chunk = np.zeros((chunk_frames, ring.channels), dtype=np.float32)
+                self.scaled = np.zeros_like(self.chunk)
+                self.pcm = np.zeros(self.chunk.shape, dtype=np.int16)
+            frames = ring.read(self.chunk)
+            try:
+                self.write(self.chunk[:frames], sink.rate)
+            except OSError as e:
+                # Keep Draining so the Ring Does Not Back Up; the Next Chunk Opens a New File
+                self.errors += 1
+                self.close_file()
+                print(f"\033[91mRecording write failed: {e}\033[0m")
+            written += frames
+        return written
+
+    def write(self, block, rate):
+        frames, channels = block.shape
+        if (self.file is None or rate != self.file_rate or channels != self.file_channels
+                or (self.max_bytes and self.file_bytes >= self.max_bytes)
+                or (self.max_seconds and self.file_frames >= self.max_seconds * rate)):
+            self.open_file(rate, channels)
+
+        start = time.perf_counter()
+        if self.format == 'wav':
+            scaled = self.scaled[:frames]
+            pcm = self.pcm[:frames]
+            np.multiply(block, 32767.0, out=scaled)
+            np.clip(scaled, -32768.0, 32767.0, out=scaled)
+            np.copyto(pcm, scaled, casting='unsafe')
+            self.file.writeframes(pcm)
+            size = pcm.nbytes
+        else:
+            self.file.write(block)
+            size = block.nbytes
+        elapsed = time.perf_counter() - start
+
+        self.write_seconds += elapsed
+        self.worst_write = max(self.worst_write, elapsed)
+        self.file_frames += frames
+        self.file_bytes += size
+        self.frames_written += frames
+
+    def open_file(self, rate, channels):
+        self.close_file()
+        self.part += 1
+        base = os.path.join(self.directory, f"{self.prefix}_{self.stamp}_{self.part:03d}")
+        if self.format == 'wav':
+            self.path = base + '.wav'
+            self.file = wave.open(self.path, 'wb')
+            self.file.setnchannels(channels)
+            self.file.setsampwidth(2)
+            self.file.setframerate(rate)
+        else:
+            self.path = base + '.f32'
+            with open(base + '.json', 'w') as f:
+                json.dump({'sample_rate': rate, 'channels': channels, 'dtype': 'float32', 'layout': 'interleaved'}, f)
+            self.file = open(self.path, 'wb')
+        self.file_rate = rate
+        self.file_channels = channels
+        self.file_frames = 0
+        self.file_bytes = 0
+        self.files.append(self.path)
+        print(f"\033[94mRecording to {self.path}\033[0m")
+
+    def close_file(self):
+        if self.file is None:
+            return
+        try:
+            self.file.close()
+        except OSError as e:
+            print(f"\033[91mClosing {self.path} failed: {e}\033[0m")
+        self.file = None
+
+    def stats(self):
+        """
+        Returns:
+            dict: 'path' (current file), 'files', 'seconds' written, 'frames', 'dropped'
+            frames (lost while the disk stalled), 'queued' frames, 'write_ms_mean',
+            'write_ms_worst' and 'errors'.
+        """
+        sink = self.sink
+        writes = self.frames_written / max(1, int(sink.rate * self.chunk_seconds))
+        return {
+            'path': self.path,
+            'files': list(self.files),
+            'seconds': self.frames_written / sink.rate,
+            'frames': self.frames_written,
+            'dropped': self.dropped,
+            'queued': sink.ring.available() if sink.ring is not None else 0,
+            'write_ms_mean': self.write_seconds / writes * 1000 if writes else 0.0,
+            'write_ms_worst': self.worst_write * 1000,
+            'errors': self.errors,
+        }
@@ -0,0 +1,150 @@
+"""
+Streaming polyphase sample-rate conversion.
+
+Converts between any two integer rates by the rational factor up/down
+(e.g. 44100 -> 48000 is 160/147) with a Kaiser-windowed sinc low-pass split
+into `up` phases. Coefficients are designed once per rate pair and cached;
+the last input frames are carried between blocks, so a stream can be
+converted block by block with a fixed delay and no clicks at block edges.
+"""
+import math
+
+import numpy as np
+
+# Polyphase Filters by (Input Rate, Output Rate, Taps per Phase)
+_FILTERS = {}
+
+def rate_ratio(rate_in, rate_out):
+    """Reduced (up, down) factors converting rate_in to rate_out."""
+    divisor = math.gcd(int(rate_in), int(rate_out))
+    return int(rate_out) // divisor, int(rate_in) // divisor
+
+def polyphase_filter(rate_in, rate_out, taps=32, rolloff=0.9, beta=8.6):
+    """
+    Anti-aliasing low-pass for rate_in -> rate_out, split into phases.
+
+    Args:
+        rate_in (int): Input sample rate.
+        rate_out (int): Output sample rate.
+        taps (int): Input frames each output frame is computed from.
+        rolloff (float): Passband edge as a fraction of the lower Nyquist frequency.
+        beta (float): Kaiser window shape (8.6 gives about 90 dB of stopband rejection).
+
+    Returns:
+        np.ndarray: (up, taps) float32 coefficients; row p applies to phase p,
+        ordered oldest to newest input frame.
+    """
+    key = (int(rate_in), int(rate_out), taps)
+    phases = _FILTERS.get(key)
+    if phases is not None:
+        return phases
+
+    up, down = rate_ratio(rate_in, rate_out)
+    length = up * taps
+
+    # Cutoff in Cycles per Sample of the Upsampled (rate_in * up) Signal
+    cutoff = rolloff * 0.5 / max(up, down)
+    n = np.arange(length) - (length - 1) / 2.0
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, beta)
+    h *= up / h.sum()  # Unity DC Gain per Phase After Zero-Stuffing
+
+    # h[p + k * up] Weighs Input Frame i0 - k for Phase p; Reverse k So Rows Run Oldest to Newest
+    phases = np.ascontiguousarray(h.reshape(taps, up).T[:, ::-1]).astype(np.float32)
+    _FILTERS[key] = phases
+    return phases
+
+class PolyphaseResampler:
+    """
+    Converts (frames, channels) float32 blocks from rate_in to rate_out.
+
+    All working memory is allocated for blocks of up to max_frames input
+    frames, so process() does not allocate arrays.
+
+    Args:
+        rate_in (int): Input sample rate.
+        rate_out (int): Output sample rate.
+        channels (int): Number of channels.
+        max_frames (int): Largest input block process() will be given.
+        taps (int): Filter taps per phase (quality vs CPU).
+    """
+    def __init__(self, rate_in, rate_out, channels, max_frames, taps=32):
+        self.rate_in = int(rate_in)
+        self.rate_out = int(rate_out)
+        self.channels = channels
+        self.max_frames = max_frames
+        self.taps = taps
+        self.up, self.down = rate_ratio(rate_in, rate_out)
+        self.phases = polyphase_filter(rate_in, rate_out, taps)
+
+        # Fixed Delay of the Linear-Phase Filter, in Input Frames and Seconds
+        self.delay_frames = (self.up * taps - 1) / (2.0 * self.up)
+        self.latency = self.delay_frames / self.rate_in
+
+        # Output Position Pattern, Which Repeats Every `up` Outputs
+        self.max_output = -(-max_frames * self.up // self.down) + 1
+        # (Each Output's Input Window as History Indexes, and Its Filter Phase)
+        steps = np.arange(self.up + self.max_output, dtype=np.int64) * self.down
+        self.step_windows = (steps // self.up)[:, np.newaxis] + np.arange(taps, dtype=np.int64)
+        self.step_phases = steps % self.up
+
+        # Channel-Major History (taps - 1 Frames) Followed by the Current Block
+        self.history = np.zeros((channels, taps - 1 + max_frames), dtype=np.float32)
+
+        # Per-Block Scratch
+        self.indexes = np.zeros((self.max_output, taps), dtype=np.int64)
+        self.gathered = np.zeros((self.max_output, taps), dtype=np.float32)
+        self.coefficients = np.zeros((self.max_output, taps), dtype=np.float32)
+        self.result = np.zeros((channels, self.max_output), dtype=np.float32)
+
+        self.reset()
+
+    def reset(self):
+        """Forgets the carried input, as if the stream started again."""
+        self.history.fill(0)
+        self.consumed = 0
+        self.produced = 0
+
+    def output_frames(self, frames):
+        """Number of output frames the next process() call will produce for `frames` input frames."""
+        total = self.consumed + frames
+        return max(0, (total * self.up - 1) // self.down + 1 - self.produced)
+
+    def process(self, block, out):
+        """
+        Resamples one block, continuing from the previous one.
+
+        Args:
+            block (np.ndarray): (frames, channels) input, frames <= max_frames.
+            out (np.ndarray): (>= output_frames(frames), channels) destination.
+
+        Returns:
+            int: Number of output frames written to out.
+        """
+        frames = len(block)
+        keep = self.taps - 1
+        self.history[:, keep:keep + frames] = block.T
+        count = self.output_frames(frames)
+
+        if count:
+            # Input Frame and Phase of Each Output, From the Repeating Pattern
+            cycle, start = divmod(self.produced, self.up)
+            offset = cycle * self.down - self.consumed
+            indexes = self.indexes[:count]
+            np.add(self.step_windows[start:start + count], offset, out=indexes)
+            coefficients = self.coefficients[:count]
+            np.take(self.phases, self.step_phases[start:start + count], axis=0, out=coefficients, mode='clip')
+
+            # Dot Each Output's Input Window With Its Phase, One Channel at a Time
+            # (Indexes Are Always in Range; mode='clip' Keeps take() From Buffering `out`)
+            gathered = self.gathered[:count]
+            for channel in range(self.channels):
+                np.take(self.history[channel], indexes, out=gathered, mode='clip')
+                np.multiply(gathered, coefficients, out=gathered)
+                np.sum(gathered, axis=1, out=self.result[channel, :count])
+            out[:count] = self.result[:, :count].T
+
+        # Carry the Last taps - 1 Input Frames Into the Next Block
+        self.history[:, :keep] = self.history[:, frames:frames + keep]
+        self.consumed += frames
+        self.produced += count
+        return count
@@ -0,0 +1,229 @@
+"""
+Fan-out of the processed capture to several outputs.
+
+The audio callback runs the DSP once per block and pushes the result to
+every sink in the RoutingGraph. Each sink applies its own gain, converts to
+its own rate if needed and queues into its own RingBuffer; its consumer (an
+output stream callback, or a thread such as a recorder) plays or stores from
+that ring. Pushing never waits: a sink whose consumer stalls fills its ring
+and drops its own frames, without holding up the other sinks.
+"""
+import numpy as np
+
+from scripts.logic.buffers import RingBuffer
+from scripts.logic.resample import PolyphaseResampler
+
+class Sink:
+    """
+    One output endpoint fed from the processed capture.
+
+    Args:
+        name (str): Name in the graph, e.g. 'mic' or 'speaker'.
+        rate (int): Sample rate the consumer runs at.
+        channels (int): Channels the consumer takes (the first channels of the capture).
+        downmix (bool): With channels=1, average every capture channel instead of taking the first.
+        gain (float): Linear gain applied to this sink only.
+        device (dict): Device info of the output stream, or None for non-device consumers.
+        prefill_buffers (int): Output buffers queued before playback starts.
+        ring_seconds (float): Audio the ring holds at least, for consumers that may stall (e.g. a recorder).
+    """
+    def __init__(self, name, rate, channels, gain=1.0, device=None, prefill_buffers=2, ring_seconds=0.0, downmix=False):
+        self.name = name
+        self.rate = int(rate)
+        self.max_channels = channels
+        self.channels = channels
+        self.downmix = downmix
+        self.gain = gain
+        self.device = device
+        self.prefill_buffers = prefill_buffers
+        self.ring_seconds = ring_seconds
+
+        # Output Stream Playing This Sink (Set by AudioRouting)
+        self.stream = None
+
+        # Sized by configure()
+        self.rate_in = None
+        self.max_frames = 0
+        self.scratch = None
+        self.mix = None
+        self.resampler = None
+        self.resampled = None
+        self.ring = None
+        self.frames = None
+        self.block = None
+        self.prefill = 0
+        self.latency = 0.0
+
+        # Consumer State and Counters
+        self.primed = False
+        self.underruns = 0
+        self.skipped = 0
+
+    def configure(self, rate_in, channels_in, frames):
+        """
+        Sizes the sink for capture blocks of `frames` at rate_in. Called
+        whenever the capture configuration changes, never per block.
+        """
+        self.channels = min(self.max_channels, channels_in)
+        self.max_frames = max(self.max_frames, frames)
+        if self.scratch is None or self.scratch.shape != (self.max_frames, self.channels):
+            self.scratch = np.zeros((self.max_frames, self.channels), dtype=np.float32)
+
+        # Downmix Weights: One Matrix Product Averages the Capture Channels Into the Mono Scratch
+        if self.downmix and self.channels == 1 and channels_in > 1:
+            self.mix = np.full((channels_in, 1), 1.0 / channels_in, dtype=np.float32)
+        else:
+            self.mix = None
+
+        # Rate Conversion Only When the Consumer Runs at Another Rate (Coefficients Are Cached)
+        if rate_in == self.rate:
+            self.resampler = None
+            self.resampled = None
+            max_output = frames
+        else:
+            resampler = self.resampler
+            if (resampler is None or resampler.rate_in != rate_in or resampler.channels != self.channels
+                    or resampler.max_frames < self.max_frames):
+                self.resampler = resampler = PolyphaseResampler(rate_in, self.rate, self.channels, self.max_frames)
+                self.resampled = np.zeros((resampler.max_output, self.channels), dtype=np.float32)
+            max_output = resampler.max_output
+        self.rate_in = rate_in
+
+        # Consumer Buffers of About the Same Duration, With a Prefill Against Jitter Between the Two Sides
+        self.frames = max(1, int(round(frames * self.rate / rate_in)))
+        self.prefill = self.prefill_buffers * max(self.frames, max_output)
+        capacity = max(self.rate // 2, 4 * self.prefill, int(self.ring_seconds * self.rate))
+        if self.ring is None or self.ring.capacity != capacity or self.ring.channels != self.channels:
+            self.ring = RingBuffer(capacity, self.channels)
+        if self.block is None or self.block.shape != (self.frames, self.channels):
+            self.block = np.zeros((self.frames, self.channels), dtype=np.float32)
+        self.latency = (self.resampler.latency if self.resampler is not None else 0.0) + self.prefill / self.rate
+
+    def reset(self):
+        """Empties the queue. Only call while neither side is running."""
+        if self.resampler is not None:
+            self.resampler.reset()
+        if self.ring is not None:
+            self.ring.reset()
+        self.primed = False
+        self.underruns = 0
+        self.skipped = 0
+
+    def push(self, block):
+        """
+        Producer side (the capture callback): applies the gain, converts the
+        rate and queues the block. Never waits; overflow is dropped and counted by the ring.
+        """
+        frames = len(block)
+        scratch = self.scratch[:frames]
+        if self.mix is not None:
+            np.matmul(block, self.mix, out=scratch)
+            np.multiply(scratch, self.gain, out=scratch)
+        else:
+            np.multiply(block[:, :self.channels], self.gain, out=scratch)
+        if self.resampler is not None:
+            converted = self.resampler.process(scratch, self.resampled)
+            self.ring.write(self.resampled[:converted])
+        else:
+            self.ring.write(scratch)
+
+    def pull(self, out):
+        """
+        Consumer side: fills `out` from the queue, padding with silence
+        until the prefill is reached or when the queue runs dry.
+
+        Returns:
+            int: Number of queued frames written to out.
+        """
+        frames = len(out)
+        ring = self.ring
+        available = ring.available()
+
+        # Wait for the Prefill Before Playing, so Small Timing Jitter Does Not Underrun
+        if not self.primed:
+            if available < self.prefill:
+                out.fill(0)
+                return 0
+            self.primed = True
+
+        # The Two Clocks Drift; Drop the Excess if the Queue Keeps Growing
+        if available > 2 * self.prefill + frames:
+            self.skipped += ring.skip(available - self.prefill)
+
+        read = ring.read(out)
+        if read < frames:
+            # Ran Dry: Pad With Silence and Build Up the Prefill Again
+            out[read:].fill(0)
+            self.underruns += 1
+            self.primed = False
+        return read
+
+    def stats(self):
+        return {
+            'rate': self.rate,
+            'channels': self.channels,
+            'gain': self.gain,
+            'queued': self.ring.available() if self.ring is not None else 0,
+            'underruns': self.underruns,
+            'dropped': self.ring.dropped if self.ring is not None else 0,
+            'skipped': self.skipped,
+            'latency_ms': self.latency * 1000,
+        }
+
+class RoutingGraph:
+    """
+    The set of sinks the processed capture is pushed to.
+
+    Adding or removing a sink swaps in a new tuple, so the audio callback
+    always iterates over a consistent set without taking a lock.
+    """
+    def __init__(self):
+        self.sinks = {}
+        self.active = ()
+        self.rate_in = None
+        self.channels_in = None
+        self.frames = None
+
+    def __contains__(self, name):
+        return name in self.sinks
+
+    def get(self, name):
+        return self.sinks.get(name)
+
+    def add(self, sink):
+        """Adds (or replaces) a sink, sized for the current capture configuration."""
+        if self.rate_in is not None:
+            sink.configure(self.rate_in, self.channels_in, self.frames)
+        self.sinks[sink.name] = sink
+        self.active = tuple(self.sinks.values())
+        return sink
+
+    def remove(self, name):
+        sink = self.sinks.pop(name, None)
+        self.active = tuple(self.sinks.values())
+        return sink
+
+    def configure(self, rate_in, channels_in, frames):
+        """Resizes every sink for a new capture configuration."""
+        self.rate_in = rate_in
+        self.channels_in = channels_in
+        self.frames = frames
+        for sink in self.active:
+            sink.configure(rate_in, channels_in, frames)
+
+    def reset(self):
+        for sink in self.active:
+            sink.reset()
+
+    def push(self, block):
+        """Queues one processed block to every sink."""
+        for sink in self.active:
+            sink.push(block)
+
+    def set_gain(self, name, gain):
+        sink = self.sinks.get(name)
+        if sink is not None:
+            sink.gain = gain
+
+    def stats(self):
+        return {sink.name: sink.stats() for sink in self.active}
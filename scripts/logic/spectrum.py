@@ -0,0 +1,133 @@
+import threading
+
+import numpy as np
+
+from scripts.logic.stft import make_window
+
+class LogBands:
+    """
+    Groups linear FFT bins into log-spaced bands for display.
+
+    Band edges are fixed per set of frequency bins, so grouping a spectrum is a
+    single NumPy reduction. Low bands narrower than one FFT bin are merged.
+
+    Args:
+        freq_bins (np.ndarray): Ascending bin frequencies in Hz.
+        bands (int): Number of log-spaced bands requested.
+        fmin (float): Lowest displayed frequency in Hz.
+        fmax (float): Highest displayed frequency in Hz, defaults to the top bin.
+    """
+    def __init__(self, freq_bins, bands=64, fmin=20.0, fmax=None):
+        self.fmin = max(fmin, float(freq_bins[0]))
+        self.fmax = float(fmax or freq_bins[-1])
+
+        # First FFT Bin of Each Band
+        edges = np.geomspace(self.fmin, self.fmax, bands + 1)
+        starts = np.searchsorted(freq_bins, edges[:-1])
+        self.starts = np.unique(np.clip(starts, 0, len(freq_bins) - 1))
+
+        # Geometric Center of Each Band, for Placing It on a Log Axis
+        ends = np.append(self.starts[1:], len(freq_bins)) - 1
+        self.centers = np.sqrt(freq_bins[self.starts] * freq_bins[ends]).astype(np.float32)
+
+    def aggregate(self, magnitude):
+        """Returns the peak magnitude of each band."""
+        return np.maximum.reduceat(magnitude, self.starts)
+
+class SpectrumAnalyzer:
+    """
+    Computes display spectra on its own thread, away from the audio callback.
+
+    The callback only copies input frames into `ring`. This thread wakes `rate`
+    times per second, pulls whatever arrived, keeps the most recent `fft_size`
+    frames and publishes their channel-averaged magnitude spectrum in
+    `fft_data`, plus the same spectrum grouped into log-spaced bands in
+    `band_data` for display. If it falls behind, the ring drops frames rather
+    than making the callback wait, and the backlog is skipped here.
+
+    Args:
+        ring (RingBuffer): Ring the audio callback writes input frames into.
+        sample_rate (int): Stream sample rate.
+        audio_values (AudioValues): Source of the noise threshold for display.
+        fft_size (int): Frames per analyzed spectrum.
+        rate (float): Spectra computed per second.
+        window (str or array): Analysis window, see make_window().
+        bands (int): Number of log-spaced display bands.
+    """
+    def __init__(self, ring, sample_rate, audio_values, fft_size=1024, rate=60, window='hann', bands=64):
+        self.ring = ring
+        self.sample_rate = sample_rate
+        self.audio_values = audio_values
+        self.fft_size = fft_size
+        self.rate = rate
+
+        # Window and Frequency Bins (No DC/Nyquist), Computed Once
+        self.window = make_window(window, fft_size)
+        self.window_gain = float(self.window.sum())
+        self.freq_bins = np.fft.rfftfreq(fft_size, 1 / sample_rate)[1:-1].astype(np.float32)
+        self.bands = LogBands(self.freq_bins, bands)
+
+        # Most Recent fft_size Frames, and a Staging Area for New Ones
+        self.history = np.zeros((fft_size, ring.channels), dtype=np.float32)
+        self.incoming = np.zeros((fft_size, ring.channels), dtype=np.float32)
+
+        # Published Output
+        self.fft_data = None
+        self.band_data = None
+        self.spectra = 0
+        self.skipped = 0
+
+        # Thread State
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="SpectrumAnalyzer", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+
+    def run(self):
+        while not self.stop_event.wait(1 / self.rate):
+            self.analyze()
+
+    def analyze(self):
+        """
+        Pulls new frames from the ring and publishes a spectrum.
+
+        Returns:
+            bool: True if a new spectrum was published.
+        """
+        available = self.ring.available()
+        if available == 0:
+            return False
+
+        # Only the Newest fft_size Frames Matter, Skip Any Backlog
+        if available > self.fft_size:
+            self.skipped += self.ring.skip(available - self.fft_size)
+        frames = self.ring.read(self.incoming)
+
+        # Slide the New Frames Into the History
+        self.history[:-frames] = self.history[frames:].copy()
+        self.history[-frames:] = self.incoming[:frames]
+
+        # Channel-Averaged, Window-Normalized Magnitudes
+        mono = self.history.mean(axis=1) * self.window
+        fft_magnitude = np.abs(np.fft.rfft(mono))[1:-1] / self.window_gain
+
+        # Apply noise threshold to the magnitude for visualization
+        fft_magnitude[fft_magnitude < self.audio_values.get_noise_threshold()] = 0
+
+        fft_magnitude = fft_magnitude.astype(np.float32)
+        self.fft_data = (self.freq_bins, fft_magnitude)
+        self.band_data = (self.bands.centers, self.bands.aggregate(fft_magnitude))
+        self.spectra += 1
+        return True
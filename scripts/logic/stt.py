@@ -0,0 +1,331 @@
+"""
+Speech-to-text off the audio and GUI threads.
+
+Speech segments (see vad.py) are submitted to a bounded queue. A dispatcher
+thread groups whatever is queued into batches, pads each batch into one
+(segments, samples) float32 array and sends it to a pool of worker processes.
+Each worker builds its model once at startup, and inference there holds no
+GIL the Qt and audio threads need. Results come back through a Future per
+segment and through listeners, along with each segment's timing. At most one
+batch per worker is in flight; past that, segments wait in the queue. When
+the queue is full it sheds segments instead of growing.
+
+Models are built in the workers by a picklable factory returning a callable
+model(audio, lengths, sample_rate) -> list of str, so the pool can be tested
+offline with any small locally constructed model.
+"""
+import collections
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+
+SHED_POLICIES = ('oldest', 'newest')
+
+class Transcript:
+    """
+    The text of one speech segment and how long it took.
+
+    Attributes:
+        text (str): The transcription.
+        start (float): Stream time the segment started (SpeechSegment.start), or None.
+        end (float): Stream time the segment ended, or None.
+        queued (float): time.perf_counter() when it was submitted.
+        dispatched (float): When its batch was sent to a worker.
+        finished (float): When the result arrived.
+        batch_size (int): Segments in the batch it ran in.
+    """
+    __slots__ = ('text', 'start', 'end', 'queued', 'dispatched', 'finished', 'batch_size')
+
+    def __init__(self, text, start, end, queued, dispatched, finished, batch_size):
+        self.text = text
+        self.start = start
+        self.end = end
+        self.queued = queued
+        self.dispatched = dispatched
+        self.finished = finished
+        self.batch_size = batch_size
+
+    @property
+    def wait(self):
+        """Seconds spent in the queue."""
+        return self.dispatched - self.queued
+
+    @property
+    def latency(self):
+        """Seconds from submission to result."""
+        return self.finished - self.queued
+
+    def __repr__(self):
+        return f"Transcript({self.text!r}, {self.latency * 1000:.0f} ms)"
+
+class Request:
+    """A queued segment and the Future its Transcript is delivered through."""
+    __slots__ = ('audio', 'start', 'end', 'queued', 'future')
+
+    def __init__(self, audio, start, end):
+        self.audio = audio
+        self.start = start
+        self.end = end
+        self.queued = time.perf_counter()
+        self.future = Future()
+
+def pad_batch(requests):
+    """
+    Packs segments into one zero-padded (batch, longest) float32 array.
+
+    Returns:
+        tuple: The padded array and an int array of each segment's length.
+    """
+    lengths = np.array([len(request.audio) for request in requests], dtype=np.int64)
+    audio = np.zeros((len(requests), int(lengths.max()) if len(lengths) else 0), dtype=np.float32)
+    for i, request in enumerate(requests):
+        audio[i, :lengths[i]] = request.audio
+    return audio, lengths
+
+# The Model of This Worker Process, Built Once by the Pool Initializer
+_worker_model = None
+
+def _load_model(model_factory):
+    global _worker_model
+    _worker_model = model_factory()
+
+def _transcribe(audio, lengths, sample_rate):
+    """Worker process: runs the model on one padded batch."""
+    return list(_worker_model(audio, lengths, sample_rate))
+
+class TransformersModel:
+    """
+    Whisper-style sequence-to-sequence speech model from transformers.
+
+    transformers (and torch) are imported here, in the worker process, so
+    the GUI process never loads them. Pass it to SpeechToText with
+    functools.partial(TransformersModel, name) so it pickles.
+
+    Args:
+        name (str): Hugging Face model name or local directory.
+        device (str): torch device to run on.
+    """
+    def __init__(self, name='openai/whisper-tiny.en', device='cpu'):
+        from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor
+        self.processor = AutoProcessor.from_pretrained(name)
+        self.model = AutoModelForSpeechSeq2Seq.from_pretrained(name).to(device).eval()
+        self.device = device
+
+    def __call__(self, audio, lengths, sample_rate):
+        import torch
+        inputs = self.processor([row[:length] for row, length in zip(audio, lengths)],
+                                sampling_rate=sample_rate, return_tensors='pt')
+        with torch.inference_mode():
+            ids = self.model.generate(inputs.input_features.to(self.device))
+        return [text.strip() for text in self.processor.batch_decode(ids, skip_special_tokens=True)]
+
+class SpeechToText:
+    """
+    Bounded, batching speech-to-text service backed by a process pool.
+
+    Args:
+        model_factory (callable): Picklable, no-argument callable that builds the model in each worker.
+        sample_rate (int): Rate of the submitted audio.
+        workers (int): Worker processes, each with its own model.
+        max_queue (int): Segments waiting at most; beyond it one is shed.
+        max_batch (int): Segments per batch at most.
+        batch_wait (float): Seconds to wait for more segments before sending a batch that is not full.
+        shed (str): 'oldest' drops the longest-waiting segment to make room, 'newest' refuses the new one.
+        history (int): Latencies kept for the percentiles in stats().
+    """
+    def __init__(self, model_factory, sample_rate=16000, workers=1, max_queue=8, max_batch=4, batch_wait=0.05,
+                 shed='oldest', history=200):
+        if shed not in SHED_POLICIES:
+            raise ValueError(f"Unknown shed policy '{shed}'. Must be one of: {', '.join(SHED_POLICIES)}.")
+        self.model_factory = model_factory
+        self.sample_rate = sample_rate
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait
+        self.shed = shed
+        self.listeners = []
+
+        # Waiting Segments; the Condition Also Wakes the Dispatcher When a Worker Frees Up
+        self.queue = collections.deque()
+        self.condition = threading.Condition()
+        self.in_flight = 0
+
+        # Counters and Recent Latencies (Seconds)
+        self.submitted = 0
+        self.completed = 0
+        self.shed_count = 0
+        self.failed = 0
+        self.batches = 0
+        self.latencies = collections.deque(maxlen=history)
+        self.waits = collections.deque(maxlen=history)
+
+        # Pool and Dispatcher, Created by start()
+        self.executor = None
+        self.thread = None
+        self.running = False
+
+    def start(self):
+        """Starts the worker processes (spawned, so no audio or Qt threads are forked) and the dispatcher."""
+        if self.running:
+            return
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=_load_model, initargs=(self.model_factory,))
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="SpeechToText", daemon=True)
+        self.thread.start()
+
+    def close(self, wait=True):
+        """Stops dispatching, cancels queued segments and shuts the workers down."""
+        with self.condition:
+            if not self.running:
+                return
+            self.running = False
+            while self.queue:
+                self.queue.popleft().future.cancel()
+            self.condition.notify_all()
+        self.thread.join()
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+        self.thread = None
+        self.executor = None
+
+    def add_listener(self, listener):
+        """Calls listener(transcript) for every finished segment, on a pool result thread."""
+        self.listeners.append(listener)
+
+    def attach(self, routing):
+        """Transcribes every speech segment AudioRouting's VAD detects."""
+        routing.add_speech_listener(self.submit_segment)
+
+    def submit_segment(self, segment):
+        """Submits a SpeechSegment (at this service's sample rate)."""
+        return self.submit(segment.audio, segment.start, segment.end)
+
+    def submit(self, audio, start=None, end=None):
+        """
+        Queues mono float32 audio for transcription. Never blocks.
+
+        Returns:
+            Future: Resolves to a Transcript; cancelled if the segment is shed or the service closes.
+        """
+        request = Request(np.asarray(audio, dtype=np.float32), start, end)
+        with self.condition:
+            self.submitted += 1
+            if not self.running:
+                request.future.cancel()
+                return request.future
+            if len(self.queue) >= self.max_queue:
+                self.shed_count += 1
+                if self.shed == 'newest':
+                    request.future.cancel()
+                    return request.future
+                self.queue.popleft().future.cancel()
+            self.queue.append(request)
+            self.condition.notify_all()
+        return request.future
+
+    def run(self):
+        while True:
+            with self.condition:
+                # Wait for a Free Worker and a Queued Segment
+                self.condition.wait_for(lambda: not self.running or (self.queue and self.in_flight < self.workers))
+                if not self.running:
+                    return
+
+                # Give a Batch That Is Not Full a Moment to Fill Up
+                deadline = time.perf_counter() + self.batch_wait
+                while self.running and len(self.queue) < self.max_batch:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                if not self.running:
+                    return
+                batch = [self.queue.popleft() for _ in range(min(self.max_batch, len(self.queue)))]
+
+                # Skip Segments Whose Caller Cancelled Them; the Rest Can No Longer Be Cancelled
+                batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+                if not batch:
+                    continue
+                self.in_flight += 1
+
+            # Pad and Send Outside the Lock
+            audio, lengths = pad_batch(batch)
+            dispatched = time.perf_counter()
+            try:
+                result = self.executor.submit(_transcribe, audio, lengths, self.sample_rate)
+            except RuntimeError as e:  # The Pool Broke or Is Shutting Down
+                self.finish_batch(batch, dispatched, error=e)
+                continue
+            result.add_done_callback(lambda result, batch=batch, dispatched=dispatched:
+                                     self.finish_batch(batch, dispatched, result))
+
+    def finish_batch(self, batch, dispatched, result=None, error=None):
+        """Delivers a batch's transcripts (or its error) and frees its worker slot."""
+        finished = time.perf_counter()
+        texts = None
+        if error is None:
+            try:
+                texts = result.result()
+            except Exception as e:
+                error = e
+        if texts is not None and len(texts) != len(batch):
+            error = ValueError(f"Model returned {len(texts)} transcripts for {len(batch)} segments")
+
+        transcripts = []
+        with self.condition:
+            self.in_flight -= 1
+            self.batches += 1
+            if error is not None:
+                self.failed += len(batch)
+            else:
+                for request, text in zip(batch, texts):
+                    transcript = Transcript(text, request.start, request.end, request.queued, dispatched, finished, len(batch))
+                    transcripts.append((request, transcript))
+                    self.latencies.append(transcript.latency)
+                    self.waits.append(transcript.wait)
+                self.completed += len(batch)
+            self.condition.notify_all()
+
+        if error is not None:
+            print(f"\033[91mSpeech-to-text batch failed: {error}\033[0m")
+            for request in batch:
+                request.future.set_exception(error)
+            return
+        for request, transcript in transcripts:
+            request.future.set_result(transcript)
+            for listener in list(self.listeners):
+                try:
+                    listener(transcript)
+                except Exception as e:
+                    print(f"\033[91mTranscript listener failed: {e}\033[0m")
+
+    def stats(self):
+        """
+        Returns:
+            dict: Counters, queue depth, mean batch size and p50/p95 latency and queue wait in milliseconds.
+        """
+        with self.condition:
+            latencies = sorted(self.latencies)
+            waits = sorted(self.waits)
+            stats = {
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'shed': self.shed_count,
+                'failed': self.failed,
+                'queued': len(self.queue),
+                'in_flight': self.in_flight,
+                'batches': self.batches,
+                'mean_batch': self.completed / self.batches if self.batches else None,
+            }
+
+        def percentile(values, q):
+            return values[min(len(values) - 1, int(q * len(values)))] * 1000 if values else None
+
+        for q in (0.5, 0.95):
+            stats[f'latency_p{int(q * 100)}_ms'] = percentile(latencies, q)
+            stats[f'wait_p{int(q * 100)}_ms'] = percentile(waits, q)
+        return stats
@@ -0,0 +1,348 @@
+"""
+Voice activity detection on the live stream.
+
+The processed capture reaches the detector through a device-less sink in the
+RoutingGraph, converted to mono at VAD_RATE, so the audio callback only pays
+for one more resample-and-copy. A monitor thread drains that sink and cuts
+the audio into 20 ms frames. For each frame it computes energy,
+zero-crossing rate and spectral flatness, vectorized over every complete
+frame that arrived. Frames that are loud enough against an adaptive noise
+floor and tonal enough to be voice count as speech. Onset and hangover
+counts smooth the per-frame decisions into segments, and only the audio of
+those segments is handed on, e.g. to speech-to-text.
+"""
+import collections
+import threading
+import time
+
+import numpy as np
+
+from scripts.logic.stft import make_window
+
+VAD_RATE = 16000
+
+class SpeechSegment:
+    """
+    One detected stretch of speech.
+
+    Attributes:
+        start (float): Stream time of the first sample, in seconds since the detector started.
+        end (float): Stream time just past the last sample.
+        wall_start (float): time.time() of the first sample (estimated from when it was processed).
+        audio (np.ndarray): Mono float32 samples from start to end.
+        sample_rate (int): Rate of audio.
+        split (bool): True if the segment was cut at max_segment_seconds and speech continues in the next.
+    """
+    __slots__ = ('start', 'end', 'wall_start', 'audio', 'sample_rate', 'split')
+
+    def __init__(self, start, end, wall_start, audio, sample_rate, split=False):
+        self.start = start
+        self.end = end
+        self.wall_start = wall_start
+        self.audio = audio
+        self.sample_rate = sample_rate
+        self.split = split
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+    def __repr__(self):
+        return f"SpeechSegment({self.start:.2f}s-{self.end:.2f}s, {self.duration:.2f}s)"
+
+class VoiceActivityDetector:
+    """
+    Frame-level speech detection with hangover smoothing. Not thread-safe;
+    fed by one thread (see VoiceActivityMonitor, or offline from a file).
+
+    Args:
+        sample_rate (int): Rate of the mono samples given to process().
+        frame_ms (float): Analysis frame length.
+        energy_margin_db (float): How far above the noise floor a frame must be to count as speech.
+        min_energy_db (float): Frames quieter than this (dBFS) are never speech.
+        flatness_max (float): Frames with a flatter spectrum than this (white noise is about 0.5) are not speech.
+        zcr_max (float): Frames crossing zero more often than this (per sample) are not speech.
+        onset_frames (int): Consecutive speech frames that open a segment.
+        hangover_frames (int): Consecutive non-speech frames that close it.
+        pad_frames (int): Frames of context kept before and after each segment.
+        max_segment_seconds (float): Longer speech is split into several segments.
+        noise_adapt (float): How fast the noise floor follows non-speech frames (0-1 per frame).
+    """
+    def __init__(self, sample_rate=VAD_RATE, frame_ms=20, energy_margin_db=10.0, min_energy_db=-55.0,
+                 flatness_max=0.35, zcr_max=0.45, onset_frames=3, hangover_frames=15, pad_frames=5,
+                 max_segment_seconds=15.0, noise_adapt=0.05):
+        self.sample_rate = sample_rate
+        self.frame_length = int(sample_rate * frame_ms / 1000)
+        self.energy_margin_db = energy_margin_db
+        self.min_energy_db = min_energy_db
+        self.flatness_max = flatness_max
+        self.zcr_max = zcr_max
+        self.onset_frames = onset_frames
+        self.hangover_frames = hangover_frames
+        self.pad_frames = pad_frames
+        self.max_segment_frames = max(1, int(max_segment_seconds * sample_rate / self.frame_length))
+        self.noise_adapt = noise_adapt
+
+        # Window and the Voice Band (100 Hz - 4 kHz) of the Frame Spectrum, Computed Once
+        self.window = make_window('hann', self.frame_length)
+        freqs = np.fft.rfftfreq(self.frame_length, 1 / sample_rate)
+        self.band = slice(int(np.searchsorted(freqs, 100.0)), int(np.searchsorted(freqs, 4000.0)))
+
+        self.reset()
+
+    def reset(self):
+        """Forgets all state, as if the stream started again."""
+        self.carry = np.zeros(0, dtype=np.float32)
+        self.frame_index = 0
+        self.noise_floor = self.min_energy_db
+        self.epoch = None
+
+        # Smoothing State
+        self.run = 0
+        self.silence = 0
+        self.recent = collections.deque(maxlen=self.pad_frames + self.onset_frames)
+        self.segment_start = None
+        self.segment_audio = []
+
+        # Last Frame's Features, for Display
+        self.energy_db = self.min_energy_db
+        self.zcr = 0.0
+        self.flatness = 1.0
+
+    @property
+    def speaking(self):
+        return self.segment_start is not None
+
+    def features(self, frames):
+        """
+        Per-frame features of an (n, frame_length) array.
+
+        Returns:
+            tuple: energy in dBFS, zero crossings per sample, and spectral flatness
+            (geometric over arithmetic mean of the voice-band power, 0 = tonal, 1 = flat).
+        """
+        energy_db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-12)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (self.frame_length - 1)
+        power = np.abs(np.fft.rfft(frames * self.window, axis=1)[:, self.band]) ** 2 + 1e-12
+        flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+        return energy_db, zcr, flatness
+
+    def process(self, samples):
+        """
+        Feeds mono samples and returns the segments that ended in them.
+
+        Incomplete frames are carried into the next call, so any block size works.
+
+        Returns:
+            list: SpeechSegment for every segment closed by these samples.
+        """
+        now = time.time()
+        # Always a Fresh Array: Segment Frames Are Views of It and Callers May Reuse Their Buffer
+        samples = np.concatenate([self.carry, samples])
+        count = len(samples) // self.frame_length
+        self.carry = samples[count * self.frame_length:].copy()
+
+        # Wall Time of Stream Time 0, Re-Estimated From the Newest Sample Each Call
+        self.epoch = now - (self.frame_index * self.frame_length + len(samples)) / self.sample_rate
+        if count == 0:
+            return []
+
+        frames = samples[:count * self.frame_length].reshape(count, self.frame_length)
+        energy_db, zcr, flatness = self.features(frames)
+        voiced = (flatness < self.flatness_max) & (zcr < self.zcr_max)
+        self.energy_db, self.zcr, self.flatness = float(energy_db[-1]), float(zcr[-1]), float(flatness[-1])
+
+        # Onset/Hangover Smoothing, a Few Frames per Call
+        finished = []
+        for i in range(count):
+            energy = energy_db[i]
+            speech = bool(voiced[i]) and energy > max(self.noise_floor + self.energy_margin_db, self.min_energy_db)
+            self.step(frames[i], speech, finished)
+
+            # The Noise Floor Drops at Once but Only Rises Slowly, and Only Outside Speech
+            if not speech and self.segment_start is None:
+                if energy < self.noise_floor:
+                    self.noise_floor = float(energy)
+                else:
+                    self.noise_floor += self.noise_adapt * (float(energy) - self.noise_floor)
+        return finished
+
+    def step(self, frame, speech, finished):
+        """Advances the smoothing state machine by one frame."""
+        index = self.frame_index
+        self.frame_index += 1
+        if self.segment_start is None:
+            self.recent.append(frame)
+            self.run = self.run + 1 if speech else 0
+            if self.run >= self.onset_frames:
+                # Open the Segment at the Start of the Padding Before the Onset
+                self.segment_start = index + 1 - len(self.recent)
+                self.segment_audio = list(self.recent)
+                self.recent.clear()
+                self.silence = 0
+            return
+
+        self.segment_audio.append(frame)
+        self.silence = 0 if speech else self.silence + 1
+        if self.silence > self.hangover_frames:
+            # Keep pad_frames of the Trailing Silence, Drop the Rest of the Hangover
+            drop = self.silence - self.pad_frames
+            finished.append(self.close(len(self.segment_audio) - drop))
+            self.run = 0
+        elif len(self.segment_audio) >= self.max_segment_frames:
+            finished.append(self.close(len(self.segment_audio), split=True))
+            self.segment_start = index + 1
+            self.segment_audio = []
+
+    def close(self, frames, split=False):
+        """Ends the open segment after its first `frames` frames."""
+        start = self.segment_start
+        audio = np.concatenate(self.segment_audio[:frames]) if frames > 0 else np.zeros(0, dtype=np.float32)
+        rate = self.sample_rate
+        start_seconds = start * self.frame_length / rate
+        segment = SpeechSegment(start_seconds, (start + frames) * self.frame_length / rate,
+                                self.epoch + start_seconds, audio, rate, split)
+        self.segment_start = None
+        self.segment_audio = []
+        self.silence = 0
+        return segment
+
+    def skip(self, samples):
+        """Advances the clock over samples that were lost (e.g. dropped by a full ring), ending any open segment."""
+        finished = []
+        if self.segment_start is not None:
+            finished.append(self.close(len(self.segment_audio) - self.silence))
+        self.run = 0
+        self.recent.clear()
+
+        # Keep the Position Exact: the Lost Samples Continue the Carried Partial Frame, and Whatever
+        # Does Not Fill a Whole Frame Stays Carried as Silence, so Later Frames Keep Their Timestamps
+        lost = len(self.carry) + samples
+        self.frame_index += lost // self.frame_length
+        self.carry = np.zeros(lost % self.frame_length, dtype=np.float32)
+        return finished
+
+    def flush(self):
+        """Ends the open segment (e.g. at the end of a file)."""
+        if self.segment_start is None:
+            return []
+        return [self.close(len(self.segment_audio) - max(0, self.silence - self.pad_frames))]
+
+class VoiceActivityMonitor:
+    """
+    Runs a VoiceActivityDetector on its own thread, fed from a routing sink.
+
+    The thread wakes `rate` times per second, drains the sink's ring and
+    passes finished segments to every listener (on this thread) and to
+    `segments`, a short history for display. Frames the ring dropped while
+    this thread was late advance the clock, so timestamps stay on the
+    stream's timeline.
+
+    Args:
+        sink (Sink): Device-less mono sink at the detector's rate (see AudioRouting.start_vad()).
+        detector (VoiceActivityDetector): The detector to run.
+        rate (float): Wake-ups per second.
+        history (int): Segments kept in `segments`.
+    """
+    def __init__(self, sink, detector, rate=20, history=50):
+        self.sink = sink
+        self.detector = detector
+        self.rate = rate
+        self.listeners = []
+        self.segments = collections.deque(maxlen=history)
+
+        # Other Consumers of the Same Mono Feed (e.g. KeywordSpotter.process), Called Before Detection
+        self.taps = []
+
+        # Staging Area for Frames Read From the Ring
+        self.incoming = np.zeros((sink.rate, 1), dtype=np.float32)
+        self.dropped = 0
+
+        # Cost of Detection, to Check It Stays a Small Fraction of a Core
+        self.busy_seconds = 0.0
+        self.audio_seconds = 0.0
+
+        # Thread State
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def add_listener(self, listener):
+        """Calls listener(segment) for every finished SpeechSegment, on the monitor thread."""
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def add_tap(self, tap):
+        """Calls tap(samples) with every chunk of the mono feed, on the monitor thread."""
+        self.taps.append(tap)
+
+    def remove_tap(self, tap):
+        if tap in self.taps:
+            self.taps.remove(tap)
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="VoiceActivityMonitor", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+
+    def run(self):
+        while not self.stop_event.wait(1 / self.rate):
+            self.poll()
+
+    def poll(self):
+        """
+        Drains the sink and runs the detector over what arrived.
+
+        Returns:
+            list: The SpeechSegment objects that finished.
+        """
+        ring = self.sink.ring
+        if ring is None:
+            return []
+        start = time.perf_counter()
+        finished = []
+
+        # Frames Dropped Since the Last Poll Still Take Up Stream Time (the Counter Restarts With the Stream)
+        if ring.dropped < self.dropped:
+            self.dropped = 0
+        if ring.dropped > self.dropped:
+            finished += self.detector.skip(ring.dropped - self.dropped)
+            self.dropped = ring.dropped
+
+        while ring.available():
+            frames = ring.read(self.incoming)
+            samples = self.incoming[:frames, 0]
+            for tap in list(self.taps):
+                try:
+                    tap(samples)
+                except Exception as e:
+                    print(f"\033[91mAudio tap failed: {e}\033[0m")
+            finished += self.detector.process(samples)
+            self.audio_seconds += frames / self.sink.rate
+
+        for segment in finished:
+            self.segments.append(segment)
+            for listener in list(self.listeners):
+                try:
+                    listener(segment)
+                except Exception as e:
+                    print(f"\033[91mSpeech listener failed: {e}\033[0m")
+        self.busy_seconds += time.perf_counter() - start
+        return finished
+
+    @property
+    def load(self):
+        """Fraction of one core spent detecting, per second of audio (None before any audio)."""
+        return self.busy_seconds / self.audio_seconds if self.audio_seconds else None
@@ -1,3 +1,6 @@
 from .labels import *
 from .audio_module import *
-from .menu_bar import *
\ No newline at end of file
+from .menu_bar import *
+from .spectrum_widget import *
+from .health_status import *
+from .soundboard_widget import *
\ No newline at end of file
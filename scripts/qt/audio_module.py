@@ -10,9 +10,35 @@ from PySide6.QtWidgets import (
     QStatusBar, QToolBar, QStatusBar, QDockWidget,
     QMainWindow, QMenu, QDialog, QFileDialog,
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QObject, Signal
 from PySide6.QtGui import QIcon, QPixmap
 from scripts.logic.audio import AudioValues
+from scripts.logic.devices import listed_devices
+from scripts.logic.latency import LATENCY_MODES
+
+class DeviceEvents(QObject):
+    """
+    Re-emits a DeviceWatcher's notifications as Qt signals, delivered on the GUI
+    thread: reported, with all three lists, and each non-empty list on its own.
+    """
+    reported = Signal(list, list, list)
+    added = Signal(list)
+    removed = Signal(list)
+    changed = Signal(list)
+    
+    def __init__(self, watcher, parent=None):
+        super().__init__(parent)
+        watcher.add_listener(self.notify)
+    
+    def notify(self, added, removed, changed):
+        # Called on the Watcher's Thread; Qt Queues Each Signal to the Receivers' Thread
+        self.reported.emit(added, removed, changed)
+        if added:
+            self.added.emit(added)
+        if removed:
+            self.removed.emit(removed)
+        if changed:
+            self.changed.emit(changed)
 
 class AudioSelectionWidget(QWidget):
     def __init__(self, logic, parent=None):
@@ -21,9 +47,21 @@ class AudioSelectionWidget(QWidget):
         self.labels = logic.labels
         self.audio_routing = logic.audio_routing
         self.audio_devices = logic.audio_devices
-        self.output_devices = self.audio_devices.outputs
-        self.input_devices = self.audio_devices.inputs
+        self.registry = self.audio_devices.registry
+        self.output_devices = listed_devices(self.registry, 'output')
+        self.input_devices = listed_devices(self.registry, 'input')
         self.initUI()
+        
+        # Hot-Plugged Devices Are Found Off the GUI Thread; the Dropdowns Are Updated in Place.
+        # A Daemon Client Has No Watcher (the Daemon Watches Its Own Devices)
+        self.device_watcher = logic.device_watcher
+        self.device_events = None
+        if self.device_watcher is not None:
+            self.device_events = DeviceEvents(self.device_watcher, self)
+            self.device_events.reported.connect(self.follow_devices)
+            self.device_events.added.connect(self.sync_devices)
+            self.device_events.removed.connect(self.sync_devices)
+            self.device_events.changed.connect(self.sync_devices)
 
     def initUI(self):
         label_width = 100  # Maximum label width
@@ -70,7 +108,7 @@ class AudioSelectionWidget(QWidget):
         output_layout.setAlignment(Qt.AlignTop)
         output_layout.addWidget(self.createLabel("Audio Output:", label_width))
         output_dropdown = QComboBox()
-        output_dropdown.addItems(self.output_devices.keys())
+        self.populate(output_dropdown, self.output_devices)
         output_layout.addWidget(output_dropdown)
         audio_layout.addLayout(output_layout)
 
@@ -79,7 +117,7 @@ class AudioSelectionWidget(QWidget):
         input_layout.setAlignment(Qt.AlignTop)
         input_layout.addWidget(self.createLabel("Mic Input:", label_width))
         input_dropdown = QComboBox()
-        input_dropdown.addItems(self.input_devices.keys())
+        self.populate(input_dropdown, self.input_devices)
         input_layout.addWidget(input_dropdown)
         audio_layout.addLayout(input_layout)
 
@@ -88,12 +126,28 @@ class AudioSelectionWidget(QWidget):
         mic_output_layout.setAlignment(Qt.AlignTop)
         mic_output_layout.addWidget(self.createLabel("Mic Output:", label_width))
         mic_output_dropdown = QComboBox()
-        mic_output_dropdown.addItems(self.output_devices.keys())
+        self.populate(mic_output_dropdown, self.output_devices)
         if len(self.output_devices) > 1:
             mic_output_dropdown.setCurrentIndex(1)
         mic_output_layout.addWidget(mic_output_dropdown)
         audio_layout.addLayout(mic_output_layout)
 
+        # Latency Mode, and Whether the Buffer Size Is Tuned While Running
+        latency_layout = QHBoxLayout()
+        latency_layout.setAlignment(Qt.AlignTop)
+        latency_layout.addWidget(self.createLabel("Latency:", label_width))
+        latency_dropdown = QComboBox()
+        for mode in LATENCY_MODES:
+            latency_dropdown.addItem(mode.capitalize(), mode)
+        latency_dropdown.setCurrentIndex(latency_dropdown.findData(self.audio_routing.latency_mode))
+        latency_dropdown.currentIndexChanged.connect(lambda index: self.audio_routing.set_latency_mode(latency_dropdown.itemData(index)))
+        latency_layout.addWidget(latency_dropdown)
+        adaptive_checkbox = QCheckBox("Auto-Tune")
+        adaptive_checkbox.setChecked(self.audio_routing.adaptive_latency)
+        adaptive_checkbox.stateChanged.connect(lambda state: self.audio_routing.set_adaptive_latency(bool(state)))
+        latency_layout.addWidget(adaptive_checkbox)
+        audio_layout.addLayout(latency_layout)
+
         self.output_dropdown = output_dropdown
         self.input_dropdown = input_dropdown
         self.mic_output_dropdown = mic_output_dropdown
@@ -102,24 +156,54 @@ class AudioSelectionWidget(QWidget):
         label = QLabel(text)
         label.setFixedWidth(width)
         return label
+    
+    def populate(self, dropdown, devices):
+        """
+        Adds device names, keeping each device's stable (host API, name) key as
+        item data (indices change when devices come and go) and its host API as tooltip.
+        """
+        for info in devices:
+            self.add_device(dropdown, self.registry.key(info))
+    
+    def add_device(self, dropdown, key):
+        dropdown.addItem(key[1], list(key))
+        dropdown.setItemData(dropdown.count() - 1, key[0], Qt.ToolTipRole)
+    
+    def sync_dropdown(self, dropdown, devices):
+        """Removes devices that are gone and appends new ones, keeping the selection if its device is still there."""
+        wanted = [self.registry.key(info) for info in devices]
+        keep = set(wanted)
+        for i in reversed(range(dropdown.count())):
+            if tuple(dropdown.itemData(i)) not in keep:
+                dropdown.removeItem(i)
+        present = set(tuple(dropdown.itemData(i)) for i in range(dropdown.count()))
+        for key in wanted:
+            if key not in present:
+                self.add_device(dropdown, key)
+    
+    def sync_devices(self, devices=None):
+        """Brings the dropdowns up to the watcher's latest scan."""
+        self.registry = self.device_watcher.registry
+        self.output_devices = listed_devices(self.registry, 'output')
+        self.input_devices = listed_devices(self.registry, 'input')
+        self.sync_dropdown(self.output_dropdown, self.output_devices)
+        self.sync_dropdown(self.input_dropdown, self.input_devices)
+        self.sync_dropdown(self.mic_output_dropdown, self.output_devices)
 
+    def follow_devices(self, added, removed, changed):
+        # On the GUI Thread, Which Owns the Route: Rebinding Reopens Its Streams
+        self.audio_routing.handle_device_changes(added, removed, changed)
+    
     def refresh_devices(self):
-        self.audio_devices.refresh_devices()
-        self.output_devices = self.audio_devices.outputs
-        self.input_devices = self.audio_devices.inputs
-        self.output_dropdown.clear()
-        self.input_dropdown.clear()
-        self.mic_output_dropdown.clear()
-        self.output_dropdown.addItems(self.output_devices.keys())
-        self.input_dropdown.addItems(self.input_devices.keys())
-        self.mic_output_dropdown.addItems(self.output_devices.keys())
-        if len(self.output_devices) > 1:
-            self.mic_output_dropdown.setCurrentIndex(1)
+        # Scan Now on the Watcher's Thread; the Dropdowns Update When It Reports Back
+        if self.device_watcher is not None:
+            self.device_watcher.check_now()
     
     def start_route(self):
-        self.audio_output = self.output_devices[self.output_dropdown.currentText()]
-        self.audio_input = self.input_devices[self.input_dropdown.currentText()]
-        self.audio_mic_output = self.output_devices[self.mic_output_dropdown.currentText()]
+        # Stable Device Keys Are Stored on the Items, Resolved by the Routing's Registry
+        self.audio_output = self.output_dropdown.currentData()
+        self.audio_input = self.input_dropdown.currentData()
+        self.audio_mic_output = self.mic_output_dropdown.currentData()
         
         # Start Routing the Audio
         self.audio_routing.start_route(self.audio_output, self.audio_input, self.audio_mic_output)
@@ -194,6 +278,29 @@ class AudioManipulation(QWidget):
         noise_threshold_layout.addWidget(self.noise_threshold_label)
         layout.addLayout(noise_threshold_layout)
         noise_threshold_slider.valueChanged.connect(self.update_noise_threshold)
+        
+        ###############################
+        ##   Speaker Monitor Level   ##
+        ###############################
+        monitor_layout = QHBoxLayout()
+        monitor_layout.setAlignment(Qt.AlignTop)
+        monitor_layout.addWidget(self.createLabel("Monitor:", label_width))
+        monitor_slider = QSlider(Qt.Horizontal)
+        monitor_slider.setMinimum(0)
+        monitor_slider.setMaximum(100)
+        monitor_slider.setSingleStep(1)
+        monitor_slider.setValue(int(self.audio_routing.sink_gains['speaker'] * 100))
+        monitor_layout.addWidget(monitor_slider)
+        self.monitor_label = QLabel(f"{monitor_slider.value()}%")
+        self.monitor_label.setFixedWidth(40)
+        monitor_layout.addWidget(self.monitor_label)
+        layout.addLayout(monitor_layout)
+        monitor_slider.valueChanged.connect(self.update_monitor)
+    
+    def update_monitor(self, value):
+        # Level of the Processed Mic on the Speaker (Audio Output)
+        self.audio_routing.set_sink_gain('speaker', value / 100)
+        self.monitor_label.setText(f"{value}%")
     
     def update_noise_threshold(self, value):
         self.audio_values.set_noise_threshold(value/100000)
@@ -0,0 +1,70 @@
+from PySide6.QtWidgets import QStatusBar, QLabel
+from PySide6.QtCore import QTimer
+
+class HealthStatusBar(QStatusBar):
+    """
+    Shows the audio callback's health (xruns, late callbacks, timing, CPU load).
+
+    Polls AudioRouting.health_snapshot() from the GUI thread, so the audio
+    callback never touches Qt.
+    """
+    def __init__(self, audio_routing, interval=500, parent=None):
+        super().__init__(parent)
+        self.audio_routing = audio_routing
+        self.last_xruns = 0
+        self.last_over_budget = 0
+
+        self.xrun_label = QLabel()
+        self.timing_label = QLabel()
+        self.load_label = QLabel()
+        self.addWidget(self.xrun_label)
+        self.addPermanentWidget(self.timing_label)
+        self.addPermanentWidget(self.load_label)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(interval)
+        self.refresh()
+
+    def refresh(self):
+        health = self.audio_routing.health_snapshot()
+        if not health['running'] and health['callbacks'] == 0:
+            self.xrun_label.setText("Audio: Stopped")
+            self.xrun_label.setStyleSheet("")
+            self.timing_label.setText("")
+            self.load_label.setText("")
+            return
+
+        # Xruns, in Red While New Ones Keep Arriving
+        self.xrun_label.setText(
+            f"Xruns: {health['xruns']} (in under {health['input_underflow']}, in over {health['input_overflow']}, "
+            f"out under {health['output_underflow']}, out over {health['output_overflow']})"
+        )
+        self.xrun_label.setToolTip(self.histogram_text(health))
+        problems = health['xruns'] > self.last_xruns or health['over_budget'] > self.last_over_budget
+        self.xrun_label.setStyleSheet("color: rgb(220, 60, 60);" if problems else "")
+        self.last_xruns = health['xruns']
+        self.last_over_budget = health['over_budget']
+
+        # Callback Timing Against the Buffer Budget
+        budget = health['budget_ms']
+        self.timing_label.setText(
+            f"Late: {health['over_budget']}/{health['callbacks']}  "
+            f"Max: {health['max_ms']:.2f} ms" + (f" / {budget:.1f} ms" if budget else "")
+        )
+
+        # PortAudio's Estimate of the Stream's CPU Load
+        cpu_load = health['cpu_load']
+        self.load_label.setText(f"CPU: {cpu_load:.0%}" if cpu_load is not None else "CPU: n/a")
+
+    @staticmethod
+    def histogram_text(health):
+        """Formats the callback duration histogram for the tooltip."""
+        lines = ["Callback time (fraction of budget):"]
+        lower = 0.0
+        edges = health['histogram']['edges']
+        for upper, count in zip(edges + [None], health['histogram']['counts']):
+            label = f"{lower:.0%}-{upper:.0%}" if upper is not None else f">{lower:.0%}"
+            lines.append(f"  {label}: {count}")
+            lower = upper
+        return "\n".join(lines)
@@ -0,0 +1,67 @@
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QPushButton, QFileDialog
+from PySide6.QtCore import Qt
+
+import os
+
+from scripts.logic.clips import CLIP_EXTENSIONS
+
+class SoundboardWidget(QWidget):
+    """
+    A button per soundboard clip. Clicking only queues a trigger for the
+    audio callback (ClipEngine.trigger), so the GUI never waits on audio.
+    """
+    columns = 4
+
+    def __init__(self, logic, parent=None):
+        super().__init__(parent)
+        self.labels = logic.labels
+        self.clip_engine = logic.audio_routing.clip_engine
+        self.initUI()
+
+    def initUI(self):
+        layout = QVBoxLayout(self)
+        layout.setAlignment(Qt.AlignTop)
+
+        # Header Row
+        header = QHBoxLayout()
+        soundboard_label = QLabel("Soundboard")
+        soundboard_label.setFont(self.labels.Font_bu('Segoe UI', 15))
+        header.addWidget(soundboard_label)
+        add_button = QPushButton("Add Clip")
+        add_button.clicked.connect(self.add_clip)
+        header.addWidget(add_button)
+        stop_button = QPushButton("Stop All")
+        stop_button.clicked.connect(lambda: self.clip_engine.stop())
+        header.addWidget(stop_button)
+        layout.addLayout(header)
+
+        # Clip Buttons
+        self.grid = QGridLayout()
+        layout.addLayout(self.grid)
+        self.populate()
+
+    def populate(self):
+        while self.grid.count():
+            item = self.grid.takeAt(0)
+            if item.widget() is not None:
+                item.widget().deleteLater()
+        for i, name in enumerate(self.clip_engine.names()):
+            button = QPushButton(name)
+            button.clicked.connect(lambda checked=False, name=name: self.trigger(name))
+            self.grid.addWidget(button, i // self.columns, i % self.columns)
+
+    def trigger(self, name):
+        if self.clip_engine.trigger(name):
+            return
+        if name in self.clip_engine.drop_failed():
+            self.populate()
+        else:
+            print(f"Clip '{name}' is still being decoded.")
+
+    def add_clip(self):
+        patterns = " ".join(f"*{extension}" for extension in CLIP_EXTENSIONS)
+        paths, _ = QFileDialog.getOpenFileNames(self, "Add Clips", "", f"Audio Files ({patterns})")
+        for path in paths:
+            self.clip_engine.add(os.path.splitext(os.path.basename(path))[0], path)
+        if paths:
+            self.populate()
@@ -0,0 +1,123 @@
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QCheckBox
+from PySide6.QtCore import Qt, QTimer, QPointF
+from PySide6.QtGui import QPainter, QPolygonF, QColor, QPen
+
+import numpy as np
+
+class SpectrumView(QWidget):
+    """
+    Paints the analyzer's log-frequency bands with QPainter.
+
+    A timer polls at the display refresh rate, and the widget is only
+    repainted when the analyzer has published a new spectrum.
+    """
+    # Displayed Level Range in dBFS
+    floor_db = -90.0
+
+    def __init__(self, audio_routing, parent=None):
+        super().__init__(parent)
+        self.audio_routing = audio_routing
+        self.setMinimumHeight(120)
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+
+        # Last Drawn Spectrum, as Normalized (0-1) Coordinates
+        self.last_spectrum = None
+        self.x = None
+        self.y = None
+
+        self.background = QColor(30, 30, 30)
+        self.pen = QPen(QColor(80, 170, 255), 1.5)
+        self.fill = QColor(80, 170, 255, 70)
+
+        # Poll at the Display Refresh Rate (Started in showEvent)
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        screen = self.screen()
+        refresh_rate = screen.refreshRate() if screen is not None else 60.0
+        self.timer.start(max(1, int(1000 / (refresh_rate or 60.0))))
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        analyzer = self.audio_routing.spectrum_analyzer
+        if analyzer is None:
+            return
+
+        # Skip the Repaint if Nothing New Was Published
+        key = (id(analyzer), analyzer.spectra)
+        if key == self.last_spectrum or analyzer.band_data is None:
+            return
+        self.last_spectrum = key
+
+        # Log-Frequency X and dB Y, Both Normalized to 0-1
+        centers, magnitudes = analyzer.band_data
+        bands = analyzer.bands
+        self.x = np.clip(np.log(centers / bands.fmin) / np.log(bands.fmax / bands.fmin), 0, 1)
+        level_db = 20 * np.log10(np.maximum(magnitudes, 1e-9))
+        self.y = np.clip(1 - level_db / self.floor_db, 0, 1)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self.background)
+        if self.x is None:
+            return
+
+        # Scale the Normalized Points to the Current Size
+        width = self.width()
+        height = self.height()
+        xs = self.x * (width - 1)
+        ys = (1 - self.y) * (height - 1)
+
+        line = QPolygonF([QPointF(x, y) for x, y in zip(xs.tolist(), ys.tolist())])
+        area = QPolygonF(line)
+        area.append(QPointF(xs[-1], height))
+        area.append(QPointF(xs[0], height))
+
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(self.fill)
+        painter.drawPolygon(area)
+        painter.setPen(self.pen)
+        painter.setBrush(Qt.NoBrush)
+        painter.drawPolyline(line)
+
+class SpectrumWidget(QWidget):
+    def __init__(self, logic, parent=None):
+        super().__init__(parent)
+        self.labels = logic.labels
+        self.audio_routing = logic.audio_routing
+        self.initUI()
+
+    def initUI(self):
+        layout = QVBoxLayout(self)
+        layout.setAlignment(Qt.AlignTop)
+
+        # Header Row
+        header = QHBoxLayout()
+        spectrum_label = QLabel("Spectrum")
+        spectrum_label.setFont(self.labels.Font_bu('Segoe UI', 15))
+        header.addWidget(spectrum_label)
+        spectrum_checkbox = QCheckBox("Show")
+        spectrum_checkbox.setChecked(self.audio_routing.spectrum_enabled)
+        spectrum_checkbox.stateChanged.connect(self.update_spectrum)
+        header.addWidget(spectrum_checkbox, alignment=Qt.AlignRight)
+        layout.addLayout(header)
+
+        # Spectrum View
+        self.view = SpectrumView(self.audio_routing)
+        self.view.setVisible(spectrum_checkbox.isChecked())
+        layout.addWidget(self.view)
+
+    def update_spectrum(self, state):
+        if state:
+            self.audio_routing.start_spectrum_analyzer()
+        else:
+            self.audio_routing.stop_spectrum_analyzer()
+        self.view.setVisible(bool(state))